@@ -0,0 +1,219 @@
+import html
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+
+from metrics import counter
+
+logger = logging.getLogger(__name__)
+
+DIGEST_MESSAGES = counter("bot_admin_digest_messages_total", "Admin digest messages by Bot API call", ["action"])
+
+# Callback data digest_all_<after>_<until>: confirm IDs with after < seq <= until
+CONFIRM_ALL_PREFIX = "digest_all_"
+
+# Lines listed in the message; the rest is only counted, Telegram cuts text at 4096 characters
+MAX_LISTED = 20
+
+SendDigest = Callable[[str, Optional[InlineKeyboardMarkup]], Awaitable[int]]
+EditDigest = Callable[[int, str, Optional[InlineKeyboardMarkup]], Awaitable[None]]
+
+
+def parse_confirm_all(callback_data: str) -> Optional[Tuple[int, int]]:
+    """(after, until) sequence bounds of a "confirm all" button"""
+    try:
+        after, until = callback_data[len(CONFIRM_ALL_PREFIX):].split("_")
+        return int(after), int(until)
+    except ValueError:
+        return None
+
+
+class DigestEntry:
+    __slots__ = ('seq', 'user_id', 'name', 'platform_id', 'at')
+
+    def __init__(self, seq: int, user_id: int, name: str, platform_id: str, at: float):
+        self.seq = seq
+        self.user_id = user_id
+        self.name = name
+        self.platform_id = platform_id
+        self.at = at
+
+
+class AdminDigest:
+    """Platform IDs waiting for the admin, kept in one edited message
+
+    IDs added within window seconds of each other go out together: the
+    first starts a timer and everything added until it fires lands in a
+    single send or edit. The message stays open while it lists unresolved
+    IDs; once they are all resolved it is closed with a summary and the
+    next ID starts a new message, which notifies the admin again. A
+    message older than max_age is closed the same way, so a forgotten ID
+    does not keep later ones silent.
+
+    The "confirm all" button carries the sequence range shown, so pressing
+    it never confirms an ID that arrived after the admin looked.
+
+    IDs either come in through add() and are kept in memory, or, with
+    replicas sharing a database, are read from it by the leader and
+    passed to sync(); then the button's range is resolved against the
+    database and any replica can handle it.
+    """
+
+    def __init__(self, send: SendDigest, edit: EditDigest, window: float = 5.0, max_age: float = 3600.0,
+                 clock: Callable[[], float] = time.time):
+        self._send = send
+        self._edit = edit
+        self.window = window
+        self.max_age = max_age
+        self._clock = clock
+
+        self._entries: "OrderedDict[int, DigestEntry]" = OrderedDict()  # user_id -> entry
+        self._seq = 0
+        self.after = 0  # listed IDs have a larger sequence number
+        self._resolved = 0  # IDs resolved since the open message was sent
+        self._message_id: Optional[int] = None
+        self._sent_at = 0.0
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._entries)
+
+    @property
+    def message_id(self) -> Optional[int]:
+        """The open message, None when there is none"""
+        return self._message_id
+
+    def add(self, user_id: int, name: str, platform_id: str):
+        """Queue a submitted ID; a resubmission replaces the earlier one"""
+        self._entries.pop(user_id, None)
+        self._seq += 1
+        self._entries[user_id] = DigestEntry(self._seq, user_id, name, platform_id, self._clock())
+        self._schedule()
+
+    def discard(self, user_ids):
+        """Drop IDs the admin resolved elsewhere, e.g. from the pending list"""
+        removed = 0
+        for user_id in user_ids:
+            if self._entries.pop(user_id, None) is not None:
+                removed += 1
+        if removed:
+            self._resolved += removed
+            self._schedule()
+
+    def take(self, callback_data: str) -> List[int]:
+        """Remove and return the IDs a "confirm all" button was shown for"""
+        bounds = parse_confirm_all(callback_data)
+        if bounds is None:
+            return []
+        after, until = bounds
+        taken = [user_id for user_id, entry in self._entries.items() if after < entry.seq <= until]
+        for user_id in taken:
+            del self._entries[user_id]
+        self._resolved += len(taken)
+        return taken
+
+    def sync(self, rows: Iterable[Dict[str, Any]]) -> bool:
+        """Replace the IDs with the unresolved ones read from the database
+
+        rows have the DigestEntry fields and are in sequence order. IDs no
+        longer among them count as resolved. Returns whether anything
+        changed, i.e. whether the message needs a flush.
+        """
+        entries = OrderedDict((row['user_id'], DigestEntry(**row)) for row in rows)
+        if [(e.user_id, e.seq) for e in entries.values()] == [(e.user_id, e.seq) for e in self._entries.values()]:
+            return False
+        self._resolved += sum(1 for user_id in self._entries if user_id not in entries)
+        self._entries = entries
+        return True
+
+    def reset(self, after: int = 0):
+        """Forget the IDs and the open message; the next ones start a new message"""
+        self._entries.clear()
+        self._resolved = 0
+        self._message_id = None
+        self.after = after
+
+    def _schedule(self):
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        # IDs added while this flush waits on Telegram start the next timer
+        self._timer = None
+        await self.flush()
+
+    def render(self):
+        """Text and keyboard of the open message"""
+        if not self._entries:
+            return f"🆔 <b>Новые ID</b>\n\n✅ Все заявки разобраны: {self._resolved}", None
+
+        lines = [f"🆔 <b>Новые ID: {len(self._entries)}</b>\n"]
+        entries = list(self._entries.values())
+        for entry in entries[-MAX_LISTED:]:
+            lines.append(f"👤 {html.escape(entry.name or '—')} | 🆔 {entry.user_id} | 📱 {html.escape(entry.platform_id)}"
+                         f" | ⏰ {datetime.fromtimestamp(entry.at).strftime('%H:%M')}")
+        if len(entries) > MAX_LISTED:
+            lines.append(f"… и еще {len(entries) - MAX_LISTED}")
+
+        keyboard = InlineKeyboardMarkup([[InlineKeyboardButton(
+            f"✅ Подтвердить всех ({len(entries)})", callback_data=f"{CONFIRM_ALL_PREFIX}{self.after}_{entries[-1].seq}"
+        )]])
+        return "\n".join(lines), keyboard
+
+    async def flush(self):
+        """Bring the admin's message up to date: one edit, or one send for a new message"""
+        async with self._lock:
+            try:
+                await self._flush()
+            except Exception as e:
+                logger.error(f"Error updating admin digest: {e}")
+
+    async def _flush(self):
+        if self._message_id is not None and self._entries and self._clock() - self._sent_at > self.max_age:
+            # Close the old message so the admin is notified about the new one
+            await self._edit_message("🆔 <b>Новые ID</b>\n\n⤵️ Список перенесен ниже", None)
+            self._message_id = None
+
+        if self._message_id is not None:
+            text, keyboard = self.render()
+            if await self._edit_message(text, keyboard):
+                if not self._entries:
+                    self._message_id = None
+                return
+            self._message_id = None
+
+        if not self._entries:
+            return
+        self._resolved = 0
+        text, keyboard = self.render()
+        self._message_id = await self._send(text, keyboard)
+        self._sent_at = self._clock()
+        DIGEST_MESSAGES.inc("send")
+
+    async def _edit_message(self, text: str, keyboard: Optional[InlineKeyboardMarkup]) -> bool:
+        """Edit the open message; False if it is gone"""
+        try:
+            await self._edit(self._message_id, text, keyboard)
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                return True
+            # Deleted by the admin or too old to edit
+            logger.warning(f"Admin digest message lost: {e}")
+            return False
+        DIGEST_MESSAGES.inc("edit")
+        return True
+
+    async def close(self):
+        """Send what is pending now instead of waiting for the timer"""
+        if self._timer and not self._timer.done():
+            self._timer.cancel()
+        await self.flush()
@@ -0,0 +1,97 @@
+"""CPU time per menu callback: building keyboards per call vs MenuRegistry
+
+Both variants hand the screen to a no-op send function, so only the work
+done in the bot process is measured. "+serialize" adds the to_dict() call
+python-telegram-bot makes when it encodes the request.
+
+Usage: python benchmarks/bench_menus.py [--calls N]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.constants import ParseMode
+
+from menus import MenuRegistry
+
+USER_MENU_TEXT = "👋 <b>Добро пожаловать!</b>\n\nДля получения сигналов:\n1. Зарегистрируйтесь\n2. Отправьте ID\n3. Дождитесь подтверждения\n\nВыберите действие:"
+REGISTER_TEXT = "🔗 <b>Регистрация</b>\n\nПерейдите по ссылке:\nhttps://bit.ly/4jb8a4k\n\nПосле регистрации отправьте ID."
+
+
+async def show_user_menu_inline(send):
+    """Old code path: objects built on every call"""
+    keyboard = [
+        [InlineKeyboardButton("🔗 Зарегистрироваться", callback_data="register")],
+        [InlineKeyboardButton("🆔 Отправить ID", callback_data="send_id")],
+        [InlineKeyboardButton("📈 Получить сигнал", callback_data="get_signal")],
+        [InlineKeyboardButton("🤝 Поддержка", url="https://t.me/razgondepoz1ta")],
+    ]
+    await send(USER_MENU_TEXT, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode=ParseMode.HTML)
+
+
+async def show_register_inline(send):
+    await send(
+        REGISTER_TEXT,
+        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_user")]]),
+        parse_mode=ParseMode.HTML
+    )
+
+
+def build_registry() -> MenuRegistry:
+    menus = MenuRegistry()
+    menus.add_keyboard("user_menu", [
+        [("🔗 Зарегистрироваться", "register")],
+        [("🆔 Отправить ID", "send_id")],
+        [("📈 Получить сигнал", "get_signal")],
+        [("🤝 Поддержка", None, "https://t.me/razgondepoz1ta")],
+    ])
+    menus.add_keyboard("back_user", [[("🔙 Назад", "back_user")]])
+    menus.add_screen("user_menu", USER_MENU_TEXT, "user_menu")
+    menus.add_screen("register", REGISTER_TEXT, "back_user")
+    return menus
+
+
+async def discard(text, reply_markup=None, parse_mode=None):
+    pass
+
+
+async def serialize(text, reply_markup=None, parse_mode=None):
+    reply_markup.to_dict()
+
+
+async def measure(show, send, calls: int) -> float:
+    """Microseconds of CPU time per call"""
+    started = time.process_time()
+    for _ in range(calls):
+        await show(send)
+    return (time.process_time() - started) / calls * 1e6
+
+
+async def run(calls: int):
+    menus = build_registry()
+    cases = [
+        ("user menu", show_user_menu_inline, lambda send: menus.show("user_menu", send)),
+        ("back screen", show_register_inline, lambda send: menus.show("register", send)),
+    ]
+    print(f"{'screen':<26}{'per call':>12}{'registry':>12}{'speedup':>10}")
+    for name, inline, registry in cases:
+        for suffix, send in (("", discard), (" +serialize", serialize)):
+            before = await measure(inline, send, calls)
+            after = await measure(registry, send, calls)
+            print(f"{name + suffix:<26}{before:>10.2f}us{after:>10.2f}us{before / after:>9.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=50_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls))
+
+
+if __name__ == "__main__":
+    main()
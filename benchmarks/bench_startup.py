@@ -0,0 +1,105 @@
+"""Cold start: module import time and time to first HTTP response
+
+For each entry point a fresh interpreter is spawned and /healthz and
+/readyz are polled until they answer. Time is measured from spawning the
+process, so interpreter start is included. /readyz only turns 200 when
+the bot reaches Telegram, so without a real token it is reported as
+not ready.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--timeout S]
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+ENTRY_POINTS = [
+    ("bot.py", ["bot.py"]),
+    ("startup.py bot", ["startup.py", "bot"]),
+    ("bot_old.py", ["bot_old.py"]),
+    ("startup.py bot_old", ["startup.py", "bot_old"]),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_status(port: int, path: str) -> int:
+    """HTTP status of GET path, 0 if the server does not answer"""
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.5) as sock:
+            sock.sendall(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+            status_line = sock.recv(64).split(b"\r\n", 1)[0]
+            return int(status_line.split()[1])
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def measure_import(module: str) -> float:
+    """Seconds to import module in a fresh interpreter"""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    with tempfile.TemporaryDirectory() as workdir:
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=workdir, capture_output=True, text=True, check=True,
+            env=dict(os.environ, PYTHONPATH=ROOT, BOT_TOKEN="0:bench", USER_STORE_DIR=workdir),
+        ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_start(args, timeout: float):
+    """Seconds from spawn to first /healthz and /readyz 200 (None if not reached)"""
+    port = free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PORT=str(port), BOT_TOKEN=os.getenv("BOT_TOKEN", "0:bench"), USER_STORE_DIR=workdir)
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable] + [os.path.join(ROOT, args[0])] + args[1:], cwd=workdir,
+                                   env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        healthy = ready = None
+        try:
+            while time.perf_counter() - started < timeout and process.poll() is None:
+                if healthy is None and get_status(port, "/healthz") == 200:
+                    healthy = time.perf_counter() - started
+                if healthy is not None and get_status(port, "/readyz") == 200:
+                    ready = time.perf_counter() - started
+                    break
+                time.sleep(0.005)
+        finally:
+            process.terminate()
+            process.wait()
+    return healthy, ready
+
+
+def fmt(values) -> str:
+    values = [value for value in values if value is not None]
+    if not values:
+        return "-"
+    return f"{statistics.median(values) * 1000:.0f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print("Import time (median):")
+    for module in ("telegram", "bot", "bot_old", "startup"):
+        print(f"  {module:<22}{fmt([measure_import(module) for _ in range(args.runs)])}")
+
+    print(f"\n{'entry point':<24}{'healthz':>10}{'readyz':>10}")
+    for name, entry in ENTRY_POINTS:
+        results = [measure_start(entry, args.timeout) for _ in range(args.runs)]
+        print(f"{name:<24}{fmt(r[0] for r in results):>10}{fmt(r[1] for r in results):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""Regression benchmarks for Database, SignalGenerator and message rendering
+
+Every Database method is timed against a database seeded with the same
+users and signals on every run (1k/100k/1M rows, fixed random seed),
+plus a full pass over broadcast recipients. Signal generation and
+message rendering do not depend on the data size and run once.
+
+Results are written as JSON and compared with a stored baseline. Each
+benchmark runs --rounds times and the middle round counts; one whose
+median is more than --threshold slower (and slower by at least
+--min-delta-us) is reported as a regression and the exit status is 1.
+Baselines are machine specific: record one on the machine that runs the
+comparison with --update-baseline.
+
+Usage: python benchmarks/bench_suite.py [--sizes 1k,100k,1m] [--output results.json]
+       [--baseline benchmarks/baseline.json] [--update-baseline] [--threshold 0.5]
+"""
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+from typing import Callable, Dict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from database import Database
+from signal_generator import SignalGenerator
+from messages import format_signal, format_signal_short, format_broadcast_signal, format_broadcast_message
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+SIZES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+ASSETS = ["EUR/USD", "GBP/USD", "USD/JPY", "USD/CHF", "AUD/USD", "USD/CAD"]
+FIRST_NAMES = [f"Name{i}" for i in range(500)]
+FIRST_USER_ID = 1_000_000_000
+
+
+def seed_database(path: str, count: int, seed: int) -> Database:
+    """Database with count users and count signals, identical for a given seed"""
+    rng = random.Random(seed)
+    db = Database(path)
+    now = datetime.utcnow()
+
+    def users():
+        for user_id in range(FIRST_USER_ID, FIRST_USER_ID + count):
+            # 70% confirmed, 20% pending, 10% blocked; half the confirmed on a plan ending within 90 days
+            roll = rng.random()
+            status = 'confirmed' if roll < 0.7 else 'pending' if roll < 0.9 else 'blocked'
+            expires_at = time.time() + rng.uniform(0, 90 * 86400) if roll < 0.35 else None
+            yield (user_id, rng.choice(FIRST_NAMES), str(user_id - FIRST_USER_ID + 10_000_000), status,
+                   'basic' if expires_at else None, expires_at)
+
+    def signals():
+        for _ in range(count):
+            created_at = now - timedelta(seconds=rng.randint(0, 30 * 24 * 3600))
+            resolved = created_at < now - timedelta(hours=1)
+            # Outcomes as the resolver writes them, a minute after creation
+            yield (rng.choice(ASSETS), rng.choice(["CALL", "PUT"]), "1мин", "1.08500", "1.08663",
+                   rng.randint(70, 95), created_at.strftime("%Y-%m-%d %H:%M:%S"),
+                   rng.choice(["win", "loss", "draw"]) if resolved else None,
+                   (created_at + timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S") if resolved else None)
+
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO users (user_id, first_name, platform_id, id_status, plan, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+            users()
+        )
+        conn.executemany("""
+            INSERT INTO signals (asset, signal_type, expiry_time, entry_price, target_price, accuracy, created_at, result, resolved_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, signals())
+    # Reopen so per-asset stats are backfilled from the inserted signals
+    return Database(path)
+
+
+def measure(call: Callable[[int], object], repeat: int, budget: float = 2.0) -> Dict[str, float]:
+    """Per-call median and p95 in microseconds; stops early after budget seconds"""
+    times = []
+    started = time.perf_counter()
+    for index in range(repeat):
+        call_started = time.perf_counter()
+        call(index)
+        times.append(time.perf_counter() - call_started)
+        if index >= 2 and time.perf_counter() - started > budget:
+            break
+    times.sort()
+    return {
+        'median_us': round(statistics.median(times) * 1e6, 2),
+        'p95_us': round(times[min(int(len(times) * 0.95), len(times) - 1)] * 1e6, 2),
+        'calls': len(times),
+    }
+
+
+def bench_database(db: Database, count: int, seed: int) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(seed)
+    existing = lambda: rng.randrange(FIRST_USER_ID, FIRST_USER_ID + count)
+    new_ids = iter(range(FIRST_USER_ID + count, FIRST_USER_ID + 2 * count + 100_000))
+    checkpoint = list(range(FIRST_USER_ID, FIRST_USER_ID + min(count, 1000)))
+    unresolved = [row['id'] for row in db.get_unresolved_signals()][:100] or [1]
+    results = {}
+
+    def run(name: str, call: Callable[[int], object], repeat: int = 200):
+        results[name] = measure(call, repeat)
+
+    # Point reads and writes
+    run("get_user", lambda i: db.get_user(existing()))
+    run("get_user_by_platform_id", lambda i: db.get_user_by_platform_id(str(existing() - FIRST_USER_ID + 10_000_000)))
+    run("add_user", lambda i: db.add_user(next(new_ids), "bench", "Bench"))
+    run("set_platform_id", lambda i: db.set_platform_id(FIRST_USER_ID + count + i, f"p{count + i}"))
+    run("confirm_user_id", lambda i: db.confirm_user_id(existing()))
+    run("block_user", lambda i: db.block_user(existing()))
+    run("confirm_users_100", lambda i: db.confirm_users([existing() for _ in range(100)]), 50)
+    run("block_users_100", lambda i: db.block_users([existing() for _ in range(100)]), 50)
+    run("update_user_activity", lambda i: db.update_user_activity(existing()))
+    run("acquire_lease", lambda i: db.acquire_lease("bench", "holder", 30, time.time()))
+    run("release_lease", lambda i: db.release_lease("bench", "holder"))
+
+    # Scans over users
+    run("get_all_users_detailed_10", lambda i: db.get_all_users_detailed(limit=10))
+    run("get_pending_users", lambda i: db.get_pending_users(), 20)
+    # One tap on the pending screen: counts, a page and a toggle
+    run("count_pending_users", lambda i: db.count_pending_users(), 50)
+    run("get_pending_page_10", lambda i: db.get_pending_page(rng.randrange(0, max(count // 10, 1)), 10), 50)
+    run("toggle_pending_selection", lambda i: db.toggle_pending_selection(existing()))
+    run("get_confirmed_users", lambda i: db.get_confirmed_users(), 20)
+    run("get_all_user_ids", lambda i: db.get_all_user_ids(), 20)
+    run("get_user_count", lambda i: db.get_user_count(), 50)
+    run("get_confirmed_user_count", lambda i: db.get_confirmed_user_count(), 50)
+
+    def recipients(i):
+        # What a broadcast does before its first send: fetch and walk the list
+        for user_id in db.get_confirmed_users():
+            pass
+    run("iterate_recipients", recipients, 20)
+
+    # Subscriptions
+    run("set_subscription", lambda i: db.set_subscription(existing(), "basic", 30))
+    run("get_expiring_users_1h", lambda i: db.get_expiring_users(time.time() + 3600), 50)
+    run("expire_users_10", lambda i: db.expire_users([existing() for _ in range(10)], time.time() + 90 * 86400), 50)
+
+    # Signals
+    run("add_signal", lambda i: db.add_signal("EUR/USD", "CALL", "1мин", "1.08500", "1.08663", 85))
+    run("get_active_signals", lambda i: db.get_active_signals(10), 50)
+    run("get_signals_since_24h", lambda i: db.get_signals_since(24), 20)
+    run("get_unresolved_signals", lambda i: db.get_unresolved_signals(), 20)
+    middle = (datetime.utcnow() - timedelta(days=15)).strftime("%Y-%m-%d %H:%M:%S")
+    run("get_signal_page_100", lambda i: db.get_signal_page(limit=100), 50)
+    run("get_signal_page_asset_cursor_100", lambda i: db.get_signal_page(ASSETS[0], before=(middle, 1 << 62), limit=100), 50)
+    run("get_signal_stats", lambda i: db.get_signal_stats(), 50)
+    run("set_signal_results_100", lambda i: db.set_signal_results([("win", "1.08700", signal_id) for signal_id in unresolved]), 50)
+    run("cleanup_old_signals", lambda i: db.cleanup_old_signals(days=60), 20)
+
+    # Shutdown checkpoints
+    run("save_broadcast_checkpoint", lambda i: db.save_broadcast_checkpoint("bench", checkpoint), 50)
+    run("take_broadcast_checkpoints", lambda i: db.take_broadcast_checkpoints(), 50)
+    return results
+
+
+def bench_signals(seed: int) -> Dict[str, Dict[str, float]]:
+    random.seed(seed)
+    generator = SignalGenerator()
+    signal = generator.generate_signal("EUR/USD", "1мин")
+    results = {}
+
+    def cold(i):
+        generator._signal_cache.clear()
+        generator.generate_signal()
+
+    results["generate_signal_cached"] = measure(lambda i: generator.generate_signal("EUR/USD", "1мин"), 5000)
+    results["generate_signal_uncached"] = measure(cold, 5000)
+    results["generate_multiple_signals_3"] = measure(lambda i: generator.generate_multiple_signals(3), 2000)
+    results["format_signal"] = measure(lambda i: format_signal(signal), 5000)
+    results["format_signal_short"] = measure(lambda i: format_signal_short(signal), 5000)
+    results["format_broadcast_signal"] = measure(lambda i: format_broadcast_signal("EUR/USD ВВЕРХ 1мин"), 5000)
+    results["format_broadcast_message"] = measure(lambda i: format_broadcast_message("Сегодня торгов не будет"), 5000)
+    return results
+
+
+def run_suite(sizes, seed: int, rounds: int) -> Dict[str, Dict[str, float]]:
+    runs = {}  # name -> result of each round
+    for _ in range(rounds):
+        for name, value in bench_signals(seed).items():
+            runs.setdefault(f"signals/{name}", []).append(value)
+    for label in sizes:
+        for _ in range(rounds):
+            with tempfile.TemporaryDirectory() as workdir:
+                started = time.perf_counter()
+                db = seed_database(os.path.join(workdir, "bench.db"), SIZES[label], seed)
+                print(f"Seeded {label} users and signals in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+                for name, value in bench_database(db, SIZES[label], seed).items():
+                    runs.setdefault(f"db/{label}/{name}", []).append(value)
+
+    # The round with the median median; commits that hit a slow disk flush make single rounds jumpy
+    return {name: sorted(values, key=lambda value: value['median_us'])[len(values) // 2]
+            for name, values in runs.items()}
+
+
+def compare(results, baseline, threshold: float, min_delta_us: float) -> int:
+    """Print the comparison table, return the number of regressions"""
+    regressions = 0
+    print(f"{'benchmark':<48}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, value in results.items():
+        before = baseline.get(name)
+        current = value['median_us']
+        if before is None:
+            print(f"{name:<48}{'-':>12}{current:>10.1f}us{'new':>9}")
+            continue
+        change = current / before['median_us'] - 1 if before['median_us'] else 0.0
+        regressed = change > threshold and current - before['median_us'] > min_delta_us
+        regressions += regressed
+        print(f"{name:<48}{before['median_us']:>10.1f}us{current:>10.1f}us{change:>+8.0%}{' REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1k,100k", help=f"comma separated, of {','.join(SIZES)}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rounds", type=int, default=3, help="repeat each benchmark, the middle round counts")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed slowdown, 0.5 = 50%%")
+    parser.add_argument("--min-delta-us", type=float, default=20.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    sizes = [size.strip().lower() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+
+    logging.disable(logging.INFO)
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': platform.machine(),
+            'seed': args.seed,
+            'rounds': args.rounds,
+            'sizes': sizes,
+        },
+        'results': run_suite(sizes, args.seed, args.rounds),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    else:
+        print(f"No baseline at {args.baseline}, nothing to compare with")
+
+    regressions = compare(report['results'], baseline, args.threshold, args.min_delta_us)
+    if regressions:
+        print(f"\n{regressions} regressions over {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Memory per user: plain dicts (old bot.py) vs UserRecord
+
+Usage: python benchmarks/bench_user_memory.py [--users N]
+"""
+import os
+import sys
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from user_store import UserRecord, STATUS_CODES
+
+FIRST_NAMES = [f"Name{i}" for i in range(500)]
+STATUSES = ['new', 'pending', 'confirmed', 'blocked']
+
+
+def make_rows(count: int, seed: int = 42):
+    """Simulated update data; every name is a fresh string like in parsed updates"""
+    rng = random.Random(seed)
+    for user_id in range(1_000_000_000, 1_000_000_000 + count):
+        name = rng.choice(FIRST_NAMES).encode().decode()
+        status = rng.choice(STATUSES)
+        platform_id = str(rng.randint(10_000_000, 99_999_999)) if status != 'new' else None
+        yield user_id, name, status, platform_id
+
+
+def measure(build, count: int) -> float:
+    """Bytes allocated per user by build()"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    users = build(count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(users) == count
+    return (after - before) / count
+
+
+def build_dicts(count: int):
+    return {user_id: {'name': name, 'status': status, 'platform_id': platform_id}
+            for user_id, name, status, platform_id in make_rows(count)}
+
+
+def build_records(count: int):
+    return {user_id: UserRecord(name, STATUS_CODES[status], platform_id)
+            for user_id, name, status, platform_id in make_rows(count)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    args = parser.parse_args()
+
+    before = measure(build_dicts, args.users)
+    after = measure(build_records, args.users)
+
+    print(f"users:           {args.users}")
+    print(f"dict per user:   {before:.0f} bytes")
+    print(f"record per user: {after:.0f} bytes")
+    print(f"saved:           {(1 - after / before) * 100:.0f}%"
+          f" ({(before - after) * 1_000_000 / 2 ** 20:.0f} MB per million users)")
+
+
+if __name__ == "__main__":
+    main()
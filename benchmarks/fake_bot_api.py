@@ -0,0 +1,216 @@
+"""In-process fake of the Telegram Bot API for load tests
+
+Serves the methods the bots use (getMe, getUpdates, sendMessage,
+editMessageText, answerCallbackQuery, webhook calls) on the repo's own
+HttpServer. Point a bot at it with BOT_API_URL=http://127.0.0.1:<port>.
+Every call can be delayed, sends can fail with 429 Too Many Requests, and
+chosen users answer 403 as if they blocked the bot.
+
+Usage: python benchmarks/fake_bot_api.py [--port N] [--latency S]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter, deque
+from typing import Callable, Dict, Optional, Set
+from urllib.parse import parse_qsl
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from http_server import HttpServer, Request, Response
+
+# Parameters PTB sends as plain strings rather than JSON
+_STRING_PARAMETERS = {'text', 'parse_mode', 'callback_query_id', 'url', 'secret_token'}
+
+
+def _parse_parameters(request: Request) -> Dict[str, object]:
+    if request.headers.get("content-type", "").startswith("application/json"):
+        return request.json() or {}
+    parameters = {}
+    for name, value in parse_qsl(request.body.decode()):
+        if name in _STRING_PARAMETERS:
+            parameters[name] = value
+            continue
+        try:
+            parameters[name] = json.loads(value)
+        except ValueError:
+            parameters[name] = value
+    return parameters
+
+
+def _error(code: int, description: str, retry_after: int = None) -> Response:
+    body = {'ok': False, 'error_code': code, 'description': description}
+    if retry_after is not None:
+        body['parameters'] = {'retry_after': retry_after}
+    return Response.json(body, code)
+
+
+class FakeBotApi:
+    """Bot API double with injectable latency and failures
+
+    Updates pushed with push_update() are handed out by getUpdates in
+    order. on_edit and on_send are called for every successful
+    editMessageText and sendMessage with (chat_id, message_id, text).
+    """
+
+    def __init__(self, port: int = 8081, latency: float = 0.0, jitter: float = 0.0,
+                 retry_after_rate: float = 0.0, retry_after: int = 1, forbidden: Set[int] = None,
+                 seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.forbidden = forbidden or set()
+        self.random = random.Random(seed)
+
+        self.calls = Counter()
+        self.errors = Counter()  # (method, code)
+        self.on_edit: Optional[Callable[[int, int, str], None]] = None
+        self.on_send: Optional[Callable[[int, int, str], None]] = None
+        self.on_deliver: Optional[Callable[[dict], None]] = None
+
+        self._updates = deque()
+        self._next_update_id = 1
+        self._next_message_id = 1_000_000_000
+        self._new_updates = asyncio.Event()
+
+        self.http = HttpServer(host="127.0.0.1", port=port, max_body=16 * 1024 * 1024)
+        self.http.route("POST", "/bot", self._handle, prefix=True)
+        self.http.route("GET", "/bot", self._handle, prefix=True)
+
+        self._methods = {
+            'getMe': self._get_me,
+            'getUpdates': self._get_updates,
+            'sendMessage': self._send_message,
+            'editMessageText': self._edit_message_text,
+        }
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.http.port}"
+
+    async def start(self):
+        await self.http.start()
+
+    async def stop(self):
+        # Wake pending long polls so their connections close with the server
+        self._new_updates.set()
+        await self.http.stop()
+
+    def push_update(self, update: dict):
+        update['update_id'] = self._next_update_id
+        self._next_update_id += 1
+        self._updates.append(update)
+        self._new_updates.set()
+
+    async def _handle(self, request: Request) -> Response:
+        # /bot<token>/<method>
+        method = request.path.rsplit("/", 1)[-1]
+        self.calls[method] += 1
+        parameters = _parse_parameters(request)
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0))
+
+        handler = self._methods.get(method)
+        if handler is None:
+            # deleteWebhook, setWebhook, answerCallbackQuery and the rest
+            return Response.json({'ok': True, 'result': True})
+        response = await handler(parameters)
+        if response.status != 200:
+            self.errors[(method, response.status)] += 1
+        return response
+
+    async def _get_me(self, parameters) -> Response:
+        return Response.json({'ok': True, 'result': {
+            'id': 1, 'is_bot': True, 'first_name': 'Load test', 'username': 'load_test_bot',
+            'can_join_groups': False, 'can_read_all_group_messages': False, 'supports_inline_queries': False,
+        }})
+
+    async def _get_updates(self, parameters) -> Response:
+        offset = int(parameters.get('offset') or 0)
+        limit = int(parameters.get('limit') or 100)
+        timeout = float(parameters.get('timeout') or 0)
+
+        while self._updates and self._updates[0]['update_id'] < offset:
+            self._updates.popleft()
+
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        # Confirmed updates are dropped on the next call with a higher offset
+        batch = [self._updates[index] for index in range(min(limit, len(self._updates)))]
+        if self.on_deliver:
+            for update in batch:
+                self.on_deliver(update)
+        return Response.json({'ok': True, 'result': batch})
+
+    def _refuse(self, chat_id: int) -> Optional[Response]:
+        if chat_id in self.forbidden:
+            return _error(403, "Forbidden: bot was blocked by the user")
+        if self.retry_after_rate and self.random.random() < self.retry_after_rate:
+            return _error(429, f"Too Many Requests: retry after {self.retry_after}", self.retry_after)
+        return None
+
+    def _message(self, chat_id: int, message_id: int, text: str) -> dict:
+        return {
+            'message_id': message_id, 'date': int(time.time()), 'text': text,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': 1, 'is_bot': True, 'first_name': 'Load test'},
+        }
+
+    async def _send_message(self, parameters) -> Response:
+        chat_id = int(parameters['chat_id'])
+        refused = self._refuse(chat_id)
+        if refused:
+            return refused
+        message_id = self._next_message_id
+        self._next_message_id += 1
+        if self.on_send:
+            self.on_send(chat_id, message_id, parameters.get('text', ''))
+        return Response.json({'ok': True, 'result': self._message(chat_id, message_id, parameters.get('text', ''))})
+
+    async def _edit_message_text(self, parameters) -> Response:
+        chat_id = int(parameters['chat_id'])
+        message_id = int(parameters['message_id'])
+        refused = self._refuse(chat_id)
+        if refused:
+            return refused
+        if self.on_edit:
+            self.on_edit(chat_id, message_id, parameters.get('text', ''))
+        return Response.json({'ok': True, 'result': self._message(chat_id, message_id, parameters.get('text', ''))})
+
+
+async def serve(args):
+    api = FakeBotApi(port=args.port, latency=args.latency, jitter=args.jitter,
+                     retry_after_rate=args.retry_after_rate, retry_after=args.retry_after)
+    await api.start()
+    print(f"Fake Bot API on {api.url}, set BOT_API_URL to it")
+    while True:
+        await asyncio.sleep(10)
+        print(" ".join(f"{method}={count}" for method, count in sorted(api.calls.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="share of sends answered 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
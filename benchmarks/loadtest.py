@@ -0,0 +1,217 @@
+"""Load test: button presses from many users while a broadcast runs
+
+Starts the fake Bot API (fake_bot_api.py), seeds confirmed users, spawns
+the bot pointed at the fake and, after the admin sends a signal, keeps
+feeding callback queries at a fixed rate from random users. Reported:
+
+- handler latency: from getUpdates handing out a button press to the
+  bot's editMessageText for that message (p50/p99)
+- taps the bot did not answer with an edit (rate limited or dropped)
+- broadcast throughput: sendMessage calls to users per second, and
+  the 429/403 answers the fake injected
+
+Usage: python benchmarks/loadtest.py [--entry bot.py|bot_old.py|all] [--users N]
+       [--rate TAPS_PER_S] [--duration S] [--latency S] [--retry-after-rate P] [--forbidden P]
+"""
+import os
+import sys
+import time
+import random
+import signal
+import socket
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from fake_bot_api import FakeBotApi  # noqa: E402
+
+ADMIN_ID = 1
+FIRST_USER_ID = 100_000
+
+# Buttons of the user menu in each entry point
+CALLBACK_DATA = {
+    'bot.py': ["register", "send_id", "signal", "back"],
+    'bot_old.py': ["register", "send_id", "get_signal", "back_user"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed_users(entry: str, workdir: str, user_ids):
+    """Store user_ids as confirmed users where the entry point reads them"""
+    if entry == 'bot.py':
+        from user_store import UserStore, UserRecord, STATUS_CONFIRMED
+        store = UserStore(workdir)
+        store.load()
+        for user_id in user_ids:
+            store.users[user_id] = UserRecord(f"User {user_id % 1000}", STATUS_CONFIRMED, str(user_id))
+        store.compact()
+        store.close()
+    else:
+        from database import Database
+        db = Database(os.path.join(workdir, "bot_database.db"))
+        with db.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO users (user_id, first_name, platform_id, id_status) VALUES (?, ?, ?, 'confirmed')",
+                ((user_id, f"User {user_id % 1000}", str(user_id)) for user_id in user_ids)
+            )
+
+
+def user(user_id: int) -> dict:
+    return {'id': user_id, 'is_bot': False, 'first_name': f"User {user_id % 1000}"}
+
+
+def message(user_id: int, message_id: int, text: str, sender: dict = None) -> dict:
+    result = {'message_id': message_id, 'date': int(time.time()), 'text': text,
+              'chat': {'id': user_id, 'type': 'private'}}
+    if sender:
+        result['from'] = sender
+    return result
+
+
+def percentile(values, share: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+class LoadTest:
+    def __init__(self, entry: str, args):
+        self.entry = entry
+        self.args = args
+        self.random = random.Random(args.seed)
+
+        self.user_ids = list(range(FIRST_USER_ID, FIRST_USER_ID + args.users))
+        forbidden = set(self.random.sample(self.user_ids, int(len(self.user_ids) * args.forbidden)))
+        # Users who blocked the bot do not press its buttons
+        self.tappers = [user_id for user_id in self.user_ids if user_id not in forbidden]
+
+        self.api = FakeBotApi(port=free_port(), latency=args.latency, jitter=args.jitter,
+                              retry_after_rate=args.retry_after_rate, forbidden=forbidden, seed=args.seed)
+        self.api.on_deliver = self._on_deliver
+        self.api.on_edit = self._on_edit
+        self.api.on_send = self._on_send
+
+        self.delivered = {}  # (chat_id, message_id) -> time handed to the bot
+        self.latencies = []
+        self.taps = 0
+        self.broadcast_sends = []  # times of sendMessage to users
+
+    def _on_deliver(self, update: dict):
+        query = update.get('callback_query')
+        if query:
+            self.delivered.setdefault((query['from']['id'], query['message']['message_id']), time.perf_counter())
+
+    def _on_edit(self, chat_id: int, message_id: int, text: str):
+        delivered = self.delivered.pop((chat_id, message_id), None)
+        if delivered is not None:
+            self.latencies.append(time.perf_counter() - delivered)
+
+    def _on_send(self, chat_id: int, message_id: int, text: str):
+        if chat_id != ADMIN_ID:
+            self.broadcast_sends.append(time.perf_counter())
+
+    def tap(self, message_id: int):
+        user_id = self.random.choice(self.tappers)
+        self.api.push_update({'callback_query': {
+            'id': str(message_id), 'from': user(user_id), 'chat_instance': str(user_id),
+            'data': self.random.choice(CALLBACK_DATA[self.entry]),
+            'message': message(user_id, message_id, "menu"),
+        }})
+        self.taps += 1
+
+    async def run(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            seed_users(self.entry, workdir, self.user_ids)
+            await self.api.start()
+
+            env = dict(os.environ, BOT_TOKEN="123456:loadtest", BOT_API_URL=self.api.url,
+                       ADMIN_USER_ID=str(ADMIN_ID), PORT=str(free_port()), USER_STORE_DIR=workdir)
+            env.pop('WEBHOOK_URL', None)
+            with open(os.path.join(workdir, "output.log"), "wb") as output:
+                process = subprocess.Popen([sys.executable, os.path.join(ROOT, self.entry)], cwd=workdir,
+                                           env=env, stdout=output, stderr=subprocess.STDOUT)
+                try:
+                    await self._drive(process)
+                finally:
+                    process.send_signal(signal.SIGTERM)
+                    await asyncio.get_running_loop().run_in_executor(None, process.wait)
+                    await self.api.stop()
+
+    async def _drive(self, process):
+        args = self.args
+        started = time.perf_counter()
+        while not self.api.calls['getUpdates']:
+            if process.poll() is not None or time.perf_counter() - started > 30:
+                raise RuntimeError(f"{self.entry} did not start polling")
+            await asyncio.sleep(0.05)
+
+        # The admin's signal starts a broadcast to every user
+        self.api.push_update({'message': message(ADMIN_ID, 1, "EUR/USD ВВЕРХ 1мин", user(ADMIN_ID))})
+
+        # Open loop: presses keep coming at the set rate however slow the bot is
+        message_id = 2
+        started = time.perf_counter()
+        while (elapsed := time.perf_counter() - started) < args.duration:
+            while self.taps < args.rate * elapsed:
+                self.tap(message_id)
+                message_id += 1
+            await asyncio.sleep(0.01)
+        self.elapsed = time.perf_counter() - started
+
+        # Give the last presses a moment to be answered
+        deadline = time.perf_counter() + args.settle
+        while self.delivered and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+
+    def report(self):
+        errors = self.api.errors
+        print(f"\n{self.entry}: {self.taps} taps from {len(self.tappers)} users in {self.elapsed:.1f} s, "
+              f"broadcast to {len(self.user_ids)} users")
+        if self.latencies:
+            print(f"  handler latency    p50 {statistics.median(self.latencies) * 1000:.1f} ms  "
+                  f"p99 {percentile(self.latencies, 0.99) * 1000:.1f} ms  "
+                  f"max {max(self.latencies) * 1000:.1f} ms")
+        print(f"  answered           {len(self.latencies)} taps, {self.taps - len(self.latencies)} "
+              f"without an edit (rate limited or dropped)")
+        sends = self.broadcast_sends
+        if len(sends) > 1:
+            rate = (len(sends) - 1) / (sends[-1] - sends[0])
+            print(f"  broadcast          {len(sends)} sent, {rate:.0f} msg/s")
+        else:
+            print(f"  broadcast          {len(sends)} sent")
+        print(f"  injected errors    429: {errors[('sendMessage', 429)] + errors[('editMessageText', 429)]}  "
+              f"403: {errors[('sendMessage', 403)]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entry", choices=["bot.py", "bot_old.py", "all"], default="all")
+    parser.add_argument("--users", type=int, default=20000, help="confirmed users, all receive the broadcast")
+    parser.add_argument("--rate", type=float, default=100, help="button presses per second")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--settle", type=float, default=5, help="seconds to wait for late answers")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds the fake API takes per call")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--retry-after-rate", type=float, default=0.01, help="share of calls answered 429")
+    parser.add_argument("--forbidden", type=float, default=0.05, help="share of users who blocked the bot")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    entries = ["bot.py", "bot_old.py"] if args.entry == "all" else [args.entry]
+    for entry in entries:
+        test = LoadTest(entry, args)
+        asyncio.run(test.run())
+        test.report()
+
+
+if __name__ == "__main__":
+    main()
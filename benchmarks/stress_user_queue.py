@@ -0,0 +1,125 @@
+"""Stress test for UserSerializer with thousands of concurrent users
+
+Checks that updates of one user never overlap and finish in arrival
+order, that different users run in parallel, and that the backlog bound
+holds. Exits with status 1 on any violation.
+
+Usage: python benchmarks/stress_user_queue.py [--users N] [--updates N]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from user_queue import UserSerializer, UserBacklogFull
+
+
+async def stress(users: int, updates: int, backlog: int, seed: int) -> bool:
+    rng = random.Random(seed)
+    serializer = UserSerializer(max_backlog=backlog)
+
+    running_per_user = {}
+    completed = {user_id: [] for user_id in range(users)}
+    rejected = {user_id: [] for user_id in range(users)}
+    concurrency = {'now': 0, 'max': 0}
+    max_waiting = {}  # user_id -> longest backlog seen
+    violations = []
+
+    def observe_backlog(user_id: int):
+        waiting = len(serializer._queues.get(user_id, ()))
+        if waiting > max_waiting.get(user_id, 0):
+            max_waiting[user_id] = waiting
+
+    async def handler(user_id: int, sequence: int, delay: float):
+        if running_per_user.get(user_id):
+            violations.append(f"user {user_id}: update {sequence} overlapped another update")
+        running_per_user[user_id] = True
+        observe_backlog(user_id)
+        concurrency['now'] += 1
+        concurrency['max'] = max(concurrency['max'], concurrency['now'])
+        try:
+            await asyncio.sleep(delay)
+            if rng.random() < 0.01:
+                raise RuntimeError("simulated handler failure")
+        finally:
+            concurrency['now'] -= 1
+            running_per_user[user_id] = False
+            completed[user_id].append(sequence)
+
+    async def submit(user_id: int, sequence: int, delay: float):
+        try:
+            await serializer.run(user_id, handler, user_id, sequence, delay)
+        except UserBacklogFull:
+            rejected[user_id].append(sequence)
+        except RuntimeError:
+            pass
+
+    # Every user sends a burst; arrival order is the task creation order
+    tasks = []
+    for sequence in range(updates):
+        for user_id in range(users):
+            tasks.append(asyncio.create_task(submit(user_id, sequence, rng.uniform(0, 0.002))))
+        await asyncio.sleep(0)
+        for user_id in range(users):
+            observe_backlog(user_id)
+
+    # Cancel a few waiting updates to exercise hand-over on cancellation
+    for task in rng.sample(tasks, min(len(tasks) // 100, 200)):
+        task.cancel()
+
+    started = time.perf_counter()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    for user_id, sequences in completed.items():
+        if sequences != sorted(sequences):
+            violations.append(f"user {user_id}: out of order {sequences}")
+
+    if serializer.active_users or serializer.backlog:
+        violations.append(f"state leak: {serializer.active_users} active users, {serializer.backlog} waiting")
+
+    total_completed = sum(len(sequences) for sequences in completed.values())
+    total_rejected = sum(len(sequences) for sequences in rejected.values())
+    longest_backlog = max(max_waiting.values(), default=0)
+    if longest_backlog > backlog:
+        over = [user_id for user_id, waiting in max_waiting.items() if waiting > backlog]
+        violations.append(f"backlog bound {backlog} exceeded by {len(over)} users, longest {longest_backlog}")
+    if serializer.rejected != total_rejected:
+        violations.append(f"serializer counted {serializer.rejected} rejections, callers got {total_rejected}")
+    if updates > backlog + 1 and not total_rejected:
+        violations.append(f"bursts of {updates} updates never hit the backlog bound {backlog}")
+    print(f"users:            {users}")
+    print(f"updates:          {users * updates}")
+    print(f"completed:        {total_completed}")
+    print(f"rejected:         {total_rejected} (backlog {backlog})")
+    print(f"longest backlog:  {longest_backlog}")
+    print(f"max concurrency:  {concurrency['max']}")
+    print(f"time:             {elapsed:.2f} s ({total_completed / elapsed:.0f} updates/s)")
+
+    if concurrency['max'] <= 1 and users > 1:
+        violations.append("users did not run in parallel")
+
+    for violation in violations[:20]:
+        print("VIOLATION:", violation)
+    print("OK" if not violations else f"FAILED: {len(violations)} violations")
+    return not violations
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--updates", type=int, default=20)
+    parser.add_argument("--backlog", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    ok = asyncio.run(stress(args.users, args.updates, args.backlog, args.seed))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
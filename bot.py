@@ -1,105 +1,221 @@
 import os
+import signal
+import asyncio
 import logging
+from startup_timer import StartupTimer  # первым, чтобы время запуска включало импорты ниже
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
 from telegram.constants import ParseMode
+from telegram.error import RetryAfter, TelegramError
 import random
 from datetime import datetime
 
-# Подробное логирование
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from user_store import UserStore, STATUS_CONFIRMED, on_mounted_volume
+from http_server import HttpServer, add_health_routes, add_webhook_route
+from http_pool import build_requests, bulk_sends
+from admin_digest import AdminDigest, CONFIRM_ALL_PREFIX
+from metrics import instrument_handler, timed_send, add_metrics_route, RATE_LIMITED, BROADCAST_QUEUE_DEPTH
+from tracing import Tracer, SamplingProfiler, span, parse_seconds
+from user_queue import UserSerializer, UserBacklogFull
+from rate_limit import TokenBucketLimiter
+from menus import MenuRegistry
+from shutdown import ShutdownCoordinator, FileCheckpoints
+from logging_setup import setup_logging, stop_logging, parse_sample_rates
+
+# Логи пишет фоновый поток; события обновлений (event=update) можно сэмплировать,
+# например LOG_SAMPLE_RATES="update=0.1"
+setup_logging(
+    os.getenv('LOG_LEVEL', 'INFO'),
+    sample_rates=parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', 'update=0.1')),
+    json_output=os.getenv('LOG_FORMAT') == 'json'
 )
 logger = logging.getLogger(__name__)
 
 # Конфигурация
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 ADMIN_ID = int(os.getenv('ADMIN_USER_ID', '0'))
+# Другой сервер Bot API: локальный telegram-bot-api или заглушка для нагрузочных тестов
+BOT_API_URL = os.getenv('BOT_API_URL', 'https://api.telegram.org')
+PORT = int(os.getenv('PORT', 8080))
+
+# Вебхук включается, если задан публичный адрес сервиса
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')  # обязателен при WEBHOOK_URL: A-Z a-z 0-9 _ -, до 256 символов
+WEBHOOK_PATH = '/telegram/webhook'
+
+# Трассировка: доля трассируемых обновлений и порог медленных
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0))
+TRACE_SLOW_MS = float(os.getenv('TRACE_SLOW_MS', 1000))
+
+# Сколько обновлений одного пользователя может ждать в очереди
+USER_QUEUE_BACKLOG = int(os.getenv('USER_QUEUE_BACKLOG', 10))
+
+# Ограничение частоты нажатий кнопок: пополнение в секунду и запас подряд
+CALLBACK_RATE = float(os.getenv('CALLBACK_RATE', 1.0))
+CALLBACK_BURST = int(os.getenv('CALLBACK_BURST', 5))
+
+# Новые ID приходят админу одной сводкой: копятся ADMIN_DIGEST_WINDOW секунд, затем сообщение
+# редактируется. Через ADMIN_DIGEST_MAX_AGE секунд начинается новое сообщение, чтобы админ получил уведомление
+ADMIN_DIGEST_WINDOW = float(os.getenv('ADMIN_DIGEST_WINDOW', 5))
+ADMIN_DIGEST_MAX_AGE = float(os.getenv('ADMIN_DIGEST_MAX_AGE', 3600))
+
+# Отдельные пулы соединений к Bot API: getUpdates, ответы пользователям и рассылки.
+# Ответ ждет свободное соединение не дольше HTTP_POOL_TIMEOUT, рассылка ждет сколько нужно
+HTTP_POOL_SIZE_UPDATES = 2
+HTTP_POOL_SIZE_INTERACTIVE = int(os.getenv('HTTP_POOL_SIZE_INTERACTIVE', 64))
+HTTP_POOL_SIZE_BULK = int(os.getenv('HTTP_POOL_SIZE_BULK', 8))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', 30))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 5))
+HTTP_WRITE_TIMEOUT = float(os.getenv('HTTP_WRITE_TIMEOUT', 5))
+HTTP_POOL_TIMEOUT = float(os.getenv('HTTP_POOL_TIMEOUT', 5))
+
+# Сколько секунд при остановке даем рассылкам завершиться, прежде чем сохранить остаток
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', 8))
 
 logger.info(f"BOT_TOKEN: {'SET' if BOT_TOKEN else 'NOT SET'}")
 logger.info(f"ADMIN_ID: {ADMIN_ID}")
 
-# Простая база данных в памяти
-users = {}
-pending_ids = {}
+# Пользователи в памяти, изменения пишутся в журнал на диске. Диск контейнера
+# Cloud Run пропадает при перезапуске: USER_STORE_DIR должен быть подключенным томом
+store = UserStore(os.getenv('USER_STORE_DIR', 'data'))
+users = store.users
+pending_ids = store.pending_ids
+
+# Получатели рассылок, прерванных остановкой. Новый экземпляр видит их, только
+# если USER_STORE_DIR на общем томе, иначе файл пропадает вместе с контейнером
+checkpoints = FileCheckpoints(os.path.join(store.directory, 'broadcasts.jsonl'))
+
+# Статические экраны собираются один раз при запуске
+MENUS = MenuRegistry()
+MENUS.add_keyboard("user_menu", [
+    [("🔗 Регистрация", "register")],
+    [("🆔 Отправить ID", "send_id")],
+    [("📈 Сигнал", "signal")],
+    [("🤝 Поддержка", None, "https://t.me/razgondepoz1ta")],
+])
+MENUS.add_keyboard("admin_menu", [
+    [("👥 Пользователи", "users")],
+    [("✅ Подтвердить", "confirm")],
+    [("📢 Сигнал всем", "broadcast")],
+])
+MENUS.add_keyboard("back", [[("🔙 Назад", "back")]])
+MENUS.add_keyboard("back_admin", [[("🔙 Назад", "back_admin")]])
+MENUS.add_keyboard("back_confirm", [[("🔙 Назад", "confirm")]])
+
+MENUS.add_screen("user_menu", "👋 <b>Добро пожаловать!</b>\n\n1. Зарегистрируйтесь\n2. Отправьте ID\n3. Получите сигналы", "user_menu")
+MENUS.add_screen("admin_menu", "👋 <b>Админ-панель</b>", "admin_menu")
+MENUS.add_screen("register", "🔗 <b>Регистрация</b>\n\nПерейдите: https://bit.ly/4jb8a4k\n\nПосле регистрации отправьте ID.", "back")
+MENUS.add_screen("send_id", "🆔 <b>Отправьте ваш ID</b>\n\nНапишите ID после регистрации:", "back")
+MENUS.add_screen("access_denied", "⛔️ <b>Доступ закрыт</b>\n\nДождитесь подтверждения.", "back")
+MENUS.add_screen("no_pending", "⏳ Нет пользователей для подтверждения", "back_admin", parse_mode=None)
+MENUS.add_screen("digest_stale", "⌛ Сводка устарела, откройте список", "back_admin", parse_mode=None)
+MENUS.add_screen("broadcast", "📢 <b>Отправьте сигнал</b>\n\nНапишите сигнал в формате:\nАктив ВХОД Время", "back_admin")
+
+BACK_ADMIN_ROW = MENUS.keyboard("back_admin").inline_keyboard[0]
+
+ACCESS_CONFIRMED_TEXT = "✅ <b>Доступ подтвержден!</b>"
 
 class SimpleBot:
-    def __init__(self):
+    def __init__(self, http: HttpServer = None, startup: StartupTimer = None):
+        self.startup = startup or StartupTimer()
         self.app = None
+        self.ready = False
+        self.http = http or HttpServer(port=PORT)
+        add_health_routes(self.http, lambda: self.ready)
+        add_metrics_route(self.http)
+        self.tracer = Tracer(TRACE_SAMPLE_RATE, TRACE_SLOW_MS)
+        self.profiler = SamplingProfiler()
+        self.user_queue = UserSerializer(max_backlog=USER_QUEUE_BACKLOG)
+        self.callback_limiter = TokenBucketLimiter(CALLBACK_RATE, CALLBACK_BURST)
+        self.admin_digest = AdminDigest(self._send_digest, self._edit_digest, ADMIN_DIGEST_WINDOW, ADMIN_DIGEST_MAX_AGE)
+        self.background_tasks = []
+        self.shutdown = ShutdownCoordinator(SHUTDOWN_DRAIN_TIMEOUT)
+        
+        # Порядок остановки: прием обновлений, фоновые задачи, рассылки, сводка админу, Telegram, журнал, HTTP, логи
+        self.shutdown.add_step("stop intake", self._stop_intake)
+        self.shutdown.add_step("stop background tasks", self._stop_background_tasks)
+        self.shutdown.add_step("drain broadcasts", self.shutdown.drain)
+        self.shutdown.add_step("flush admin digest", self.admin_digest.close)
+        self.shutdown.add_step("stop application", self._stop_application)
+        self.shutdown.add_step("flush user store", store.close)
+        self.shutdown.add_step("stop http", self.http.stop)
+        self.shutdown.add_step("flush logs", stop_logging)
+    
+    async def _stop_intake(self):
+        """Снять готовность и прекратить получение обновлений; вебхук отвечает 503"""
+        self.ready = False
+        if self.app and self.app.updater and self.app.updater.running:
+            await self.app.updater.stop()
+    
+    async def _stop_background_tasks(self):
+        """Остановить фоновые задачи и профилирование; начатые рассылки дорабатывают до дедлайна"""
+        for task in self.background_tasks:
+            task.cancel()
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
+        await self.shutdown.cancel_tasks()
+    
+    async def _stop_application(self):
+        """Обработать оставшиеся обновления и закрыть соединения с Telegram"""
+        if not self.app:
+            return
+        if self.app.running:
+            await self.app.stop()
+        await self.app.shutdown()
+    
+    async def send_message(self, chat_id, text, **kwargs):
+        """Отправка сообщения с замером времени и ошибок"""
+        return await timed_send("sendMessage", self.app.bot.send_message(chat_id, text, **kwargs))
+    
+    async def _send_digest(self, text, keyboard):
+        message = await self.send_message(ADMIN_ID, text, reply_markup=keyboard, parse_mode=ParseMode.HTML)
+        return message.message_id
+    
+    async def _edit_digest(self, message_id, text, keyboard):
+        await timed_send("editMessageText", self.app.bot.edit_message_text(
+            text, chat_id=ADMIN_ID, message_id=message_id, reply_markup=keyboard, parse_mode=ParseMode.HTML
+        ))
     
+    @instrument_handler("start")
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка команды /start"""
-        logger.info(f"START command from user {update.effective_user.id}")
-        
         user = update.effective_user
         user_id = user.id
+        logger.info("Start", extra={'event': 'update', 'user_id': user_id})
         
         # Добавляем пользователя
-        if user_id not in users:
-            users[user_id] = {
-                'name': user.first_name or user.username,
-                'status': 'new',
-                'platform_id': None
-            }
-            logger.info(f"New user added: {user_id}")
+        if store.add_user(user_id, user.first_name or user.username):
+            logger.info("New user", extra={'user_id': user_id})
         
         # Показываем меню
         if user_id == ADMIN_ID:
-            logger.info("Showing admin menu")
             await self.show_admin_menu(update.message.reply_text)
         else:
-            logger.info("Showing user menu")
             await self.show_user_menu(update.message.reply_text)
     
     async def show_user_menu(self, reply_func):
         """Показать меню пользователя"""
-        logger.info("Creating user menu")
-        keyboard = [
-            [InlineKeyboardButton("🔗 Регистрация", callback_data="register")],
-            [InlineKeyboardButton("🆔 Отправить ID", callback_data="send_id")],
-            [InlineKeyboardButton("📈 Сигнал", callback_data="signal")],
-            [InlineKeyboardButton("🤝 Поддержка", url="https://t.me/razgondepoz1ta")]
-        ]
-        
         try:
-            await reply_func(
-                "👋 <b>Добро пожаловать!</b>\n\n1. Зарегистрируйтесь\n2. Отправьте ID\n3. Получите сигналы",
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode=ParseMode.HTML
-            )
-            logger.info("User menu sent successfully")
+            await MENUS.show("user_menu", reply_func)
         except Exception as e:
-            logger.error(f"Error sending user menu: {e}")
+            logger.error("Error sending user menu: %s", e)
     
     async def show_admin_menu(self, reply_func):
         """Показать админ меню"""
-        logger.info("Creating admin menu")
-        keyboard = [
-            [InlineKeyboardButton("👥 Пользователи", callback_data="users")],
-            [InlineKeyboardButton("✅ Подтвердить", callback_data="confirm")],
-            [InlineKeyboardButton("📢 Сигнал всем", callback_data="broadcast")]
-        ]
-        
         try:
-            await reply_func(
-                "👋 <b>Админ-панель</b>",
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode=ParseMode.HTML
-            )
-            logger.info("Admin menu sent successfully")
+            await MENUS.show("admin_menu", reply_func)
         except Exception as e:
-            logger.error(f"Error sending admin menu: {e}")
+            logger.error("Error sending admin menu: %s", e)
     
+    @instrument_handler("button_handler")
     async def button_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка кнопок"""
-        logger.info(f"Button callback: {update.callback_query.data} from user {update.callback_query.from_user.id}")
-        
         query = update.callback_query
         await query.answer()
         
         user_id = query.from_user.id
         data = query.data
+        logger.info("Callback", extra={'event': 'update', 'user_id': user_id, 'data': data})
         
         try:
             if user_id == ADMIN_ID:
@@ -107,50 +223,32 @@ class SimpleBot:
             else:
                 await self.handle_user_callback(query, data)
         except Exception as e:
-            logger.error(f"Error in button handler: {e}")
+            logger.error("Error in button handler: %s", e, extra={'user_id': user_id, 'data': data})
             await query.edit_message_text("❌ Ошибка. Попробуйте еще раз.")
     
     async def handle_user_callback(self, query, data):
         """Обработка кнопок пользователя"""
-        logger.info(f"User callback: {data}")
-        
-        if data == "register":
-            await query.edit_message_text(
-                "🔗 <b>Регистрация</b>\n\nПерейдите: https://bit.ly/4jb8a4k\n\nПосле регистрации отправьте ID.",
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back")]]),
-                parse_mode=ParseMode.HTML
-            )
-        
-        elif data == "send_id":
-            await query.edit_message_text(
-                "🆔 <b>Отправьте ваш ID</b>\n\nНапишите ID после регистрации:",
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back")]]),
-                parse_mode=ParseMode.HTML
-            )
+        if data == "register" or data == "send_id":
+            await MENUS.show(data, query.edit_message_text)
         
         elif data == "signal":
             user = users.get(query.from_user.id, {})
             if user.get('status') == 'confirmed':
-                signal = self.generate_signal()
+                with span("generate"):
+                    signal = self.generate_signal()
                 await query.edit_message_text(
                     f"📈 <b>СИГНАЛ</b>\n\n{signal}",
-                    reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back")]]),
+                    reply_markup=MENUS.keyboard("back"),
                     parse_mode=ParseMode.HTML
                 )
             else:
-                await query.edit_message_text(
-                    "⛔️ <b>Доступ закрыт</b>\n\nДождитесь подтверждения.",
-                    reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back")]]),
-                    parse_mode=ParseMode.HTML
-                )
+                await MENUS.show("access_denied", query.edit_message_text)
         
         elif data == "back":
             await self.show_user_menu(query.edit_message_text)
     
     async def handle_admin_callback(self, query, data):
         """Обработка кнопок админа"""
-        logger.info(f"Admin callback: {data}")
-        
         if data == "users":
             text = "👥 <b>Пользователи:</b>\n\n"
             for uid, user in users.items():
@@ -160,7 +258,7 @@ class SimpleBot:
             
             await query.edit_message_text(
                 text,
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_admin")]]),
+                reply_markup=MENUS.keyboard("back_admin"),
                 parse_mode=ParseMode.HTML
             )
         
@@ -173,52 +271,56 @@ class SimpleBot:
                     text += f"👤 {uid}: {user_name} - {platform_id}\n"
                     keyboard.append([InlineKeyboardButton(f"✅ {uid}", callback_data=f"confirm_{uid}")])
                 
-                keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_admin")])
+                keyboard.append(BACK_ADMIN_ROW)
                 await query.edit_message_text(
                     text,
                     reply_markup=InlineKeyboardMarkup(keyboard),
                     parse_mode=ParseMode.HTML
                 )
             else:
-                await query.edit_message_text(
-                    "⏳ Нет пользователей для подтверждения",
-                    reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_admin")]])
-                )
+                await MENUS.show("no_pending", query.edit_message_text)
         
         elif data == "broadcast":
-            await query.edit_message_text(
-                "📢 <b>Отправьте сигнал</b>\n\nНапишите сигнал в формате:\nАктив ВХОД Время",
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_admin")]]),
-                parse_mode=ParseMode.HTML
-            )
+            await MENUS.show("broadcast", query.edit_message_text)
         
         elif data.startswith("confirm_"):
             uid = int(data.split("_")[1])
-            if uid in users:
-                users[uid]['status'] = 'confirmed'
-                if uid in pending_ids:
-                    del pending_ids[uid]
-                
+            if store.confirm(uid):
+                self.admin_digest.discard([uid])
                 # Уведомляем пользователя
                 try:
-                    await self.app.bot.send_message(uid, "✅ <b>Доступ подтвержден!</b>", parse_mode=ParseMode.HTML)
+                    await self.send_message(uid, ACCESS_CONFIRMED_TEXT, parse_mode=ParseMode.HTML)
                 except:
                     pass
                 
                 await query.edit_message_text(
                     f"✅ Пользователь {uid} подтвержден!",
-                    reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="confirm")]])
+                    reply_markup=MENUS.keyboard("back_confirm")
                 )
         
+        elif data.startswith(CONFIRM_ALL_PREFIX):
+            # Подтверждаем тех, кто был в сводке, когда админ ее видел
+            uids = self.admin_digest.take(data)
+            if not uids:
+                await MENUS.show("digest_stale", query.edit_message_text)
+                return
+            confirmed = [uid for uid in uids if store.confirm(uid)]
+            logger.info(f"Подтверждено из сводки: {len(confirmed)}")
+            await self.admin_digest.flush()
+            # Уведомления уходят в фоне, как в bot_old: админ не ждет сотни отправок
+            self.shutdown.spawn(self.send_to_users(confirmed, ACCESS_CONFIRMED_TEXT))
+        
         elif data == "back_admin":
             await self.show_admin_menu(query.edit_message_text)
     
+    @instrument_handler("message_handler")
     async def message_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка текстовых сообщений"""
         user_id = update.effective_user.id
         text = update.message.text.strip()
         
-        logger.info(f"Message from {user_id}: {text}")
+        # Только длина: текст сообщений в логи не пишем
+        logger.info("Message", extra={'event': 'update', 'user_id': user_id, 'length': len(text)})
         
         try:
             if user_id == ADMIN_ID:
@@ -231,30 +333,65 @@ class SimpleBot:
             else:
                 # Пользователь отправляет ID
                 if text.isdigit():
-                    if user_id not in users:
-                        users[user_id] = {'name': update.effective_user.first_name, 'status': 'new'}
-                    
-                    users[user_id]['platform_id'] = text
-                    users[user_id]['status'] = 'pending'
-                    pending_ids[user_id] = text
+                    store.set_platform_id(user_id, text, name=update.effective_user.first_name)
                     
                     await update.message.reply_text("✅ ID сохранен! Ожидайте подтверждения.")
                     
-                    # Уведомляем админа
-                    try:
-                        await self.app.bot.send_message(
-                            ADMIN_ID,
-                            f"🆔 <b>Новый ID!</b>\n\n👤 {update.effective_user.first_name}\n🆔 {user_id}\n📱 {text}",
-                            parse_mode=ParseMode.HTML
-                        )
-                    except Exception as e:
-                        logger.error(f"Error notifying admin: {e}")
+                    # Админ получит ID в сводке
+                    self.admin_digest.add(user_id, update.effective_user.first_name, text)
                 else:
                     await update.message.reply_text("❗️ ID должен содержать только цифры")
         except Exception as e:
-            logger.error(f"Error in message handler: {e}")
+            logger.error("Error in message handler: %s", e, extra={'user_id': user_id})
             await update.message.reply_text("❌ Ошибка. Попробуйте еще раз.")
     
+    def rate_limited(self, name, handler):
+        """Быстрый ответ на слишком частые нажатия без вызова обработчика"""
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            query = update.callback_query
+            if query and query.from_user.id != ADMIN_ID and not self.callback_limiter.allow(query.from_user.id):
+                RATE_LIMITED.inc(name)
+                await query.answer("⏳ Слишком часто, подождите пару секунд")
+                return
+            return await handler(update, context)
+        return wrapper
+    
+    def serialized(self, handler):
+        """Обработка обновлений пользователя строго по очереди"""
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            user = update.effective_user
+            if user is None:
+                return await handler(update, context)
+            try:
+                return await self.user_queue.run(user.id, handler, update, context)
+            except UserBacklogFull:
+                logger.warning("Очередь пользователя переполнена, обновление пропущено", extra={'user_id': user.id})
+                if update.callback_query:
+                    await update.callback_query.answer("⏳ Обрабатывается...")
+        return wrapper
+    
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Профилирование по команде /profile [секунды] (только админ)"""
+        if update.effective_user.id != ADMIN_ID:
+            return
+        
+        seconds = parse_seconds(context.args)
+        if seconds is None:
+            await update.message.reply_text("❗️ Формат: /profile [секунды]")
+            return
+        
+        await update.message.reply_text(f"⏱ Профилирование {seconds:g} с...")
+        # In the background, so updates keep flowing while sampling
+        self.shutdown.spawn(self._send_profile(update, seconds), drain=False)
+    
+    async def _send_profile(self, update: Update, seconds: float):
+        """Профилирование и отправка отчета"""
+        try:
+            report = await self.profiler.profile(seconds)
+            await update.message.reply_text(report[:4000])
+        except Exception as e:
+            logger.error(f"Error profiling: {e}")
+    
     def generate_signal(self):
         """Генерация простого сигнала"""
         assets = ["EUR/USD", "GBP/USD", "USD/JPY", "USD/CHF"]
@@ -269,16 +406,60 @@ class SimpleBot:
     
     async def broadcast_signal(self, signal_text):
         """Рассылка сигнала всем подтвержденным пользователям"""
-        confirmed_users = [uid for uid, user in users.items() if user.get('status') == 'confirmed']
+        confirmed_users = [uid for uid, user in users.items() if user.status_code == STATUS_CONFIRMED]
         
         text = f"🚨 <b>СИГНАЛ!</b>\n\n{signal_text}"
-        
-        for uid in confirmed_users:
+        await self.send_to_users(confirmed_users, text)
+    
+    async def send_to_users(self, user_ids, text):
+        """Отправка по очереди; при остановке остаток получателей сохраняется"""
+        user_ids = list(user_ids)
+        remaining = len(user_ids)
+        BROADCAST_QUEUE_DEPTH.inc(amount=remaining)
+        try:
+            with self.shutdown.job(), bulk_sends():
+                index = 0
+                while index < len(user_ids):
+                    if self.shutdown.checkpointing:
+                        checkpoints.save_broadcast_checkpoint(text, user_ids[index:])
+                        logger.info(f"Рассылка сохранена, осталось {remaining} получателей")
+                        break
+                    uid = user_ids[index]
+                    try:
+                        await self.send_message(uid, text, parse_mode=ParseMode.HTML)
+                    except RetryAfter as e:
+                        # flood control: ждем и повторяем того же получателя; при остановке он попадет в остаток
+                        logger.warning("Flood control, retry in %ss", e.retry_after, extra={'user_id': uid})
+                        await asyncio.sleep(e.retry_after)
+                        continue
+                    except TelegramError as e:
+                        logger.error("Error sending signal: %s", e, extra={'user_id': uid})
+                    index += 1
+                    remaining -= 1
+                    BROADCAST_QUEUE_DEPTH.dec()
+        finally:
+            BROADCAST_QUEUE_DEPTH.dec(amount=remaining)
+    
+    async def resume_broadcasts(self, interval=60):
+        """Дослать рассылки, сохраненные до остановки в этом же каталоге USER_STORE_DIR"""
+        while True:
             try:
-                await self.app.bot.send_message(uid, text, parse_mode=ParseMode.HTML)
+                for text, user_ids in checkpoints.take_broadcast_checkpoints():
+                    logger.info(f"Продолжаем рассылку на {len(user_ids)} получателей")
+                    # shield: остановка цикла не обрывает рассылку
+                    await asyncio.shield(self.send_to_users(user_ids, text))
             except Exception as e:
-                logger.error(f"Error sending signal to {uid}: {e}")
-                continue
+                logger.error(f"Ошибка продолжения рассылок: {e}")
+            await asyncio.sleep(interval)
+    
+    def _load_store(self):
+        """Загрузить пользователей с диска (блокирующий вызов, выполняется в потоке)"""
+        with self.startup.phase("store"):
+            store.load()
+        # K_SERVICE задан на Cloud Run
+        if os.getenv('K_SERVICE') and not on_mounted_volume(store.directory):
+            logger.warning(f"{store.directory} на диске контейнера: пользователи пропадут при перезапуске, "
+                           f"подключите том в USER_STORE_DIR")
     
     async def run(self):
         """Запуск бота"""
@@ -286,55 +467,75 @@ class SimpleBot:
             logger.error("BOT_TOKEN не найден!")
             return
         
-        logger.info("Создаем приложение...")
-        self.app = Application.builder().token(BOT_TOKEN).build()
+        # Порт открываем сразу, готовность сообщаем после запуска бота
+        if not self.http.running:
+            with self.startup.phase("http"):
+                await self.http.start()
         
-        # Добавляем обработчики
-        logger.info("Добавляем обработчики...")
-        self.app.add_handler(CommandHandler("start", self.start))
-        self.app.add_handler(CallbackQueryHandler(self.button_handler))
-        self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.message_handler))
+        logger.info("Создаем приложение...")
+        with self.startup.phase("application"):
+            # Обновления обрабатываются параллельно, порядок для каждого пользователя держит user_queue
+            request, updates_request = build_requests(
+                HTTP_POOL_SIZE_UPDATES, HTTP_POOL_SIZE_INTERACTIVE, HTTP_POOL_SIZE_BULK, HTTP_KEEPALIVE_EXPIRY,
+                HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_WRITE_TIMEOUT, HTTP_POOL_TIMEOUT
+            )
+            builder = (Application.builder().token(BOT_TOKEN).base_url(f"{BOT_API_URL}/bot")
+                       .request(request).get_updates_request(updates_request).concurrent_updates(True))
+            if WEBHOOK_URL:
+                builder = builder.updater(None)
+            self.app = builder.build()
+            
+            # Добавляем обработчики
+            def wrap(name, handler):
+                return self.tracer.wrap(name, self.serialized(handler))
+            
+            self.app.add_handler(CommandHandler("start", wrap("start", self.start)))
+            self.app.add_handler(CommandHandler("profile", self.profile_command))
+            self.app.add_handler(CallbackQueryHandler(
+                self.tracer.wrap("button_handler", self.rate_limited("button_handler", self.serialized(self.button_handler)))
+            ))
+            self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, wrap("message_handler", self.message_handler)))
         
         logger.info("Бот запускается...")
         
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop_event.set)
+        
         try:
-            await self.app.initialize()
+            # Пользователи читаются с диска, пока идет первый запрос к Bot API
+            await asyncio.gather(
+                loop.run_in_executor(None, self._load_store),
+                self.startup.timed("telegram", self.app.initialize()),
+            )
             await self.app.start()
-            await self.app.updater.start_polling()
             
+            with self.startup.phase("updates"):
+                if WEBHOOK_URL:
+                    add_webhook_route(self.http, self.app, WEBHOOK_PATH, WEBHOOK_SECRET,
+                                      is_accepting=self.shutdown.is_accepting)
+                    await self.app.bot.set_webhook(WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET)
+                    logger.info("Режим вебхука")
+                else:
+                    await self.app.updater.start_polling()
+                    logger.info("Режим опроса")
+            
+            self.background_tasks = [asyncio.create_task(self.resume_broadcasts())]
+            
+            self.ready = True
+            self.startup.finish()
             logger.info("Бот запущен успешно!")
             
-            # Держим бота запущенным
-            await self.app.updater.idle()
+            # Держим бота запущенным до сигнала остановки
+            await stop_event.wait()
         except Exception as e:
             logger.error(f"Ошибка запуска бота: {e}")
-
-# HTTP сервер для Cloud Run
-import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
-
-def run_http_server():
-    class Handler(BaseHTTPRequestHandler):
-        def do_GET(self):
-            self.send_response(200)
-            self.send_header('Content-type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(b"Bot is running!")
-        
-        def log_message(self, format, *args):
-            pass
-    
-    port = int(os.environ.get("PORT", 8080))
-    server = HTTPServer(("", port), Handler)
-    logger.info(f"HTTP server started on port {port}")
-    server.serve_forever()
-
-# Запускаем HTTP сервер в фоне
-threading.Thread(target=run_http_server, daemon=True).start()
+        finally:
+            await self.shutdown.run()
 
 # Запускаем бота
 if __name__ == "__main__":
-    import asyncio
     logger.info("Starting bot application...")
     bot = SimpleBot()
-    asyncio.run(bot.run()) 
\ No newline at end of file
+    asyncio.run(bot.run())
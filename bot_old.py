@@ -1,45 +1,240 @@
+import time
+import signal
 import logging
 import asyncio
 from datetime import datetime
+from startup_timer import StartupTimer  # first, so startup time includes the imports below
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
 from telegram.constants import ParseMode
-import os
-import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
-
-from config import BOT_TOKEN, ADMIN_USER_ID, SUBSCRIPTION_PLANS, LOG_LEVEL, LOG_FILE
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+from config import (BOT_TOKEN, ADMIN_USER_ID, BOT_API_URL, SUBSCRIPTION_PLANS, LOG_LEVEL, LOG_FILE, MIN_SIGNAL_INTERVAL,
+                    MAX_SIGNALS_PER_DAY, EXPIRY_TIMES, WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_PATH, HTTP_PORT,
+                    TRACE_SAMPLE_RATE, TRACE_SLOW_MS, USER_QUEUE_BACKLOG, CALLBACK_RATE, CALLBACK_BURST,
+                    SHUTDOWN_DRAIN_TIMEOUT, LOG_SAMPLE_RATES, LOG_FORMAT, LEADER_LEASE_TTL,
+                    LEADER_RENEW_INTERVAL, SIGNAL_RETENTION_DAYS, SUBSCRIPTION_SWEEP_WINDOW,
+                    SIGNAL_BROADCAST_INTERVAL, HTTP_POOL_SIZE_UPDATES, HTTP_POOL_SIZE_INTERACTIVE,
+                    HTTP_POOL_SIZE_BULK, HTTP_KEEPALIVE_EXPIRY, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT,
+                    HTTP_WRITE_TIMEOUT, HTTP_POOL_TIMEOUT, ADMIN_DIGEST_WINDOW, ADMIN_DIGEST_MAX_AGE,
+                    SIGNAL_API_TOKEN, SIGNAL_API_CACHE_TTL, SIGNAL_RESULT_GRACE)
 from database import Database
 from signal_generator import SignalGenerator
-
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
+from signal_throttle import SignalThrottle
+from candles import CandleAggregator
+from signal_resolver import SignalResolver
+from signal_pipeline import SignalPipeline
+from messages import format_signal, format_broadcast_signal, format_broadcast_message, format_subscription
+from http_server import HttpServer, add_health_routes, add_webhook_route
+from http_pool import build_requests, bulk_sends
+from signal_api import SignalApi
+from metrics import instrument_handler, timed_send, add_metrics_route, RATE_LIMITED, gauge, BROADCAST_QUEUE_DEPTH
+from tracing import Tracer, SamplingProfiler, span, parse_seconds
+from user_queue import UserSerializer, UserBacklogFull
+from rate_limit import TokenBucketLimiter
+from menus import MenuRegistry
+from shutdown import ShutdownCoordinator
+from leader import LeaderElection
+from subscriptions import SubscriptionSweeper, has_access
+from admin_digest import AdminDigest, CONFIRM_ALL_PREFIX, parse_confirm_all
+from pending_selection import (PendingSelection, PENDING_PREFIX, parse_action, ACTION_TOGGLE, ACTION_SELECT_PAGE,
+                               ACTION_SELECT_ALL, ACTION_RANGE, ACTION_CLEAR, ACTION_CONFIRM, ACTION_BLOCK)
+from scheduler import Scheduler, OVERLAP_QUEUE
+from logging_setup import setup_logging, stop_logging, parse_sample_rates
+
+# Configure logging: records are written by a background thread
+setup_logging(LOG_LEVEL, LOG_FILE, parse_sample_rates(LOG_SAMPLE_RATES), json_output=LOG_FORMAT == 'json')
 logger = logging.getLogger(__name__)
 
+# Static screens, built once
+MENUS = MenuRegistry()
+MENUS.add_keyboard("admin_menu", [
+    [("👥 Пользователи", "admin_users")],
+    [("✅ Подтвердить ID", "admin_confirm")],
+    [("🚫 Заблокировать", "admin_block")],
+    [("📢 Рассылка сигнала", "admin_signal")],
+    [("✉️ Сообщение всем", "admin_message")],
+])
+MENUS.add_keyboard("user_menu", [
+    [("🔗 Зарегистрироваться", "register")],
+    [("🆔 Отправить ID", "send_id")],
+    [("📈 Получить сигнал", "get_signal")],
+    [("🤝 Поддержка", None, "https://t.me/razgondepoz1ta")],
+])
+MENUS.add_keyboard("back_admin", [[("🔙 Назад", "back_admin")]])
+MENUS.add_keyboard("back_user", [[("🔙 Назад", "back_user")]])
+MENUS.add_keyboard("back_confirm", [[("🔙 Назад", "admin_confirm")]])
+MENUS.add_keyboard("back_block", [[("🔙 Назад", "admin_block")]])
+MENUS.add_keyboard("signal", [[("📊 Еще сигнал", "get_signal")], [("🔙 Назад", "back_user")]])
+
+MENUS.add_screen("admin_menu", "👋 <b>Админ-панель</b>\n\nВыберите действие:", "admin_menu")
+MENUS.add_screen("user_menu", "👋 <b>Добро пожаловать!</b>\n\nДля получения сигналов:\n1. Зарегистрируйтесь\n2. Отправьте ID\n3. Дождитесь подтверждения\n\nВыберите действие:", "user_menu")
+MENUS.add_screen("register", "🔗 <b>Регистрация</b>\n\nПерейдите по ссылке:\nhttps://bit.ly/4jb8a4k\n\nПосле регистрации отправьте ID.", "back_user")
+MENUS.add_screen("send_id", "🆔 <b>Отправка ID</b>\n\nНапишите ваш ID после регистрации:", "back_user")
+MENUS.add_screen("access_denied", "⛔️ <b>Доступ закрыт</b>\n\nДождитесь подтверждения от администратора.", "back_user")
+MENUS.add_screen("no_signals", "😔 Сейчас нет сигналов", "back_user", parse_mode=None)
+MENUS.add_screen("signal_form", "📢 <b>Рассылка сигнала</b>\n\nНапишите сигнал в формате:\nАктив ВХОД Время\n\nНапример:\nEUR/USD ВВЕРХ 2мин", "back_admin")
+MENUS.add_screen("message_form", "✉️ <b>Сообщение всем</b>\n\nНапишите сообщение для рассылки:", "back_admin")
+MENUS.add_screen("no_users", "👥 Пользователей нет", "back_admin")
+MENUS.add_screen("no_pending", "⏳ Нет пользователей ожидающих подтверждения", "back_admin")
+MENUS.add_screen("no_users_to_block", "👥 Нет пользователей для блокировки", "back_admin")
+MENUS.add_screen("digest_stale", "⌛ Сводка устарела, откройте список ожидающих", "back_admin", parse_mode=None)
+
+BACK_ADMIN_ROW = MENUS.keyboard("back_admin").inline_keyboard[0]
+
+ACCESS_CONFIRMED_TEXT = "✅ <b>Доступ подтвержден!</b>\n\nТеперь вы будете получать сигналы автоматически."
+ACCESS_BLOCKED_TEXT = "🚫 <b>Доступ заблокирован</b>"
+
 class BinaryOptionsBot:
-    def __init__(self):
-        self.db = Database()
-        self.signal_generator = SignalGenerator()
-        self.application = None
-        self.processing_users = set()  # Prevent duplicate processing
+    def __init__(self, http: HttpServer = None, startup: StartupTimer = None):
+        self.startup = startup or StartupTimer()
+        
+        # Created in run() while the bot connects to Telegram, see _init_components
+        self.db = None
+        self.signal_generator = None
+        self.candles = None
+        self.signal_resolver = None
+        self.signal_throttle = None
+        self.signal_pipeline = None
+        self.subscription_sweeper = None
+        self.scheduler = None
+        self.leader = None
         
+        self.application = None
+        self.ready = False
+        self.http = http or HttpServer(port=HTTP_PORT)
+        add_health_routes(self.http, lambda: self.ready)
+        add_metrics_route(self.http)
+        self.tracer = Tracer(TRACE_SAMPLE_RATE, TRACE_SLOW_MS)
+        self.profiler = SamplingProfiler()
+        self.user_queue = UserSerializer(max_backlog=USER_QUEUE_BACKLOG)
+        self.callback_limiter = TokenBucketLimiter(CALLBACK_RATE, CALLBACK_BURST)
+        self.admin_digest = AdminDigest(self._send_digest, self._edit_digest, ADMIN_DIGEST_WINDOW, ADMIN_DIGEST_MAX_AGE)
+        self.pending_selection = PendingSelection()
+        self.background_tasks = []
+        self.shutdown = ShutdownCoordinator(SHUTDOWN_DRAIN_TIMEOUT)
+        self._register_shutdown_steps()
+        
+    def _init_components(self):
+        """Open database and build signal components; blocking, runs in a thread"""
+        with self.startup.phase("database"):
+            self.db = Database()
+        
+        with self.startup.phase("signals"):
+            self.signal_generator = SignalGenerator()
+            self.candles = CandleAggregator(EXPIRY_TIMES + self.signal_generator.expiry_times)
+            self.signal_generator.attach(self.candles)
+            self.signal_resolver = SignalResolver(self.db, self.candles.last_price, grace=SIGNAL_RESULT_GRACE)
+            self.signal_throttle = SignalThrottle(MIN_SIGNAL_INTERVAL * 60, MAX_SIGNALS_PER_DAY)
+            self.signal_pipeline = SignalPipeline(self.signal_generator, self.signal_throttle, self.db, self.signal_resolver)
+        
+        self.subscription_sweeper = SubscriptionSweeper(self.db, SUBSCRIPTION_SWEEP_WINDOW,
+                                                        on_expired=self.notify_expired)
+        
+        # Periodic jobs on candle-aligned wall-clock slots
+        self.scheduler = Scheduler()
+        self.scheduler.add("prepare_signal", self.prepare_signal, SIGNAL_BROADCAST_INTERVAL,
+                           offset=-self.signal_pipeline.lead_time)
+        self.scheduler.add("broadcast_signal", self.broadcast_prepared_signal, SIGNAL_BROADCAST_INTERVAL)
+        self.scheduler.add("resume_broadcasts", self.resume_broadcasts, 60, jitter=5)
+        self.scheduler.add("expire_subscriptions", self.expire_subscriptions, 60, overlap=OVERLAP_QUEUE)
+        self.scheduler.add("admin_digest", self.refresh_admin_digest, ADMIN_DIGEST_WINDOW)
+        self.scheduler.add("log_stats", self.log_stats, 3600, jitter=60)
+        self.scheduler.add("cleanup_signals", self.cleanup_signals, 24 * 3600, offset=3 * 3600, jitter=600)
+        
+        # Scheduled and bulk work runs on one replica only
+        self.leader = LeaderElection(self.db, "scheduler", LEADER_LEASE_TTL, LEADER_RENEW_INTERVAL,
+                                     on_elected=self._on_elected)
+        self.leader.add_job(self.scheduler.run)
+        self.leader.add_job(self.signal_resolver.run)
+        
+        self._register_metrics()
+        
+    def _on_elected(self):
+        """Reload state the previous leader may have changed"""
+        self.signal_throttle.clear()
+        self.signal_throttle.load_history(self.db.get_signals_since(hours=24))
+        self.signal_resolver.clear()
+        self.signal_resolver.load_pending()
+        self.subscription_sweeper.clear()
+        # A new digest message for IDs submitted within its max age, whichever replica got them
+        self.admin_digest.reset(self.db.get_submission_seq(before=time.time() - ADMIN_DIGEST_MAX_AGE))
+        
+    def _register_shutdown_steps(self):
+        """Shutdown order: intake, timers, broadcasts, lease, admin digest, Telegram, pending writes, HTTP, logs"""
+        self.shutdown.add_step("stop intake", self._stop_intake)
+        self.shutdown.add_step("stop background tasks", self._stop_background_tasks)
+        self.shutdown.add_step("drain broadcasts", self.shutdown.drain)
+        self.shutdown.add_step("release leadership", self._release_leadership)
+        self.shutdown.add_step("flush admin digest", self.admin_digest.close)
+        self.shutdown.add_step("stop application", self._stop_application)
+        self.shutdown.add_step("flush signal results", self._flush_signal_results)
+        self.shutdown.add_step("stop http", self.http.stop)
+        self.shutdown.add_step("flush logs", stop_logging)
+        
+    async def _stop_intake(self):
+        """Fail readiness and stop fetching updates; the webhook answers 503"""
+        self.ready = False
+        if self.application and self.application.updater and self.application.updater.running:
+            await self.application.updater.stop()
+        
+    async def _stop_background_tasks(self):
+        """Cancel timers and profiling; broadcasts they started keep running until drained"""
+        for task in self.background_tasks:
+            task.cancel()
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
+        await self.shutdown.cancel_tasks()
+        
+    def _release_leadership(self):
+        """Let another replica take over scheduling without waiting for the lease to expire"""
+        if self.leader:
+            self.leader.release()
+        
+    async def _stop_application(self):
+        """Finish queued updates and close connections to Telegram"""
+        if not self.application:
+            return
+        if self.application.running:
+            await self.application.stop()
+        await self.application.shutdown()
+        
+    def _flush_signal_results(self):
+        """Write outcomes of signals that expired during shutdown"""
+        if self.signal_resolver:
+            self.signal_resolver.resolve_due()
+        
+    def _register_metrics(self):
+        """Expose component state as scrape-time gauges"""
+        gauge("bot_signals_pending_resolution", "Open signals waiting for expiry").set_function(
+            lambda: self.signal_resolver.pending_count)
+        gauge("bot_signals_overdue_resolution", "Expired signals without outcome").set_function(
+            lambda: self.signal_resolver.overdue_count)
+        gauge("bot_signal_cache_hit_rate", "Signal cache hit rate").set_function(
+            lambda: self.signal_generator.get_cache_stats()['hit_rate'])
+        gauge("bot_signal_first_send_seconds", "Slot to first send of the last scheduled signal").set_function(
+            lambda: self.signal_pipeline.last_slot_to_first_send or 0)
+        gauge("bot_signal_generation_to_first_send_seconds",
+              "Generation to first send of the last scheduled signal").set_function(
+            lambda: self.signal_pipeline.last_generation_to_first_send or 0)
+        gauge("bot_subscriptions_expiring", "Subscriptions ending within the sweeper window").set_function(
+            lambda: self.subscription_sweeper.pending_count)
+        gauge("bot_admin_digest_pending", "Platform IDs listed in the admin digest").set_function(
+            lambda: self.admin_digest.pending_count)
+        gauge("bot_user_queue_active_users", "Users with an update in flight").set_function(
+            lambda: self.user_queue.active_users)
+        gauge("bot_user_queue_backlog", "Updates waiting behind the same user's update").set_function(
+            lambda: self.user_queue.backlog)
+
+    async def send_message(self, chat_id, text: str, **kwargs):
+        """Send message, recording latency and errors"""
+        return await timed_send("sendMessage", self.application.bot.send_message(chat_id, text, **kwargs))
+
+    @instrument_handler("start")
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
         user = update.effective_user
         user_id = user.id
         
-        # Prevent duplicate processing
-        if user_id in self.processing_users:
-            return
-        self.processing_users.add(user_id)
-        
         try:
             # Add user to database
             self.db.add_user(
@@ -59,53 +254,21 @@ class BinaryOptionsBot:
         except Exception as e:
             logger.error(f"Error in start command: {e}")
             await update.message.reply_text("❌ Произошла ошибка. Попробуйте еще раз.")
-        finally:
-            self.processing_users.discard(user_id)
 
     async def show_admin_menu(self, reply_function):
         """Show admin menu"""
-        keyboard = [
-            [InlineKeyboardButton("👥 Пользователи", callback_data="admin_users")],
-            [InlineKeyboardButton("✅ Подтвердить ID", callback_data="admin_confirm")],
-            [InlineKeyboardButton("🚫 Заблокировать", callback_data="admin_block")],
-            [InlineKeyboardButton("📢 Рассылка сигнала", callback_data="admin_signal")],
-            [InlineKeyboardButton("✉️ Сообщение всем", callback_data="admin_message")],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await reply_function(
-            "👋 <b>Админ-панель</b>\n\nВыберите действие:",
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.HTML
-        )
+        await MENUS.show("admin_menu", reply_function)
 
     async def show_user_menu(self, reply_function):
         """Show user menu"""
-        keyboard = [
-            [InlineKeyboardButton("🔗 Зарегистрироваться", callback_data="register")],
-            [InlineKeyboardButton("🆔 Отправить ID", callback_data="send_id")],
-            [InlineKeyboardButton("📈 Получить сигнал", callback_data="get_signal")],
-            [InlineKeyboardButton("🤝 Поддержка", url="https://t.me/razgondepoz1ta")],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await reply_function(
-            "👋 <b>Добро пожаловать!</b>\n\nДля получения сигналов:\n1. Зарегистрируйтесь\n2. Отправьте ID\n3. Дождитесь подтверждения\n\nВыберите действие:",
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.HTML
-        )
+        await MENUS.show("user_menu", reply_function)
 
+    @instrument_handler("button_callback")
     async def button_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle button callbacks"""
         query = update.callback_query
         user_id = query.from_user.id
         
-        # Prevent duplicate processing
-        if user_id in self.processing_users:
-            await query.answer("⏳ Обрабатывается...")
-            return
-        self.processing_users.add(user_id)
-        
         try:
             await query.answer()
             data = query.data
@@ -120,8 +283,6 @@ class BinaryOptionsBot:
         except Exception as e:
             logger.error(f"Error in button_callback: {e}")
             await query.edit_message_text("❌ Ошибка. Попробуйте еще раз.")
-        finally:
-            self.processing_users.discard(user_id)
 
     async def handle_admin_callback(self, query, data):
         """Handle admin callbacks"""
@@ -141,23 +302,17 @@ class BinaryOptionsBot:
         elif data.startswith("block_"):
             user_id = int(data.split("_")[1])
             await self.block_user(query, user_id)
+        elif data.startswith(CONFIRM_ALL_PREFIX):
+            await self.confirm_digest(query, data)
+        elif data.startswith(PENDING_PREFIX):
+            await self.handle_pending_action(query, data)
         elif data == "back_admin":
             await self.show_admin_menu(query.edit_message_text)
 
     async def handle_user_callback(self, query, data):
         """Handle user callbacks"""
-        if data == "register":
-            await query.edit_message_text(
-                "🔗 <b>Регистрация</b>\n\nПерейдите по ссылке:\nhttps://bit.ly/4jb8a4k\n\nПосле регистрации отправьте ID.",
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_user")]]),
-                parse_mode=ParseMode.HTML
-            )
-        elif data == "send_id":
-            await query.edit_message_text(
-                "🆔 <b>Отправка ID</b>\n\nНапишите ваш ID после регистрации:",
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_user")]]),
-                parse_mode=ParseMode.HTML
-            )
+        if data == "register" or data == "send_id":
+            await MENUS.show(data, query.edit_message_text)
         elif data == "get_signal":
             await self.send_signal_to_user(query)
         elif data == "back_user":
@@ -165,169 +320,196 @@ class BinaryOptionsBot:
 
     async def show_users_list(self, query):
         """Show users list for admin"""
-        users = self.db.get_all_users_detailed()
+        users = self.db.get_all_users_detailed(limit=10)
         
         if not users:
-            text = "👥 Пользователей нет"
-        else:
-            text = "👥 <b>Список пользователей:</b>\n\n"
-            for user in users[:10]:
-                status = user.get('id_status', 'pending')
-                emoji = "✅" if status == 'confirmed' else "⏳" if status == 'pending' else "❌"
-                text += f"{emoji} ID: {user['user_id']} | {user.get('first_name', 'Неизвестно')} | {status}\n"
+            await MENUS.show("no_users", query.edit_message_text)
+            return
         
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_admin")]],
-        await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode=ParseMode.HTML)
-
-    async def show_pending_users(self, query):
-        """Show pending users for confirmation"""
-        users = self.db.get_pending_users()
+        text = "👥 <b>Список пользователей:</b>\n\n"
+        for user in users[:10]:
+            status = user.get('id_status', 'pending')
+            emoji = "✅" if status == 'confirmed' else "⏳" if status == 'pending' else "⌛" if status == 'expired' else "❌"
+            text += f"{emoji} ID: {user['user_id']} | {user.get('first_name', 'Неизвестно')} | {status}\n"
+        
+        await query.edit_message_text(text, reply_markup=MENUS.keyboard("back_admin"), parse_mode=ParseMode.HTML)
+
+    async def show_pending_users(self, query, page: int = 0, anchor: int = None, armed: bool = False,
+                                 notice: str = None):
+        """Show a page of pending users with selection actions"""
+        count, selected = self.db.count_pending_users()
+        if not count:
+            if notice:
+                await query.edit_message_text(notice, reply_markup=MENUS.keyboard("back_admin"), parse_mode=ParseMode.HTML)
+            else:
+                await MENUS.show("no_pending", query.edit_message_text)
+            return
         
-        if not users:
-            text = "⏳ Нет пользователей ожидающих подтверждения"
-            keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_admin")]],
+        screen = self.pending_selection
+        page = screen.clamp(page, count)
+        users = self.db.get_pending_page(screen.offset(page), screen.page_size)
+        text, keyboard = screen.render(users, count, selected, page, BACK_ADMIN_ROW, anchor, armed, notice)
+        try:
+            await query.edit_message_text(text, reply_markup=keyboard, parse_mode=ParseMode.HTML)
+        except BadRequest as e:
+            # Tapping the page number or reselecting a selected page changes nothing
+            if "not modified" not in str(e).lower():
+                raise
+
+    async def handle_pending_action(self, query, data):
+        """Selection, range and bulk confirm/block on the pending screen"""
+        action = parse_action(data)
+        page, anchor, armed = action.page, action.anchor, action.armed
+        
+        if action.action == ACTION_TOGGLE and action.user_id is not None:
+            if not (armed and self.db.select_pending_range(anchor, action.user_id)):
+                self.db.toggle_pending_selection(action.user_id)
+            anchor, armed = action.user_id, False
+        elif action.action == ACTION_SELECT_PAGE:
+            self.db.select_pending_users(self.pending_selection.offset(page), self.pending_selection.page_size)
+        elif action.action == ACTION_SELECT_ALL:
+            self.db.select_pending_users()
+        elif action.action == ACTION_RANGE:
+            armed = not armed and anchor is not None
+        elif action.action == ACTION_CLEAR:
+            self.db.clear_pending_selection()
+            anchor, armed = None, False
+        elif action.action in (ACTION_CONFIRM, ACTION_BLOCK):
+            user_ids = self.db.take_pending_selection()
+            if user_ids:
+                await self.resolve_pending(query, page, user_ids, confirm=action.action == ACTION_CONFIRM)
+                return
+        
+        await self.show_pending_users(query, page, anchor, armed)
+
+    async def resolve_pending(self, query, page: int, user_ids, confirm: bool):
+        """Confirm or block selected users in one transaction, then notify them"""
+        # Only users still pending are changed and notified
+        if confirm:
+            changed = self.db.confirm_users(user_ids)
+            notice, text = f"✅ Подтверждено: {len(changed)}", ACCESS_CONFIRMED_TEXT
         else:
-            text = "⏳ <b>Пользователи ожидающие подтверждения:</b>\n\n"
-            keyboard = []
-            
-            for user in users:
-                text += f"👤 ID: {user['user_id']} | {user.get('first_name', 'Неизвестно')}\n"
-                keyboard.append([InlineKeyboardButton(f"✅ Подтвердить {user['user_id']}", callback_data=f"confirm_{user['user_id']}")])
-            
-            keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_admin")])
+            changed = self.db.block_users(user_ids)
+            notice, text = f"🚫 Заблокировано: {len(changed)}", ACCESS_BLOCKED_TEXT
+        logger.info(f"{'Confirmed' if confirm else 'Blocked'} {len(changed)} pending users")
+        self.admin_digest.discard(user_ids)
         
-        await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode=ParseMode.HTML)
+        await self.show_pending_users(query, page, notice=notice)
+        # Paced bulk sends in the background, so the admin can go on while hundreds of notices go out
+        self.shutdown.spawn(self.send_to_users(changed, text))
 
     async def show_users_for_block(self, query):
         """Show users for blocking"""
         users = self.db.get_all_users_detailed()
         
         if not users:
-            text = "👥 Нет пользователей для блокировки"
-            keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_admin")]],
-        else:
-            text = "🚫 <b>Выберите пользователя для блокировки:</b>\n\n"
-            keyboard = []
-            
-            for user in users:
-                text += f"👤 ID: {user['user_id']} | {user.get('first_name', 'Неизвестно')}\n"
-                keyboard.append([InlineKeyboardButton(f"🚫 Блок {user['user_id']}", callback_data=f"block_{user['user_id']}")])
-            
-            keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_admin")])
+            await MENUS.show("no_users_to_block", query.edit_message_text)
+            return
+        
+        text = "🚫 <b>Выберите пользователя для блокировки:</b>\n\n"
+        keyboard = []
+        
+        for user in users:
+            text += f"👤 ID: {user['user_id']} | {user.get('first_name', 'Неизвестно')}\n"
+            keyboard.append([InlineKeyboardButton(f"🚫 Блок {user['user_id']}", callback_data=f"block_{user['user_id']}")])
         
+        keyboard.append(BACK_ADMIN_ROW)
         await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode=ParseMode.HTML)
 
     async def confirm_user(self, query, user_id):
         """Confirm user access"""
         self.db.confirm_user_id(user_id)
+        self.admin_digest.discard([user_id])
         
         # Notify user
         try:
-            await self.application.bot.send_message(
-                user_id,
-                "✅ <b>Доступ подтвержден!</b>\n\nТеперь вы будете получать сигналы автоматически.",
-                parse_mode=ParseMode.HTML
-            )
+            await self.send_message(user_id, ACCESS_CONFIRMED_TEXT, parse_mode=ParseMode.HTML)
         except:
             pass
         
         await query.edit_message_text(
             f"✅ Пользователь {user_id} подтвержден!",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="admin_confirm")]])
+            reply_markup=MENUS.keyboard("back_confirm")
         )
 
     async def block_user(self, query, user_id):
         """Block user"""
         self.db.block_user(user_id)
+        self.admin_digest.discard([user_id])
         
         # Notify user
         try:
-            await self.application.bot.send_message(
-                user_id,
-                "🚫 <b>Доступ заблокирован</b>",
-                parse_mode=ParseMode.HTML
-            )
+            await self.send_message(user_id, ACCESS_BLOCKED_TEXT, parse_mode=ParseMode.HTML)
         except:
             pass
         
         await query.edit_message_text(
             f"🚫 Пользователь {user_id} заблокирован!",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="admin_block")]])
+            reply_markup=MENUS.keyboard("back_block")
         )
 
+    async def confirm_digest(self, query, data):
+        """Confirm every user listed in the admin digest when the button was shown
+
+        The button names the submissions shown, so any replica confirms them
+        from the database, not only the leader that keeps the digest.
+        """
+        bounds = parse_confirm_all(data)
+        confirmed = self.db.confirm_submissions(*bounds) if bounds else []
+        if not confirmed:
+            await MENUS.show("digest_stale", query.edit_message_text)
+            return
+        logger.info(f"Confirmed {len(confirmed)} users from the admin digest")
+        
+        if query.message and query.message.message_id == self.admin_digest.message_id:
+            self.admin_digest.discard(confirmed)
+            await self.admin_digest.close()
+        else:
+            # Another replica's or an earlier leader's message; the leader's refresh updates its own
+            await query.edit_message_text(f"✅ Подтверждено из сводки: {len(confirmed)}")
+        self.shutdown.spawn(self.send_to_users(confirmed, ACCESS_CONFIRMED_TEXT))
+
     async def show_signal_form(self, query):
         """Show signal broadcast form"""
-        await query.edit_message_text(
-            "📢 <b>Рассылка сигнала</b>\n\nНапишите сигнал в формате:\nАктив ВХОД Время\n\nНапример:\nEUR/USD ВВЕРХ 2мин",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_admin")]]),
-            parse_mode=ParseMode.HTML
-        )
+        await MENUS.show("signal_form", query.edit_message_text)
 
     async def show_message_form(self, query):
         """Show message broadcast form"""
-        await query.edit_message_text(
-            "✉️ <b>Сообщение всем</b>\n\nНапишите сообщение для рассылки:",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_admin")]]),
-            parse_mode=ParseMode.HTML
-        )
+        await MENUS.show("message_form", query.edit_message_text)
 
+    @instrument_handler("send_signal_to_user")
     async def send_signal_to_user(self, query):
         """Send signal to user"""
         user = self.db.get_user(query.from_user.id)
         
-        if not user or user.get('id_status') != 'confirmed':
-            await query.edit_message_text(
-                "⛔️ <b>Доступ закрыт</b>\n\nДождитесь подтверждения от администратора.",
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_user")]]),
-                parse_mode=ParseMode.HTML
-            )
+        if not has_access(user):
+            await MENUS.show("access_denied", query.edit_message_text)
             return
         
         # Generate signal
-        signal = self.signal_generator.generate_signal()
+        with span("generate"):
+            signal = self.signal_generator.generate_signal()
         if not signal:
-            await query.edit_message_text(
-                "😔 Сейчас нет сигналов",
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_user")]])
-            )
+            await MENUS.show("no_signals", query.edit_message_text)
             return
         
         # Format signal
-        text = f"""
-📢 <b>СИГНАЛ</b>
-
-📍 Актив: {signal['asset']}
-📈 ВХОД: {'ВВЕРХ' if signal['signal_type']=='CALL' else 'ВНИЗ'}
-⏱️ Время: {signal['expiry_time']}
-💰 Вход: {signal['entry_price']}
-🎯 Цель: {signal['target_price']}
-📊 Точность: {signal['accuracy']}%
-
-⏰ {signal['timestamp'].strftime('%H:%M:%S')}
-        """
+        with span("render"):
+            text = format_signal(signal)
         
-        keyboard = [
-            [InlineKeyboardButton("📊 Еще сигнал", callback_data="get_signal")],
-            [InlineKeyboardButton("🔙 Назад", callback_data="back_user")]
-        ]
-        
-        await query.edit_message_text(
+        await timed_send("editMessageText", query.edit_message_text(
             text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=MENUS.keyboard("signal"),
             parse_mode=ParseMode.HTML
-        )
+        ))
 
+    @instrument_handler("handle_message")
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle text messages"""
         user = update.effective_user
         user_id = user.id
         text = update.message.text.strip()
         
-        # Prevent duplicate processing
-        if user_id in self.processing_users:
-            return
-        self.processing_users.add(user_id)
-        
         try:
             if user_id == ADMIN_USER_ID:
                 await self.handle_admin_message(update, text)
@@ -335,8 +517,6 @@ class BinaryOptionsBot:
                 await self.handle_user_message(update, text)
         except Exception as e:
             logger.error(f"Error handling message: {e}")
-        finally:
-            self.processing_users.discard(user_id)
 
     async def handle_admin_message(self, update: Update, text: str):
         """Handle admin messages"""
@@ -364,101 +544,213 @@ class BinaryOptionsBot:
         self.db.set_platform_id(update.effective_user.id, text)
         await update.message.reply_text("✅ ID сохранен! Ожидайте подтверждения.")
         
-        # Notify admin
-        await self.notify_admin_new_id(update.effective_user, text)
+        # The leader's admin digest reads the new ID from the database
 
-    async def notify_admin_new_id(self, user, platform_id):
-        """Notify admin about new ID"""
-        try:
-            text = f"""
-🆔 <b>Новый ID!</b>
-
-👤 {user.first_name or user.username}
-🆔 {user.id}
-📱 {platform_id}
-⏰ {datetime.now().strftime('%H:%M')}
-            """
-            
-            keyboard = [
-                [InlineKeyboardButton(f"✅ Подтвердить {user.id}", callback_data=f"confirm_{user.id}")],
-                [InlineKeyboardButton(f"🚫 Блок {user.id}", callback_data=f"block_{user.id}")]
-            ]
-            
-            await self.application.bot.send_message(
-                ADMIN_USER_ID,
-                text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode=ParseMode.HTML
-            )
-        except Exception as e:
-            logger.error(f"Error notifying admin: {e}")
+    async def refresh_admin_digest(self, slot_at: float):
+        """Bring the admin digest up to date with pending submissions, at most once per ADMIN_DIGEST_WINDOW"""
+        if self.admin_digest.sync(self.db.get_pending_submissions(self.admin_digest.after)):
+            await self.admin_digest.flush()
+
+    async def _send_digest(self, text: str, keyboard) -> int:
+        message = await self.send_message(ADMIN_USER_ID, text, reply_markup=keyboard, parse_mode=ParseMode.HTML)
+        return message.message_id
+
+    async def _edit_digest(self, message_id: int, text: str, keyboard):
+        await timed_send("editMessageText", self.application.bot.edit_message_text(
+            text, chat_id=ADMIN_USER_ID, message_id=message_id, reply_markup=keyboard, parse_mode=ParseMode.HTML
+        ))
 
     async def broadcast_signal(self, signal_text: str):
         """Broadcast signal to confirmed users"""
-        users = self.db.get_all_users_detailed()
-        confirmed_users = [user for user in users if user.get('id_status') == 'confirmed']
-        
-        text = f"""
-🚨 <b>СИГНАЛ!</b>
+        await self.send_to_users(self.db.get_confirmed_users(), format_broadcast_signal(signal_text))
 
-{signal_text}
+    async def broadcast_message(self, message_text: str):
+        """Broadcast message to all users"""
+        await self.send_to_users(self.db.get_all_user_ids(), format_broadcast_message(message_text))
 
-⏰ {datetime.now().strftime('%H:%M:%S')}
-        """
-        
-        for user in confirmed_users:
+    async def send_to_users(self, user_ids, text: str, on_first_send=None):
+        """Send message to users one by one, checkpointing the rest on shutdown"""
+        user_ids = list(user_ids)
+        remaining = len(user_ids)
+        BROADCAST_QUEUE_DEPTH.inc(amount=remaining)
+        try:
+            with self.shutdown.job(), bulk_sends():
+                index = 0
+                while index < len(user_ids):
+                    if self.shutdown.checkpointing:
+                        self.db.save_broadcast_checkpoint(text, user_ids[index:])
+                        logger.info(f"Broadcast checkpointed, {remaining} recipients left")
+                        break
+                    user_id = user_ids[index]
+                    try:
+                        await self.send_message(
+                            user_id,
+                            text,
+                            parse_mode=ParseMode.HTML
+                        )
+                    except RetryAfter as e:
+                        # Flood control: wait and retry the same user, who is checkpointed if shutdown starts meanwhile
+                        logger.warning(f"Flood control on broadcast, retrying user {user_id} in {e.retry_after}s")
+                        await asyncio.sleep(e.retry_after)
+                        continue
+                    except TelegramError as e:
+                        logger.warning(f"Broadcast to user {user_id} failed: {e}")
+                    else:
+                        if on_first_send:
+                            on_first_send()
+                            on_first_send = None
+                        await asyncio.sleep(0.05)  # Small delay
+                    index += 1
+                    remaining -= 1
+                    BROADCAST_QUEUE_DEPTH.dec()
+        finally:
+            BROADCAST_QUEUE_DEPTH.dec(amount=remaining)
+
+    async def resume_broadcasts(self, slot_at: float):
+        """Finish broadcasts checkpointed by an instance that shut down"""
+        for text, user_ids in self.db.take_broadcast_checkpoints():
+            logger.info(f"Resuming broadcast to {len(user_ids)} users")
+            # Shielded so stopping the scheduler does not cut the broadcast short
+            await asyncio.shield(self.send_to_users(user_ids, text))
+
+    async def prepare_signal(self, slot_at: float):
+        """Prepare the signal of the next candle close ahead of it"""
+        self.signal_pipeline.prepare(slot_at + self.signal_pipeline.lead_time)
+
+    async def broadcast_prepared_signal(self, slot_at: float):
+        """Send the prepared signal at the candle close it was made for"""
+        prepared = self.signal_pipeline.take(slot_at)
+        if prepared and self.leader.is_leader:
+            self.signal_pipeline.publish(prepared)
+            # Shielded so shutdown drains the broadcast instead of cutting it
+            await asyncio.shield(self.send_to_users(
+                prepared['recipients'],
+                prepared['text'],
+                on_first_send=lambda: self.signal_pipeline.record_first_send(prepared)
+            ))
+
+    async def notify_expired(self, user_ids):
+        """Tell users their subscription has run out"""
+        # Shielded so losing leadership mid-send does not drop the notices;
+        # the sweep already marked these users expired and will not find them again
+        await asyncio.shield(self.send_to_users(
+            user_ids,
+            "⌛ <b>Подписка закончилась</b>\n\nЧтобы продолжить получать сигналы, продлите подписку у администратора."
+        ))
+
+    async def cleanup_signals(self, slot_at: float):
+        """Delete signals past the retention period"""
+        deleted = self.db.cleanup_old_signals(days=SIGNAL_RETENTION_DAYS)
+        if deleted:
+            logger.info(f"Deleted {deleted} old signals")
+
+    async def expire_subscriptions(self, slot_at: float):
+        """Expire subscriptions that ran out since the last sweep"""
+        await self.subscription_sweeper.sweep()
+
+    async def log_stats(self, slot_at: float):
+        """Log an hourly summary of users and signals"""
+        resolver = self.signal_resolver.stats()
+        pipeline = self.signal_pipeline.stats()
+        logger.info(f"Stats: {self.db.get_user_count()} users, {self.db.get_confirmed_user_count()} with access, "
+                    f"{pipeline['broadcasts']} scheduled broadcasts, {resolver['resolved']} signals resolved, "
+                    f"{self.subscription_sweeper.expired} subscriptions expired")
+
+    async def feed_ticks(self, interval: float = 1.0):
+        """Feed price ticks into the candle aggregator"""
+        # Simulated quotes stand in for a market data source
+        while True:
             try:
-                await self.application.bot.send_message(
-                    user['user_id'],
-                    text,
-                    parse_mode=ParseMode.HTML
-                )
-                await asyncio.sleep(0.05)  # Small delay
-            except:
-                continue
+                for asset in self.signal_generator.assets:
+                    self.candles.on_tick(asset, self.signal_generator.sample_price(asset))
+                await asyncio.sleep(interval)
+            except Exception as e:
+                logger.error(f"Error feeding ticks: {e}")
+                await asyncio.sleep(interval)
 
-    async def broadcast_message(self, message_text: str):
-        """Broadcast message to all users"""
-        users = self.db.get_all_users_detailed()
+    async def subscribe_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /subscribe <user_id> <plan> admin command"""
+        if update.effective_user.id != ADMIN_USER_ID:
+            return
         
-        text = f"""
-📢 <b>Сообщение от администратора:</b>
-
-{message_text}
+        args = context.args or []
+        if len(args) != 2 or not args[0].isdigit() or args[1].lower() not in SUBSCRIPTION_PLANS:
+            await update.message.reply_text(f"❗️ Формат: /subscribe ID {'|'.join(SUBSCRIPTION_PLANS)}")
+            return
+        
+        user_id, plan = int(args[0]), args[1].lower()
+        expires_at = self.db.set_subscription(user_id, plan, SUBSCRIPTION_PLANS[plan])
+        if expires_at is None:
+            await update.message.reply_text(f"❗️ Пользователь {user_id} не найден")
+            return
+        self.subscription_sweeper.schedule(user_id, expires_at)
+        
+        text = format_subscription(plan, datetime.fromtimestamp(expires_at))
+        try:
+            await self.send_message(user_id, text, parse_mode=ParseMode.HTML)
+        except Exception as e:
+            logger.error(f"Error notifying user {user_id} about subscription: {e}")
+        await update.message.reply_text(f"{user_id}: {text}", parse_mode=ParseMode.HTML)
 
-⏰ {datetime.now().strftime('%H:%M:%S')}
-        """
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /profile [seconds] admin command"""
+        if update.effective_user.id != ADMIN_USER_ID:
+            return
         
-        for user in users:
-            try:
-                await self.application.bot.send_message(
-                    user['user_id'],
-                    text,
-                    parse_mode=ParseMode.HTML
-                )
-                await asyncio.sleep(0.05)  # Small delay
-            except:
-                continue
+        seconds = parse_seconds(context.args)
+        if seconds is None:
+            await update.message.reply_text("❗️ Формат: /profile [секунды]")
+            return
+        
+        await update.message.reply_text(f"⏱ Профилирование {seconds:g} с...")
+        # In the background, so updates keep flowing while sampling
+        self.shutdown.spawn(self._send_profile(update, seconds), drain=False)
 
-    async def auto_broadcast_signals(self):
-        """Auto broadcast signals every 15 minutes"""
-        while True:
+    async def _send_profile(self, update: Update, seconds: float):
+        """Profile and reply with report"""
+        try:
+            report = await self.profiler.profile(seconds)
+            await update.message.reply_text(report[:4000])
+        except Exception as e:
+            logger.error(f"Error profiling: {e}")
+
+    def rate_limited(self, name, handler):
+        """Answer over-limit button taps without running the handler"""
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            query = update.callback_query
+            if query and query.from_user.id != ADMIN_USER_ID and not self.callback_limiter.allow(query.from_user.id):
+                RATE_LIMITED.inc(name)
+                await query.answer("⏳ Слишком часто, подождите пару секунд")
+                return
+            return await handler(update, context)
+        return wrapper
+    
+    def serialized(self, handler):
+        """Run handler in order with the user's other updates"""
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            user = update.effective_user
+            if user is None:
+                return await handler(update, context)
             try:
-                await asyncio.sleep(15 * 60)  # 15 minutes
-                
-                signal = self.signal_generator.generate_signal()
-                if signal:
-                    await self.broadcast_signal(f"📍 {signal['asset']}\n📈 {'ВВЕРХ' if signal['signal_type']=='CALL' else 'ВНИЗ'}\n⏱️ {signal['expiry_time']}")
-                    
-            except Exception as e:
-                logger.error(f"Error in auto broadcast: {e}")
-                await asyncio.sleep(60)
+                return await self.user_queue.run(user.id, handler, update, context)
+            except UserBacklogFull:
+                logger.warning(f"Update backlog full for user {user.id}, dropping update")
+                if update.callback_query:
+                    await update.callback_query.answer("⏳ Обрабатывается...")
+        return wrapper
 
     def setup_handlers(self):
         """Setup bot handlers"""
-        self.application.add_handler(CommandHandler("start", self.start))
-        self.application.add_handler(CallbackQueryHandler(self.button_callback))
-        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        def wrap(name, handler):
+            return self.tracer.wrap(name, self.serialized(handler))
+        
+        self.application.add_handler(CommandHandler("start", wrap("start", self.start)))
+        self.application.add_handler(CommandHandler("profile", self.profile_command))
+        self.application.add_handler(CommandHandler("subscribe", self.subscribe_command))
+        self.application.add_handler(CallbackQueryHandler(
+            self.tracer.wrap("button_callback", self.rate_limited("button_callback", self.serialized(self.button_callback)))
+        ))
+        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, wrap("handle_message", self.handle_message)))
 
     async def run(self):
         """Run the bot"""
@@ -467,54 +759,66 @@ class BinaryOptionsBot:
                 logger.error("BOT_TOKEN not found")
                 return
             
-            self.application = Application.builder().token(BOT_TOKEN).build()
-            self.setup_handlers()
+            # Bind the port first, report readiness once the bot can serve
+            if not self.http.running:
+                with self.startup.phase("http"):
+                    await self.http.start()
+            
+            # Updates run concurrently, ordering per user comes from user_queue
+            with self.startup.phase("application"):
+                request, updates_request = build_requests(
+                    HTTP_POOL_SIZE_UPDATES, HTTP_POOL_SIZE_INTERACTIVE, HTTP_POOL_SIZE_BULK, HTTP_KEEPALIVE_EXPIRY,
+                    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_WRITE_TIMEOUT, HTTP_POOL_TIMEOUT
+                )
+                builder = (Application.builder().token(BOT_TOKEN).base_url(f"{BOT_API_URL}/bot")
+                           .request(request).get_updates_request(updates_request).concurrent_updates(True))
+                if WEBHOOK_URL:
+                    builder = builder.updater(None)
+                self.application = builder.build()
+                self.setup_handlers()
             
             logger.info("Starting bot...")
             
-            await self.application.initialize()
+            stop_event = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(sig, stop_event.set)
+            
+            # Database setup overlaps the first Bot API round trip
+            await asyncio.gather(
+                loop.run_in_executor(None, self._init_components),
+                self.startup.timed("telegram", self.application.initialize()),
+            )
             await self.application.start()
-            await self.application.updater.start_polling()
             
-            # Start auto broadcast
-            asyncio.create_task(self.auto_broadcast_signals())
+            # Read-only signal history for partners and dashboards
+            SignalApi(self.db, SIGNAL_API_CACHE_TTL, SIGNAL_API_TOKEN).add_routes(self.http)
+            
+            with self.startup.phase("updates"):
+                if WEBHOOK_URL:
+                    add_webhook_route(self.http, self.application, WEBHOOK_PATH, WEBHOOK_SECRET,
+                                      is_accepting=self.shutdown.is_accepting)
+                    await self.application.bot.set_webhook(WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET)
+                else:
+                    await self.application.updater.start_polling()
+            
+            # Tick feed runs everywhere; broadcasts, resolver and cleanup only on the leader
+            self.background_tasks = [
+                asyncio.create_task(self.feed_ticks()),
+                asyncio.create_task(self.leader.run()),
+            ]
             
-            logger.info("Bot started successfully!")
+            self.ready = True
+            self.startup.finish()
+            logger.info(f"Bot started successfully ({'webhook' if WEBHOOK_URL else 'polling'})!")
             
-            # Keep running
-            while True:
-                await asyncio.sleep(1)
+            # Keep running until stopped
+            await stop_event.wait()
                 
         except Exception as e:
             logger.error(f"Critical error: {e}")
         finally:
-            try:
-                await self.application.updater.stop()
-                await self.application.stop()
-                await self.application.shutdown()
-            except:
-                pass
-
-def run_http_stub():
-    try:
-        class Handler(BaseHTTPRequestHandler):
-            def do_GET(self):
-                self.send_response(200)
-                self.send_header('Content-type', 'text/plain')
-                self.end_headers()
-                self.wfile.write(b"Bot is running!")
-            
-            def log_message(self, format, *args):
-                pass
-        
-        port = int(os.environ.get("PORT", 8080))
-        server = HTTPServer(("", port), Handler)
-        server.serve_forever()
-    except Exception as e:
-        logger.error(f"HTTP server error: {e}")
-
-# Start HTTP server
-threading.Thread(target=run_http_stub, daemon=True).start()
+            await self.shutdown.run()
 
 async def main():
     """Main function"""
@@ -525,4 +829,4 @@ async def main():
         logger.error(f"Main error: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+import time
+import logging
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+from timeframes import timeframe_to_seconds, candle_open
+
+logger = logging.getLogger(__name__)
+
+class Candle:
+    """OHLC bar"""
+    __slots__ = ('open_time', 'open', 'high', 'low', 'close', 'ticks')
+
+    def __init__(self, open_time: float, price: float):
+        self.open_time = open_time
+        self.open = price
+        self.high = price
+        self.low = price
+        self.close = price
+        self.ticks = 1
+
+    def update(self, price: float):
+        """Apply a tick to the bar"""
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.ticks += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            'open_time': self.open_time,
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'ticks': self.ticks
+        }
+
+
+class CandleAggregator:
+    """Build candles for several timeframes from one tick stream
+
+    Every tick updates the open bar of each timeframe in place. When a
+    tick (or advance()) crosses a bar boundary the bar is closed, kept in
+    a bounded history and passed to subscribers as
+    callback(asset, timeframe_seconds, candle).
+    """
+
+    def __init__(self, timeframes: Iterable[str], history: int = 200):
+        seconds = {timeframe_to_seconds(label) for label in timeframes}
+        seconds.discard(None)
+        self.timeframes: List[int] = sorted(seconds)
+        self.history = history
+
+        self._open_bars = {}  # asset -> [Candle or None per timeframe]
+        self._closed = {}  # (asset, seconds) -> deque of closed candles
+        self._last_prices = {}  # asset -> last tick price
+        self._subscribers = []
+
+    def subscribe(self, callback: Callable[[str, int, Candle], None]):
+        """Register bar-close callback"""
+        self._subscribers.append(callback)
+
+    def on_tick(self, asset: str, price: float, timestamp: float = None):
+        """Apply a price tick to all timeframes"""
+        timestamp = time.time() if timestamp is None else timestamp
+        self._last_prices[asset] = price
+
+        bars = self._open_bars.get(asset)
+        if bars is None:
+            bars = self._open_bars[asset] = [None] * len(self.timeframes)
+
+        for index, seconds in enumerate(self.timeframes):
+            bar = bars[index]
+            if bar is None:
+                bars[index] = Candle(candle_open(timestamp, seconds), price)
+            elif timestamp >= bar.open_time + seconds:
+                self._close_bar(asset, seconds, bar)
+                bars[index] = Candle(candle_open(timestamp, seconds), price)
+            elif timestamp >= bar.open_time:
+                bar.update(price)
+
+    def advance(self, timestamp: float = None):
+        """Close bars whose period ended without a new tick"""
+        timestamp = time.time() if timestamp is None else timestamp
+        for asset, bars in self._open_bars.items():
+            for index, seconds in enumerate(self.timeframes):
+                bar = bars[index]
+                if bar is not None and timestamp >= bar.open_time + seconds:
+                    self._close_bar(asset, seconds, bar)
+                    bars[index] = None
+
+    def _close_bar(self, asset: str, seconds: int, bar: Candle):
+        """Store closed bar and notify subscribers"""
+        key = (asset, seconds)
+        closed = self._closed.get(key)
+        if closed is None:
+            closed = self._closed[key] = deque(maxlen=self.history)
+        closed.append(bar)
+
+        for callback in self._subscribers:
+            try:
+                callback(asset, seconds, bar)
+            except Exception as e:
+                logger.error(f"Error in bar close callback: {e}")
+
+    def last_price(self, asset: str) -> Optional[float]:
+        """Get last tick price for asset"""
+        return self._last_prices.get(asset)
+
+    def current_bar(self, asset: str, timeframe: str) -> Optional[Candle]:
+        """Get the open bar for asset and timeframe"""
+        seconds = timeframe_to_seconds(timeframe)
+        bars = self._open_bars.get(asset)
+        if bars is None or seconds not in self.timeframes:
+            return None
+        return bars[self.timeframes.index(seconds)]
+
+    def get_candles(self, asset: str, timeframe: str, limit: int = None) -> List[Candle]:
+        """Get closed candles, oldest first"""
+        closed = self._closed.get((asset, timeframe_to_seconds(timeframe)))
+        if not closed:
+            return []
+        candles = list(closed)
+        return candles[-limit:] if limit else candles
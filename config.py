@@ -6,6 +6,41 @@ load_dotenv()
 # Telegram Bot Configuration
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 ADMIN_USER_ID = int(os.getenv('ADMIN_USER_ID', 0))
+BOT_API_URL = os.getenv('BOT_API_URL', 'https://api.telegram.org')  # a local Bot API server or a load-test fake
+
+# Webhook Configuration (polling is used when WEBHOOK_URL is not set)
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')  # required with WEBHOOK_URL, 1-256 characters of A-Z a-z 0-9 _ -
+WEBHOOK_PATH = '/telegram/webhook'
+HTTP_PORT = int(os.getenv('PORT', 8080))
+
+# Signal History API (GET /api/signals, /api/signals/stats on HTTP_PORT)
+SIGNAL_API_TOKEN = os.getenv('SIGNAL_API_TOKEN')  # required as "Authorization: Bearer <token>" when set
+SIGNAL_API_CACHE_TTL = 5  # seconds a response is served from memory
+
+# Outbound Bot API Connections (getUpdates, replies to users and broadcasts each get their own pool)
+HTTP_POOL_SIZE_UPDATES = 2  # one long poll at a time, plus a spare
+HTTP_POOL_SIZE_INTERACTIVE = int(os.getenv('HTTP_POOL_SIZE_INTERACTIVE', 64))  # replies and edits in handlers
+HTTP_POOL_SIZE_BULK = int(os.getenv('HTTP_POOL_SIZE_BULK', 8))  # broadcasts; Telegram allows ~30 messages/s anyway
+HTTP_KEEPALIVE_EXPIRY = 30  # seconds an idle connection is kept open
+HTTP_CONNECT_TIMEOUT = 5  # seconds
+HTTP_READ_TIMEOUT = 5  # seconds; getUpdates adds its long poll timeout on top
+HTTP_WRITE_TIMEOUT = 5  # seconds
+HTTP_POOL_TIMEOUT = 5  # seconds a reply waits for a free connection; broadcasts wait as long as needed
+
+# Tracing Configuration
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0))  # share of updates traced, 0..1
+TRACE_SLOW_MS = float(os.getenv('TRACE_SLOW_MS', 1000))  # log traces slower than this
+
+# Update Processing
+USER_QUEUE_BACKLOG = int(os.getenv('USER_QUEUE_BACKLOG', 10))  # updates of one user allowed to wait behind the running one
+CALLBACK_RATE = float(os.getenv('CALLBACK_RATE', 1.0))  # button taps per second refilled per user
+CALLBACK_BURST = int(os.getenv('CALLBACK_BURST', 5))  # taps a user can make in a row
+LEADER_LEASE_TTL = 30  # seconds; a replica that stops renewing loses the scheduler after this
+LEADER_RENEW_INTERVAL = 10  # seconds between lease renewals; failover takes at most TTL + this
+ADMIN_DIGEST_WINDOW = 5  # seconds new platform IDs are collected before the admin's digest is sent or edited
+ADMIN_DIGEST_MAX_AGE = 3600  # seconds after which new IDs go to a fresh digest message, notifying the admin again
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', 8))  # seconds broadcasts may finish before checkpointing
 
 # Database Configuration
 DATABASE_PATH = 'bot_database.db'
@@ -16,6 +51,7 @@ SUBSCRIPTION_PLANS = {
     'premium': 90,
     'vip': 180
 }
+SUBSCRIPTION_SWEEP_WINDOW = 3600  # seconds of upcoming expiries the sweeper loads at a time
 
 # Signal Configuration
 SIGNAL_TYPES = ['CALL', 'PUT']
@@ -27,10 +63,15 @@ PAYMENT_TOKEN = os.getenv('PAYMENT_TOKEN')  # For payment processing
 PAYMENT_PROVIDER = 'stripe'  # or 'yookassa', 'qiwi', etc.
 
 # Logging Configuration
-LOG_LEVEL = 'INFO'
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 LOG_FILE = 'bot.log'
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # 'json' for one JSON object per line
+LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', 'update=0.1')  # share of records kept per event
 
 # Signal Generation Settings
+SIGNAL_RESULT_GRACE = 120  # seconds past expiry a signal is still resolved; later ones are 'expired'
+SIGNAL_BROADCAST_INTERVAL = 15 * 60  # seconds; scheduled signals go out when candles of this length close
 MIN_SIGNAL_INTERVAL = 30  # minutes
 MAX_SIGNALS_PER_DAY = 20
+SIGNAL_RETENTION_DAYS = 30  # older signals are deleted by the daily cleanup
 SIGNAL_ACCURACY_THRESHOLD = 0.7  # 70% accuracy required 
\ No newline at end of file
@@ -1,7 +1,13 @@
+import json
+import time
 import sqlite3
 import logging
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
+
+from config import SIGNAL_RESULT_GRACE
+from metrics import timed_query
+from timeframes import timeframe_to_seconds
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +42,27 @@ class Database:
                     )
                 """)
                 
+                # Plan subscriptions (added later); expires_at is unix time, NULL never expires
+                self._ensure_columns(cursor, "users", {
+                    "plan": "TEXT",
+                    "expires_at": "REAL"
+                })
+                
+                # Platform ID submissions: a database-wide sequence number, so the admin
+                # digest can name the ones it showed whatever replica received them
+                self._ensure_columns(cursor, "users", {
+                    "submitted_seq": "INTEGER",
+                    "submitted_at": "REAL"
+                })
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_submitted_seq ON users(submitted_seq)")
+                
+                # Only confirmed users with an expiry are indexed, so the sweeper's
+                # range scan sees just the subscriptions that can still run out
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_users_active_expiry ON users(expires_at)
+                    WHERE id_status = 'confirmed' AND expires_at IS NOT NULL
+                """)
+                
                 # Signals table - simplified
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS signals (
@@ -50,12 +77,114 @@ class Database:
                     )
                 """)
                 
+                # Signal outcomes (added later, migrate existing databases)
+                self._ensure_columns(cursor, "signals", {
+                    "result": "TEXT",
+                    "close_price": "TEXT",
+                    "resolved_at": "TIMESTAMP",
+                    # Slot the signal was issued for; expiry counts from it, not from created_at
+                    "issued_at": "TIMESTAMP"
+                })
+                
+                # History pages are read newest first by (created_at, id); both indexes
+                # end in the rowid, so ranges and keyset cursors are index scans
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_signals_created_at ON signals(created_at)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_signals_asset_created_at ON signals(asset, created_at)")
+                
+                # Per-asset totals kept up to date by add_signal and set_signal_results;
+                # they cover all signals ever made, cleanup does not subtract.
+                # Tables from before the expired count were built from unchecked
+                # results, they are dropped and built again below
+                cursor.execute("PRAGMA table_info(signal_stats)")
+                stats_columns = {row['name'] for row in cursor.fetchall()}
+                if stats_columns and 'expired' not in stats_columns:
+                    cursor.execute("DROP TABLE signal_stats")
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS signal_stats (
+                        asset TEXT PRIMARY KEY,
+                        total INTEGER NOT NULL DEFAULT 0,
+                        wins INTEGER NOT NULL DEFAULT 0,
+                        losses INTEGER NOT NULL DEFAULT 0,
+                        draws INTEGER NOT NULL DEFAULT 0,
+                        expired INTEGER NOT NULL DEFAULT 0,
+                        accuracy_sum INTEGER NOT NULL DEFAULT 0,
+                        first_at TIMESTAMP,
+                        last_at TIMESTAMP
+                    )
+                """)
+                if cursor.execute("SELECT 1 FROM signal_stats LIMIT 1").fetchone() is None:
+                    self._expire_late_results(conn)
+                    # Databases from before the table: backfill from the signals kept
+                    cursor.execute("""
+                        INSERT INTO signal_stats (asset, total, wins, losses, draws, expired, accuracy_sum, first_at, last_at)
+                        SELECT asset, COUNT(*), SUM(result = 'win'), SUM(result = 'loss'), SUM(result = 'draw'),
+                               SUM(result = 'expired'), SUM(accuracy), MIN(created_at), MAX(created_at)
+                        FROM signals GROUP BY asset
+                    """)
+                
+                # Leader election leases, one row per lease name
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS leases (
+                        name TEXT PRIMARY KEY,
+                        holder TEXT NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+                
+                # Recipients left over when shutdown interrupted a broadcast
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS broadcast_checkpoints (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        text TEXT NOT NULL,
+                        user_ids TEXT NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                # Users the admin selected on the pending screen, shared by all replicas;
+                # rows of users resolved meanwhile are ignored and dropped on take
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS pending_selection (
+                        user_id INTEGER PRIMARY KEY
+                    )
+                """)
+                # Pending screen pages and counts read only pending users, in screen order
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_users_pending ON users(created_at, user_id)
+                    WHERE id_status = 'pending' AND platform_id IS NOT NULL
+                """)
+                
                 conn.commit()
                 logger.info("Database initialized successfully")
                 
         except Exception as e:
             logger.error(f"Error initializing database: {e}")
     
+    def _expire_late_results(self, conn):
+        """Replace outcomes written long after expiry with 'expired'
+
+        Before the resolver had a grace period it resolved signals left over
+        from downtime against the price at startup, not at their expiry.
+        """
+        conn.create_function("timeframe_seconds", 1, timeframe_to_seconds, deterministic=True)
+        cursor = conn.execute("""
+            UPDATE signals SET result = 'expired', close_price = NULL
+            WHERE result IN ('win', 'loss', 'draw')
+              AND (julianday(resolved_at) - julianday(COALESCE(issued_at, created_at))) * 86400
+                  > IFNULL(timeframe_seconds(expiry_time), 0) + ?
+        """, (SIGNAL_RESULT_GRACE,))
+        if cursor.rowcount:
+            logger.info(f"Expired {cursor.rowcount} signal results written after the grace period")
+    
+    def _ensure_columns(self, cursor, table: str, columns: Dict[str, str]):
+        """Add missing columns to existing table"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row['name'] for row in cursor.fetchall()}
+        for name, column_type in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+    
+    @timed_query
     def add_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None) -> bool:
         """Add new user to database"""
         try:
@@ -71,6 +200,7 @@ class Database:
             logger.error(f"Error adding user {user_id}: {e}")
             return False
     
+    @timed_query
     def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get user by ID"""
         try:
@@ -83,6 +213,7 @@ class Database:
             logger.error(f"Error getting user {user_id}: {e}")
             return None
     
+    @timed_query
     def get_user_by_platform_id(self, platform_id: str) -> Optional[Dict[str, Any]]:
         """Get user by platform ID"""
         try:
@@ -95,38 +226,46 @@ class Database:
             logger.error(f"Error getting user by platform_id {platform_id}: {e}")
             return None
     
+    @timed_query
     def set_platform_id(self, user_id: int, platform_id: str) -> bool:
-        """Set platform ID for user"""
+        """Set platform ID for user; it waits for confirmation as the newest submission"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     UPDATE users 
-                    SET platform_id = ?, id_status = 'pending', last_activity = CURRENT_TIMESTAMP
+                    SET platform_id = ?, id_status = 'pending', last_activity = CURRENT_TIMESTAMP,
+                        submitted_seq = (SELECT COALESCE(MAX(submitted_seq), 0) + 1 FROM users), submitted_at = ?
                     WHERE user_id = ?
-                """, (platform_id, user_id))
+                """, (platform_id, time.time(), user_id))
                 conn.commit()
                 return cursor.rowcount > 0
         except Exception as e:
             logger.error(f"Error setting platform_id for user {user_id}: {e}")
             return False
     
+    @timed_query
     def confirm_user_id(self, user_id: int) -> bool:
-        """Confirm user access"""
+        """Confirm user access; an unexpired plan is kept, otherwise access does not expire"""
+        now = time.time()
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     UPDATE users 
-                    SET id_status = 'confirmed', last_activity = CURRENT_TIMESTAMP
+                    SET id_status = 'confirmed',
+                        plan = CASE WHEN expires_at > ? THEN plan END,
+                        expires_at = CASE WHEN expires_at > ? THEN expires_at END,
+                        last_activity = CURRENT_TIMESTAMP
                     WHERE user_id = ?
-                """, (user_id,))
+                """, (now, now, user_id))
                 conn.commit()
                 return cursor.rowcount > 0
         except Exception as e:
             logger.error(f"Error confirming user {user_id}: {e}")
             return False
     
+    @timed_query
     def block_user(self, user_id: int) -> bool:
         """Block user"""
         try:
@@ -143,7 +282,111 @@ class Database:
             logger.error(f"Error blocking user {user_id}: {e}")
             return False
     
-    def get_all_users_detailed(self) -> List[Dict[str, Any]]:
+    @timed_query
+    def confirm_users(self, user_ids: List[int]) -> List[int]:
+        """Confirm access of many pending users in one statement, keeping unexpired plans
+
+        Returns the users confirmed; those resolved meanwhile, e.g. blocked
+        from another screen, are left alone and not returned.
+        """
+        now = time.time()
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    UPDATE users 
+                    SET id_status = 'confirmed',
+                        plan = CASE WHEN expires_at > ? THEN plan END,
+                        expires_at = CASE WHEN expires_at > ? THEN expires_at END,
+                        last_activity = CURRENT_TIMESTAMP
+                    WHERE user_id IN (SELECT value FROM json_each(?)) AND id_status = 'pending'
+                    RETURNING user_id
+                """, (now, now, json.dumps(list(user_ids))))
+                changed = [row['user_id'] for row in cursor.fetchall()]
+                conn.commit()
+                return changed
+        except Exception as e:
+            logger.error(f"Error confirming {len(user_ids)} users: {e}")
+            return []
+    
+    @timed_query
+    def confirm_submissions(self, after_seq: int, until_seq: int) -> List[int]:
+        """Confirm users still pending whose submission is in (after_seq, until_seq]; returns them"""
+        now = time.time()
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    UPDATE users 
+                    SET id_status = 'confirmed',
+                        plan = CASE WHEN expires_at > ? THEN plan END,
+                        expires_at = CASE WHEN expires_at > ? THEN expires_at END,
+                        last_activity = CURRENT_TIMESTAMP
+                    WHERE submitted_seq > ? AND submitted_seq <= ? AND id_status = 'pending'
+                    RETURNING user_id
+                """, (now, now, after_seq, until_seq))
+                changed = [row['user_id'] for row in cursor.fetchall()]
+                conn.commit()
+                return changed
+        except Exception as e:
+            logger.error(f"Error confirming submissions {after_seq}..{until_seq}: {e}")
+            return []
+    
+    @timed_query
+    def get_pending_submissions(self, after_seq: int) -> List[Dict[str, Any]]:
+        """Users still pending who submitted an ID after after_seq, in the admin digest's fields"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT submitted_seq AS seq, user_id, COALESCE(first_name, username) AS name,
+                           platform_id, submitted_at AS at
+                    FROM users
+                    WHERE submitted_seq > ? AND id_status = 'pending' AND platform_id IS NOT NULL
+                    ORDER BY submitted_seq
+                """, (after_seq,))
+                rows = cursor.fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error getting pending submissions: {e}")
+            return []
+    
+    @timed_query
+    def get_submission_seq(self, before: float) -> int:
+        """Sequence number of the last ID submitted before a unix time"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT COALESCE(MAX(submitted_seq), 0) AS seq FROM users WHERE submitted_at < ?",
+                    (before,)
+                )
+                return cursor.fetchone()['seq']
+        except Exception as e:
+            logger.error(f"Error getting submission sequence: {e}")
+            return 0
+    
+    @timed_query
+    def block_users(self, user_ids: List[int]) -> List[int]:
+        """Block many pending users in one statement; returns the users blocked"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    UPDATE users 
+                    SET id_status = 'blocked', last_activity = CURRENT_TIMESTAMP
+                    WHERE user_id IN (SELECT value FROM json_each(?)) AND id_status = 'pending'
+                    RETURNING user_id
+                """, (json.dumps(list(user_ids)),))
+                changed = [row['user_id'] for row in cursor.fetchall()]
+                conn.commit()
+                return changed
+        except Exception as e:
+            logger.error(f"Error blocking {len(user_ids)} users: {e}")
+            return []
+    
+    @timed_query
+    def get_all_users_detailed(self, limit: int = -1) -> List[Dict[str, Any]]:
         """Get all users with details"""
         try:
             with self.get_connection() as conn:
@@ -152,13 +395,15 @@ class Database:
                     SELECT user_id, username, first_name, last_name, platform_id, id_status, created_at, last_activity
                     FROM users
                     ORDER BY created_at DESC
-                """)
+                    LIMIT ?
+                """, (limit,))
                 rows = cursor.fetchall()
                 return [dict(row) for row in rows]
         except Exception as e:
             logger.error(f"Error getting all users: {e}")
             return []
     
+    @timed_query
     def get_pending_users(self) -> List[Dict[str, Any]]:
         """Get users waiting for confirmation"""
         try:
@@ -176,34 +421,197 @@ class Database:
             logger.error(f"Error getting pending users: {e}")
             return []
     
-    def get_confirmed_users(self) -> List[int]:
-        """Get list of confirmed user IDs"""
+    @timed_query
+    def count_pending_users(self) -> Tuple[int, int]:
+        """(pending, selected) counts for the pending screen"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                # Planner hints: the partial index holds only pending users, and CROSS JOIN
+                # starts from the small selection instead of every pending user
+                cursor.execute("""
+                    SELECT
+                        (SELECT COUNT(*) FROM users INDEXED BY idx_users_pending
+                         WHERE id_status = 'pending' AND platform_id IS NOT NULL) AS pending,
+                        (SELECT COUNT(*) FROM pending_selection s CROSS JOIN users u ON u.user_id = s.user_id
+                         WHERE u.id_status = 'pending' AND u.platform_id IS NOT NULL) AS selected
+                """)
+                row = cursor.fetchone()
+                return row['pending'], row['selected']
+        except Exception as e:
+            logger.error(f"Error counting pending users: {e}")
+            return 0, 0
+    
+    @timed_query
+    def get_pending_page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        """One page of pending users in screen order, with their 'selected' flag"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT user_id FROM users WHERE id_status = 'confirmed'")
+                cursor.execute("""
+                    SELECT u.user_id, u.first_name, u.platform_id, s.user_id IS NOT NULL AS selected
+                    FROM users u LEFT JOIN pending_selection s ON s.user_id = u.user_id
+                    WHERE u.id_status = 'pending' AND u.platform_id IS NOT NULL
+                    ORDER BY u.created_at, u.user_id
+                    LIMIT ? OFFSET ?
+                """, (limit, offset))
                 rows = cursor.fetchall()
-                return [row['user_id'] for row in rows]
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error getting pending page: {e}")
+            return []
+    
+    @timed_query
+    def toggle_pending_selection(self, user_id: int) -> bool:
+        """Select a pending user, or unselect a selected one"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM pending_selection WHERE user_id = ?", (user_id,))
+                if cursor.rowcount == 0:
+                    cursor.execute("""
+                        INSERT INTO pending_selection (user_id)
+                        SELECT user_id FROM users
+                        WHERE user_id = ? AND id_status = 'pending' AND platform_id IS NOT NULL
+                    """, (user_id,))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error toggling pending user {user_id}: {e}")
+            return False
+    
+    @timed_query
+    def select_pending_users(self, offset: int = 0, limit: int = -1) -> bool:
+        """Select a slice of pending users in screen order; all of them by default"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT OR IGNORE INTO pending_selection (user_id)
+                    SELECT user_id FROM users
+                    WHERE id_status = 'pending' AND platform_id IS NOT NULL
+                    ORDER BY created_at, user_id
+                    LIMIT ? OFFSET ?
+                """, (limit, offset))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error selecting pending users: {e}")
+            return False
+    
+    @timed_query
+    def select_pending_range(self, first_id: int, last_id: int) -> bool:
+        """Select pending users between two of them in screen order, both included
+
+        False if either end is no longer pending; nothing is selected then.
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT created_at, user_id FROM users
+                    WHERE user_id IN (?, ?) AND id_status = 'pending' AND platform_id IS NOT NULL
+                    ORDER BY created_at, user_id
+                """, (first_id, last_id))
+                ends = [tuple(row) for row in cursor.fetchall()]
+                if len(ends) != len({first_id, last_id}):
+                    return False
+                cursor.execute("""
+                    INSERT OR IGNORE INTO pending_selection (user_id)
+                    SELECT user_id FROM users
+                    WHERE id_status = 'pending' AND platform_id IS NOT NULL
+                      AND (created_at, user_id) BETWEEN (?, ?) AND (?, ?)
+                """, ends[0] + ends[-1])
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error selecting pending users {first_id}..{last_id}: {e}")
+            return False
+    
+    @timed_query
+    def clear_pending_selection(self) -> bool:
+        """Unselect everyone on the pending screen"""
+        try:
+            with self.get_connection() as conn:
+                conn.execute("DELETE FROM pending_selection")
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error clearing pending selection: {e}")
+            return False
+    
+    @timed_query
+    def take_pending_selection(self) -> List[int]:
+        """Remove the selection and return the selected users still pending, in screen order"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT u.user_id FROM pending_selection s CROSS JOIN users u ON u.user_id = s.user_id
+                    WHERE u.id_status = 'pending' AND u.platform_id IS NOT NULL
+                    ORDER BY u.created_at, u.user_id
+                """)
+                user_ids = [row['user_id'] for row in cursor.fetchall()]
+                cursor.execute("DELETE FROM pending_selection")
+                conn.commit()
+                return user_ids
+        except Exception as e:
+            logger.error(f"Error taking pending selection: {e}")
+            return []
+    
+    @timed_query
+    def get_confirmed_users(self, now: float = None) -> List[int]:
+        """Get list of confirmed user IDs whose subscription has not run out"""
+        try:
+            with self.get_connection() as conn:
+                conn.row_factory = None
+                # Expiry is checked on the row already read, the sweeper may not have caught up yet
+                rows = conn.execute(
+                    "SELECT user_id FROM users WHERE id_status = 'confirmed' AND (expires_at IS NULL OR expires_at > ?)",
+                    (time.time() if now is None else now,)
+                ).fetchall()
+                return [row[0] for row in rows]
         except Exception as e:
             logger.error(f"Error getting confirmed users: {e}")
             return []
     
+    @timed_query
+    def get_all_user_ids(self) -> List[int]:
+        """Get IDs of all users"""
+        try:
+            with self.get_connection() as conn:
+                conn.row_factory = None  # Plain tuples, no per-row mapping objects
+                rows = conn.execute("SELECT user_id FROM users").fetchall()
+                return [row[0] for row in rows]
+        except Exception as e:
+            logger.error(f"Error getting user IDs: {e}")
+            return []
+    
+    @timed_query
     def add_signal(self, asset: str, signal_type: str, expiry_time: str, 
-                   entry_price: str, target_price: str, accuracy: int) -> int:
-        """Add new signal to database"""
+                   entry_price: str, target_price: str, accuracy: int, issued_at: float = None) -> int:
+        """Add new signal to database; issued_at (unix time) defaults to now"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
-                    INSERT INTO signals (asset, signal_type, expiry_time, entry_price, target_price, accuracy)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (asset, signal_type, expiry_time, entry_price, target_price, accuracy))
+                    INSERT INTO signals (asset, signal_type, expiry_time, entry_price, target_price, accuracy, issued_at)
+                    VALUES (?, ?, ?, ?, ?, ?, COALESCE(datetime(?, 'unixepoch'), CURRENT_TIMESTAMP))
+                """, (asset, signal_type, expiry_time, entry_price, target_price, accuracy, issued_at))
+                signal_id = cursor.lastrowid
+                cursor.execute("""
+                    INSERT INTO signal_stats (asset, total, accuracy_sum, first_at, last_at)
+                    VALUES (?, 1, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                    ON CONFLICT(asset) DO UPDATE SET
+                        total = total + 1, accuracy_sum = accuracy_sum + excluded.accuracy_sum, last_at = excluded.last_at
+                """, (asset, accuracy))
                 conn.commit()
-                return cursor.lastrowid
+                return signal_id
         except Exception as e:
             logger.error(f"Error adding signal: {e}")
             return 0
     
+    @timed_query
     def get_active_signals(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent active signals"""
         try:
@@ -220,6 +628,266 @@ class Database:
             logger.error(f"Error getting active signals: {e}")
             return []
     
+    @timed_query
+    def get_signal_page(self, asset: str = None, since: str = None, until: str = None,
+                        before: Tuple[str, int] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Signals newest first in [since, until), continuing below the (created_at, id) cursor"""
+        clauses, params = [], []
+        if asset:
+            clauses.append("asset = ?")
+            params.append(asset)
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append("created_at < ?")
+            params.append(until)
+        if before:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend(before)
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT id, asset, signal_type, expiry_time, entry_price, target_price, accuracy,
+                           created_at, result, close_price, resolved_at
+                    FROM signals
+                    WHERE {" AND ".join(clauses) or "1"}
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                """, (*params, limit))
+                rows = cursor.fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error getting signal page: {e}")
+            return []
+    
+    @timed_query
+    def get_signal_stats(self, asset: str = None) -> List[Dict[str, Any]]:
+        """Per-asset signal totals and outcomes"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT asset, total, wins, losses, draws, expired, accuracy_sum, first_at, last_at
+                    FROM signal_stats
+                    WHERE ? IS NULL OR asset = ?
+                    ORDER BY asset
+                """, (asset, asset))
+                rows = cursor.fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error getting signal stats: {e}")
+            return []
+    
+    @timed_query
+    def get_signals_since(self, hours: int = 24) -> List[Dict[str, Any]]:
+        """Get signals created in the last N hours, oldest first"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT id, asset, created_at FROM signals
+                    WHERE created_at >= datetime('now', ?)
+                    ORDER BY created_at ASC
+                """, (f'-{int(hours)} hours',))
+                rows = cursor.fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error getting recent signals: {e}")
+            return []
+    
+    @timed_query
+    def get_unresolved_signals(self, hours: int = 24) -> List[Dict[str, Any]]:
+        """Get signals without outcome created in the last N hours"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT id, asset, signal_type, expiry_time, entry_price,
+                           COALESCE(issued_at, created_at) AS issued_at
+                    FROM signals
+                    WHERE result IS NULL AND created_at >= datetime('now', ?)
+                    ORDER BY id ASC
+                """, (f'-{int(hours)} hours',))
+                rows = cursor.fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error getting unresolved signals: {e}")
+            return []
+    
+    @timed_query
+    def expire_unresolved_signals(self, hours: int = 24) -> int:
+        """Mark signals older than N hours that never got an outcome as 'expired'"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cutoff = f'-{int(hours)} hours'
+                cursor.execute("""
+                    UPDATE signal_stats SET expired = expired + (
+                        SELECT COUNT(*) FROM signals
+                        WHERE signals.asset = signal_stats.asset
+                          AND result IS NULL AND created_at < datetime('now', ?)
+                    )
+                """, (cutoff,))
+                cursor.execute("""
+                    UPDATE signals SET result = 'expired', resolved_at = CURRENT_TIMESTAMP
+                    WHERE result IS NULL AND created_at < datetime('now', ?)
+                """, (cutoff,))
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error expiring unresolved signals: {e}")
+            return 0
+    
+    @timed_query
+    def set_signal_results(self, results: List[Tuple[str, str, int]]) -> int:
+        """Store signal outcomes as (result, close_price, signal_id) in one transaction"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                # Counted before the update, so a signal resolved twice is counted once
+                cursor.executemany("""
+                    UPDATE signal_stats SET
+                        wins = wins + (? = 'win'), losses = losses + (? = 'loss'), draws = draws + (? = 'draw'),
+                        expired = expired + (? = 'expired')
+                    WHERE asset = (SELECT asset FROM signals WHERE id = ? AND result IS NULL)
+                """, [(result, result, result, result, signal_id) for result, _, signal_id in results])
+                cursor.executemany("""
+                    UPDATE signals
+                    SET result = ?, close_price = ?, resolved_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, results)
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error saving signal results: {e}")
+            return 0
+    
+    @timed_query
+    def save_broadcast_checkpoint(self, text: str, user_ids: List[int]) -> bool:
+        """Save recipients that have not received a broadcast yet"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO broadcast_checkpoints (text, user_ids) VALUES (?, ?)",
+                    (text, json.dumps(list(user_ids)))
+                )
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error saving broadcast checkpoint: {e}")
+            return False
+    
+    @timed_query
+    def take_broadcast_checkpoints(self) -> List[Tuple[str, List[int]]]:
+        """Remove and return saved broadcasts; each one goes to a single caller"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute("SELECT id, text, user_ids FROM broadcast_checkpoints ORDER BY id")
+                rows = cursor.fetchall()
+                if rows:
+                    cursor.execute("DELETE FROM broadcast_checkpoints WHERE id <= ?", (rows[-1]['id'],))
+                conn.commit()
+                return [(row['text'], json.loads(row['user_ids'])) for row in rows]
+        except Exception as e:
+            logger.error(f"Error taking broadcast checkpoints: {e}")
+            return []
+    
+    @timed_query
+    def acquire_lease(self, name: str, holder: str, ttl: float, now: float) -> bool:
+        """Take or renew lease name for ttl seconds if it is free, expired or already ours"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+                    WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+                """, (name, holder, now + ttl, now))
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error acquiring lease {name}: {e}")
+            return False
+    
+    @timed_query
+    def release_lease(self, name: str, holder: str) -> bool:
+        """Give up lease name if we hold it"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error releasing lease {name}: {e}")
+            return False
+    
+    @timed_query
+    def set_subscription(self, user_id: int, plan: str, days: int, now: float = None) -> Optional[float]:
+        """Confirm user on plan for days, extending a running subscription; returns new expiry"""
+        now = time.time() if now is None else now
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    UPDATE users
+                    SET id_status = 'confirmed', plan = ?,
+                        expires_at = MAX(COALESCE(expires_at, 0), ?) + ?,
+                        last_activity = CURRENT_TIMESTAMP
+                    WHERE user_id = ?
+                    RETURNING expires_at
+                """, (plan, now, days * 86400, user_id))
+                row = cursor.fetchone()
+                conn.commit()
+                return row['expires_at'] if row else None
+        except Exception as e:
+            logger.error(f"Error setting subscription for user {user_id}: {e}")
+            return None
+    
+    @timed_query
+    def get_expiring_users(self, until: float) -> List[Tuple[int, float]]:
+        """Get (user_id, expires_at) of confirmed users whose access ends by until"""
+        try:
+            with self.get_connection() as conn:
+                conn.row_factory = None
+                # Same terms as the partial index, so this is a range scan on it
+                return conn.execute("""
+                    SELECT user_id, expires_at FROM users
+                    WHERE id_status = 'confirmed' AND expires_at IS NOT NULL AND expires_at <= ?
+                    ORDER BY expires_at
+                """, (until,)).fetchall()
+        except Exception as e:
+            logger.error(f"Error getting expiring users: {e}")
+            return []
+    
+    @timed_query
+    def expire_users(self, user_ids: List[int], now: float = None) -> List[int]:
+        """Mark subscriptions that have run out as expired; returns the users changed"""
+        now = time.time() if now is None else now
+        expired = []
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                for user_id in user_ids:
+                    # A plan extended meanwhile has a later expires_at and is left alone
+                    cursor.execute("""
+                        UPDATE users SET id_status = 'expired'
+                        WHERE user_id = ? AND id_status = 'confirmed' AND expires_at <= ?
+                    """, (user_id, now))
+                    if cursor.rowcount:
+                        expired.append(user_id)
+                conn.commit()
+                return expired
+        except Exception as e:
+            logger.error(f"Error expiring users: {e}")
+            return []
+    
+    @timed_query
     def get_user_count(self) -> int:
         """Get total user count"""
         try:
@@ -232,18 +900,23 @@ class Database:
             logger.error(f"Error getting user count: {e}")
             return 0
     
+    @timed_query
     def get_confirmed_user_count(self) -> int:
         """Get confirmed user count"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) as count FROM users WHERE id_status = 'confirmed'")
+                cursor.execute(
+                    "SELECT COUNT(*) as count FROM users WHERE id_status = 'confirmed' AND (expires_at IS NULL OR expires_at > ?)",
+                    (time.time(),)
+                )
                 row = cursor.fetchone()
                 return row['count'] if row else 0
         except Exception as e:
             logger.error(f"Error getting confirmed user count: {e}")
             return 0
     
+    @timed_query
     def update_user_activity(self, user_id: int) -> bool:
         """Update user's last activity"""
         try:
@@ -260,6 +933,7 @@ class Database:
             logger.error(f"Error updating user activity {user_id}: {e}")
             return False
     
+    @timed_query
     def cleanup_old_signals(self, days: int = 7) -> int:
         """Clean up old signals"""
         try:
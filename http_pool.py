@@ -0,0 +1,117 @@
+import time
+import asyncio
+import contextlib
+import contextvars
+from typing import Optional, Tuple
+
+import httpx
+from telegram.error import TimedOut
+from telegram.request import BaseRequest, HTTPXRequest, RequestData
+
+from metrics import counter, gauge, histogram
+
+POOL_WAIT = histogram("bot_http_pool_wait_seconds", "Time Bot API calls waited for a free connection", ["pool"])
+POOL_IN_USE = gauge("bot_http_pool_connections_in_use", "Connections busy with a Bot API call", ["pool"])
+POOL_TIMEOUTS = counter("bot_http_pool_timeouts_total", "Bot API calls dropped waiting for a connection", ["pool"])
+
+_bulk = contextvars.ContextVar("bulk_sends", default=False)
+
+
+@contextlib.contextmanager
+def bulk_sends():
+    """Send Bot API calls made inside through the bulk pool"""
+    token = _bulk.set(True)
+    try:
+        yield
+    finally:
+        _bulk.reset(token)
+
+
+class PooledRequest(HTTPXRequest):
+    """HTTPXRequest whose wait for one of its pool_size connections is measured
+
+    A semaphore of the pool size is taken before handing the call to
+    httpx, so the time spent waiting for it is the time spent waiting for
+    a connection, and httpx never queues internally.
+    """
+
+    def __init__(self, name: str, pool_size: int, keepalive_expiry: float = 30.0, **kwargs):
+        # Read by _build_client, which HTTPXRequest.__init__ calls
+        self.name = name
+        self.pool_size = pool_size
+        self.keepalive_expiry = keepalive_expiry
+        super().__init__(connection_pool_size=pool_size, **kwargs)
+
+        self._slots = asyncio.Semaphore(pool_size)
+        self._in_use = 0
+        POOL_IN_USE.set_function(lambda: self._in_use, name)
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """The HTTPXRequest client, with the keepalive expiry it takes no parameter for"""
+        limits = httpx.Limits(
+            max_connections=self.pool_size,
+            max_keepalive_connections=self.pool_size,
+            keepalive_expiry=self.keepalive_expiry
+        )
+        return httpx.AsyncClient(**{**self._client_kwargs, "limits": limits})
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=BaseRequest.DEFAULT_NONE, write_timeout=BaseRequest.DEFAULT_NONE,
+                         connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE) -> Tuple[int, bytes]:
+        timeout = self._client.timeout.pool if pool_timeout is BaseRequest.DEFAULT_NONE else pool_timeout
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            POOL_TIMEOUTS.inc(self.name)
+            raise TimedOut(f"Pool timeout: all {self.pool_size} connections of the {self.name} pool are busy") from None
+        POOL_WAIT.observe(time.perf_counter() - started, self.name)
+
+        self._in_use += 1
+        try:
+            return await super().do_request(url, method, request_data, read_timeout, write_timeout,
+                                            connect_timeout, pool_timeout)
+        finally:
+            self._in_use -= 1
+            self._slots.release()
+
+
+class RoutedRequest(BaseRequest):
+    """Bot API calls through the interactive pool, or the bulk pool inside bulk_sends()
+
+    Broadcasts can then fill their own connections without making
+    replies to users wait behind them.
+    """
+
+    def __init__(self, interactive: PooledRequest, bulk: PooledRequest):
+        self.interactive = interactive
+        self.bulk = bulk
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self.interactive.read_timeout
+
+    async def initialize(self):
+        await self.interactive.initialize()
+        await self.bulk.initialize()
+
+    async def shutdown(self):
+        await self.interactive.shutdown()
+        await self.bulk.shutdown()
+
+    async def do_request(self, *args, **kwargs) -> Tuple[int, bytes]:
+        pool = self.bulk if _bulk.get() else self.interactive
+        return await pool.do_request(*args, **kwargs)
+
+
+def build_requests(updates_pool: int, interactive_pool: int, bulk_pool: int, keepalive_expiry: float,
+                   connect_timeout: float, read_timeout: float, write_timeout: float,
+                   pool_timeout: float) -> Tuple[RoutedRequest, PooledRequest]:
+    """Request objects for ApplicationBuilder.request() and .get_updates_request()"""
+    timeouts = dict(connect_timeout=connect_timeout, read_timeout=read_timeout, write_timeout=write_timeout)
+    interactive = PooledRequest("interactive", interactive_pool, keepalive_expiry, pool_timeout=pool_timeout, **timeouts)
+    # Bulk sends wait for a connection as long as it takes
+    bulk = PooledRequest("bulk", bulk_pool, keepalive_expiry, pool_timeout=None, **timeouts)
+    updates = PooledRequest("updates", updates_pool, keepalive_expiry, pool_timeout=pool_timeout, **timeouts)
+    return RoutedRequest(interactive, bulk), updates
@@ -0,0 +1,223 @@
+import hmac
+import json
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import urlsplit, parse_qsl
+
+logger = logging.getLogger(__name__)
+
+REASONS = {
+    200: "OK", 204: "No Content", 304: "Not Modified", 400: "Bad Request", 401: "Unauthorized",
+    403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+    429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable"
+}
+
+
+class Request:
+    """Parsed HTTP request"""
+    __slots__ = ('method', 'path', 'query', 'headers', 'body')
+
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = dict(parse_qsl(url.query))
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body or b"null")
+
+
+class Response:
+    """HTTP response"""
+    __slots__ = ('status', 'body', 'content_type', 'headers')
+
+    def __init__(self, status: int = 200, body: bytes = b"", content_type: str = "text/plain; charset=utf-8",
+                 headers: Dict[str, str] = None):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+
+    @classmethod
+    def text(cls, text: str, status: int = 200) -> "Response":
+        return cls(status, text.encode())
+
+    @classmethod
+    def json(cls, data, status: int = 200, headers: Dict[str, str] = None) -> "Response":
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+        return cls(status, body, "application/json", headers)
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class HttpServer:
+    """Minimal HTTP/1.1 server on the running event loop
+
+    Serves the webhook, health checks and other small endpoints from one
+    asyncio server instead of a blocking server thread.
+    """
+
+    def __init__(self, host: str = "", port: int = 8080, max_body: int = 1024 * 1024,
+                 keepalive_timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.max_body = max_body
+        self.keepalive_timeout = keepalive_timeout
+
+        self._routes = {}  # (method, path) -> handler
+        self._prefix_routes = []  # (method, prefix, handler)
+        self._server = None
+
+    def route(self, method: str, path: str, handler: Handler, prefix: bool = False):
+        """Register handler for method and path"""
+        if prefix:
+            self._prefix_routes.append((method, path, handler))
+        else:
+            self._routes[(method, path)] = handler
+
+    def _find_handler(self, method: str, path: str) -> Optional[Handler]:
+        handler = self._routes.get((method, path))
+        if handler is None:
+            for route_method, prefix, prefix_handler in self._prefix_routes:
+                if route_method == method and path.startswith(prefix):
+                    return prefix_handler
+        return handler
+
+    async def start(self):
+        """Start listening"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host or None, self.port)
+        logger.info(f"HTTP server started on port {self.port}")
+
+    @property
+    def running(self) -> bool:
+        return self._server is not None
+
+    async def stop(self):
+        """Stop listening and close the server"""
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+
+                response = await self._dispatch(request)
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                self._write_response(writer, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError as e:
+            self._write_response(writer, Response.text(str(e), 400), False)
+        except Exception as e:
+            logger.error(f"HTTP connection error: {e}")
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        line = await asyncio.wait_for(reader.readline(), self.keepalive_timeout)
+        if not line:
+            return None
+
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise ValueError("Bad request line")
+        method, target, _ = parts
+
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), self.keepalive_timeout)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length") or 0)
+        if length > self.max_body:
+            raise ValueError("Body too large")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method, target, headers, body)
+
+    async def _dispatch(self, request: Request) -> Response:
+        handler = self._find_handler(request.method, request.path)
+        if handler is None:
+            return Response.text("Not Found", 404)
+        try:
+            return await handler(request)
+        except Exception as e:
+            logger.error(f"Error handling {request.method} {request.path}: {e}")
+            return Response.text("Internal Server Error", 500)
+
+    def _write_response(self, writer: asyncio.StreamWriter, response: Response, keep_alive: bool):
+        head = [
+            f"HTTP/1.1 {response.status} {REASONS.get(response.status, '')}",
+            f"Content-Type: {response.content_type}",
+            f"Content-Length: {len(response.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        head.extend(f"{name}: {value}" for name, value in response.headers.items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body)
+
+
+def add_health_routes(server: HttpServer, is_ready: Callable[[], bool]):
+    """Register liveness and readiness checks"""
+    async def index(request: Request) -> Response:
+        return Response.text("Bot is running!")
+
+    async def health(request: Request) -> Response:
+        return Response.text("ok")
+
+    async def ready(request: Request) -> Response:
+        return Response.text("ready") if is_ready() else Response.text("not ready", 503)
+
+    server.route("GET", "/", index)
+    server.route("GET", "/healthz", health)
+    server.route("GET", "/readyz", ready)
+
+
+def add_webhook_route(server: HttpServer, application, path: str, secret_token: str,
+                      is_accepting: Callable[[], bool] = None):
+    """Register Telegram webhook endpoint feeding application.update_queue
+
+    The path is public, so updates are accepted only with the secret token
+    passed to set_webhook; without one anybody could post admin updates.
+    It must be the same on every instance, a generated one would be
+    replaced by the next instance calling set_webhook.
+    """
+    from telegram import Update
+
+    if not secret_token:
+        raise ValueError("webhook mode requires WEBHOOK_SECRET")
+
+    async def webhook(request: Request) -> Response:
+        received = request.headers.get("x-telegram-bot-api-secret-token") or ""
+        if not hmac.compare_digest(received.encode(), secret_token.encode()):
+            return Response.text("Forbidden", 403)
+        if is_accepting is not None and not is_accepting():
+            # Telegram retries the update later, possibly on another instance
+            return Response.text("Shutting down", 503)
+        try:
+            payload = request.json()
+            # de_json returns None for null, [] or {} and fails on other non-objects
+            update = Update.de_json(payload, application.bot) if isinstance(payload, dict) else None
+        except (ValueError, TypeError):
+            # TypeError: an object without update_id
+            return Response.text("Bad Request", 400)
+        if not isinstance(update, Update):
+            return Response.text("Bad Request", 400)
+        await application.update_queue.put(update)
+        return Response(200)
+
+    server.route("POST", path, webhook)
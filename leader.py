@@ -0,0 +1,98 @@
+import os
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from typing import Awaitable, Callable, List
+
+from metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+IS_LEADER = gauge("bot_is_leader", "1 while this replica holds the scheduler lease")
+
+
+class LeaderElection:
+    """Lease-based leader election over the shared database
+
+    The leader renews its lease every renew_interval seconds; a lease not
+    renewed for ttl seconds can be taken by another replica, so failover
+    takes at most ttl + renew_interval. Leader jobs start on election and
+    are cancelled on demotion. A leader that cannot renew stops counting
+    itself leader before its lease runs out, so two replicas never both
+    believe they lead (given clocks agree to well under renew_interval).
+    """
+
+    def __init__(self, db, name: str = "scheduler", ttl: float = 30.0, renew_interval: float = 10.0,
+                 holder: str = None, on_elected: Callable[[], None] = None):
+        self.db = db
+        self.name = name
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.on_elected = on_elected
+
+        self._jobs: List[Callable[[], Awaitable[None]]] = []
+        self._tasks: List[asyncio.Task] = []
+        self._valid_until = 0.0  # monotonic time our lease is safe to use until
+        self._leader = False
+
+        IS_LEADER.set_function(lambda: 1 if self.is_leader else 0)
+
+    def add_job(self, job: Callable[[], Awaitable[None]]):
+        """Run job() only while this replica is the leader"""
+        self._jobs.append(job)
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader and time.monotonic() < self._valid_until
+
+    def _renew(self) -> bool:
+        started = time.monotonic()
+        if not self.db.acquire_lease(self.name, self.holder, self.ttl, time.time()):
+            return False
+        # Leave one renew interval of margin for a slow renewal and clock skew
+        self._valid_until = started + self.ttl - self.renew_interval
+        return True
+
+    def _elect(self):
+        logger.info(f"Elected leader for '{self.name}' as {self.holder}")
+        self._leader = True
+        if self.on_elected:
+            self.on_elected()
+        self._tasks = [asyncio.create_task(job()) for job in self._jobs]
+
+    async def _demote(self):
+        logger.info(f"Stepping down as leader for '{self.name}'")
+        self._leader = False
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self):
+        """Campaign for the lease and keep it renewed"""
+        try:
+            while True:
+                try:
+                    renewed = self._renew()
+                except Exception as e:
+                    logger.error(f"Error renewing lease '{self.name}': {e}")
+                    renewed = False
+
+                if renewed and not self._leader:
+                    self._elect()
+                elif self._leader and not self.is_leader:
+                    await self._demote()
+
+                await asyncio.sleep(self.renew_interval)
+        finally:
+            if self._leader:
+                await self._demote()
+
+    def release(self):
+        """Hand the lease over right away instead of letting it expire"""
+        if self.db.release_lease(self.name, self.holder):
+            logger.info(f"Released lease '{self.name}'")
+        self._valid_until = 0.0
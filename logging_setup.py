@@ -0,0 +1,143 @@
+import json
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+from typing import Dict, Optional
+
+from metrics import counter
+
+LOG_RECORDS_DROPPED = counter("bot_log_records_dropped_total", "Log records not written", ["reason"])
+LOG_RECORDS_SAMPLED_OUT = counter("bot_log_records_sampled_out_total", "Log records skipped by sampling", ["event"])
+
+# Attributes every LogRecord has; anything else came in through extra=
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_sample_rates(text: str) -> Dict[str, float]:
+    """Parse 'callback=0.1,message=0.05' into {event: rate}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        event, _, rate = item.partition("=")
+        rates[event.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a share of records per event; warnings and errors always pass
+
+    The event is passed as extra={'event': ...}; records without one are
+    not sampled.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        event = getattr(record, 'event', None)
+        rate = self.rates.get(event)
+        if rate is None or rate >= 1.0 or random.random() < rate:
+            return True
+        LOG_RECORDS_SAMPLED_OUT.inc(event)
+        return False
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records unformatted; the writer thread formats them
+
+    The stock QueueHandler formats the message in the calling thread.
+    Here the record goes as is, so the event loop only pays for creating
+    it. Log arguments must not be mutated after the call. When the
+    writer falls behind by max_size records, new ones are dropped instead
+    of growing the queue.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int):
+        super().__init__(log_queue)
+        self.max_size = max_size
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.queue.qsize() >= self.max_size:
+            LOG_RECORDS_DROPPED.inc("queue_full")
+            return
+        self.queue.put_nowait(record)
+
+
+class StructuredFormatter(logging.Formatter):
+    """Text or JSON lines with extra= fields appended as key=value"""
+
+    def __init__(self, json_output: bool = False):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        self.json_output = json_output
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {key: value for key, value in vars(record).items() if key not in _STANDARD_ATTRIBUTES}
+        if not self.json_output:
+            line = super().format(record)
+            if fields:
+                line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+            return line
+
+        entry = {
+            'time': self.formatTime(record),
+            'severity': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(fields)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = "INFO", log_file: str = None, sample_rates: Dict[str, float] = None,
+                  json_output: bool = False, queue_size: int = 10000):
+    """Route all logging through a bounded queue to a background writer"""
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = StructuredFormatter(json_output)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Process fields are not logged, skip looking them up per record
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue, queue_size)
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Write out queued records and stop the writer thread"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+
+    # Anything logged later is written directly
+    logging.getLogger().handlers[:] = listener.handlers
@@ -0,0 +1,64 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.constants import ParseMode
+
+# Button spec: (label, callback_data) or (label, None, url)
+ButtonSpec = Tuple
+
+
+def build_keyboard(rows: Sequence[Sequence[ButtonSpec]]) -> InlineKeyboardMarkup:
+    """Build inline keyboard from rows of button specs"""
+    return InlineKeyboardMarkup(tuple(
+        tuple(
+            InlineKeyboardButton(spec[0], url=spec[2]) if len(spec) > 2 else InlineKeyboardButton(spec[0], callback_data=spec[1])
+            for spec in row
+        )
+        for row in rows
+    ))
+
+
+class Screen:
+    """Static message: text, keyboard and parse mode built once"""
+    __slots__ = ('text', 'reply_markup', 'parse_mode')
+
+    def __init__(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None, parse_mode: Optional[str] = ParseMode.HTML):
+        self.text = text
+        self.reply_markup = reply_markup
+        self.parse_mode = parse_mode
+
+
+class MenuRegistry:
+    """Screens and keyboards that never change, built at startup
+
+    Telegram objects are frozen after construction, so one markup
+    instance can be shared by every request. Dynamic screens (user lists,
+    signals) build their text per request and reuse keyboards from here.
+    """
+
+    def __init__(self):
+        self._screens: Dict[str, Screen] = {}
+        self._keyboards: Dict[str, InlineKeyboardMarkup] = {}
+
+    def add_keyboard(self, name: str, rows: Sequence[Sequence[ButtonSpec]]) -> InlineKeyboardMarkup:
+        markup = self._keyboards[name] = build_keyboard(rows)
+        return markup
+
+    def add_screen(self, name: str, text: str, keyboard: Optional[str] = None, parse_mode: Optional[str] = ParseMode.HTML) -> Screen:
+        """Register screen; keyboard names an already added keyboard"""
+        screen = self._screens[name] = Screen(text, self._keyboards[keyboard] if keyboard else None, parse_mode)
+        return screen
+
+    def keyboard(self, name: str) -> InlineKeyboardMarkup:
+        return self._keyboards[name]
+
+    def screen(self, name: str) -> Screen:
+        return self._screens[name]
+
+    async def show(self, name: str, send):
+        """Send or edit to screen via reply_text / edit_message_text"""
+        screen = self._screens[name]
+        return await send(screen.text, reply_markup=screen.reply_markup, parse_mode=screen.parse_mode)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._screens
@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Dict
+
+
+def direction_label(signal_type: str) -> str:
+    """Get direction label for signal type"""
+    return 'ВВЕРХ' if signal_type == 'CALL' else 'ВНИЗ'
+
+
+def format_signal(signal: Dict) -> str:
+    """Format detailed signal message"""
+    return f"""
+📢 <b>СИГНАЛ</b>
+
+📍 Актив: {signal['asset']}
+📈 ВХОД: {direction_label(signal['signal_type'])}
+⏱️ Время: {signal['expiry_time']}
+💰 Вход: {signal['entry_price']}
+🎯 Цель: {signal['target_price']}
+📊 Точность: {signal['accuracy']}%
+
+⏰ {signal['timestamp'].strftime('%H:%M:%S')}
+        """
+
+
+def format_signal_short(signal: Dict) -> str:
+    """Format short signal text for broadcast"""
+    return f"📍 {signal['asset']}\n📈 {direction_label(signal['signal_type'])}\n⏱️ {signal['expiry_time']}"
+
+
+def format_subscription(plan: str, expires_at: datetime) -> str:
+    """Format plan activation notice"""
+    return f"✅ <b>Подписка {plan.upper()} активна</b>\n\nДоступ к сигналам до {expires_at.strftime('%d.%m.%Y %H:%M')}."
+
+
+def format_broadcast_signal(signal_text: str, sent_at: datetime = None) -> str:
+    """Format signal broadcast message"""
+    sent_at = sent_at or datetime.now()
+    return f"""
+🚨 <b>СИГНАЛ!</b>
+
+{signal_text}
+
+⏰ {sent_at.strftime('%H:%M:%S')}
+        """
+
+
+def format_broadcast_message(message_text: str, sent_at: datetime = None) -> str:
+    """Format admin broadcast message"""
+    sent_at = sent_at or datetime.now()
+    return f"""
+📢 <b>Сообщение от администратора:</b>
+
+{message_text}
+
+⏰ {sent_at.strftime('%H:%M:%S')}
+        """
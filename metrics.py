@@ -0,0 +1,222 @@
+import time
+import logging
+import functools
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers in-memory work up to slow Bot API calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """Value that can go up and down, or be read from a callback"""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._functions: Dict[Tuple, Callable[[], float]] = {}
+
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set_function(self, function: Callable[[], float], *labels):
+        """Read value from function at scrape time"""
+        self._functions[labels] = function
+
+    def get(self, *labels) -> float:
+        function = self._functions.get(labels)
+        return function() if function else self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        values = dict(self._values)
+        for labels, function in self._functions.items():
+            try:
+                values[labels] = function()
+            except Exception as e:
+                logger.error(f"Error reading gauge {self.name}: {e}")
+        for labels, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Bucketed distribution of observed values"""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket_labels = _format_labels(self.labels, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            bucket_labels = _format_labels(self.labels, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labels))
+
+
+def gauge(name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help_text, labels))
+
+
+def histogram(name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labels, buckets))
+
+
+# Bot metrics
+HANDLER_CALLS = counter("bot_handler_calls_total", "Handled updates", ["handler"])
+HANDLER_ERRORS = counter("bot_handler_errors_total", "Handler exceptions", ["handler", "error"])
+HANDLER_LATENCY = histogram("bot_handler_latency_seconds", "Handler run time", ["handler"])
+SEND_LATENCY = histogram("bot_send_latency_seconds", "Outbound Bot API call time", ["method"])
+SEND_ERRORS = counter("bot_send_errors_total", "Failed outbound Bot API calls", ["method", "error"])
+DB_QUERY_LATENCY = histogram("bot_db_query_seconds", "Database call time", ["query"])
+BROADCAST_QUEUE_DEPTH = gauge("bot_broadcast_queue_depth", "Messages waiting to be sent by broadcasts")
+RATE_LIMITED = counter("bot_rate_limited_total", "Updates rejected by the per-user rate limit", ["handler"])
+
+
+def instrument_handler(name: str):
+    """Count calls, errors and latency of an async handler"""
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            except Exception as e:
+                HANDLER_ERRORS.inc(name, type(e).__name__)
+                raise
+            finally:
+                HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+                HANDLER_CALLS.inc(name)
+        return wrapper
+    return decorator
+
+
+def timed_query(function):
+    """Record run time of a database method"""
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            DB_QUERY_LATENCY.observe(elapsed, name)
+            record_span("db", elapsed)
+    return wrapper
+
+
+async def timed_send(method: str, call):
+    """Await outbound Bot API call, recording latency and error class"""
+    started = time.perf_counter()
+    try:
+        return await call
+    except Exception as e:
+        SEND_ERRORS.inc(method, type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        SEND_LATENCY.observe(elapsed, method)
+        record_span("send", elapsed)
+
+
+def add_metrics_route(server, path: str = "/metrics"):
+    """Expose registry on the HTTP server"""
+    from http_server import Response
+
+    async def metrics(request) -> Response:
+        return Response(200, REGISTRY.render().encode(), "text/plain; version=0.0.4; charset=utf-8")
+
+    server.route("GET", path, metrics)
@@ -0,0 +1,113 @@
+import html
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+PENDING_PREFIX = "pend_"
+
+# Actions in callback data pend_<action>_<page>_<user_id>_<anchor>
+ACTION_PAGE = "p"
+ACTION_TOGGLE = "t"
+ACTION_SELECT_PAGE = "sp"
+ACTION_SELECT_ALL = "sa"
+ACTION_RANGE = "r"
+ACTION_CLEAR = "c"
+ACTION_CONFIRM = "ok"
+ACTION_BLOCK = "bl"
+
+
+class PendingAction(NamedTuple):
+    action: str
+    page: int
+    user_id: Optional[int] = None
+    anchor: Optional[int] = None  # last tapped user
+    armed: bool = False  # the next tap selects the range from anchor
+
+
+def pending_callback(action: str, page: int, user_id: int = None, anchor: int = None, armed: bool = False) -> str:
+    """Callback data of a pending screen button; at most ~40 bytes of Telegram's 64"""
+    state = "" if anchor is None else f"{'r' if armed else ''}{anchor}"
+    return f"{PENDING_PREFIX}{action}_{page}_{'' if user_id is None else user_id}_{state}"
+
+
+def parse_action(data: str) -> PendingAction:
+    """PendingAction from pending screen callback data"""
+    parts = data[len(PENDING_PREFIX):].split("_") + ["", ""]
+    action, page, user_id, state = parts[:4]
+    armed = state.startswith("r")
+    anchor = int(state[1:] if armed else state) if state else None
+    return PendingAction(action, int(page), int(user_id) if user_id else None, anchor, armed and anchor is not None)
+
+
+class PendingSelection:
+    """Paginated pending screen where the admin picks users to resolve together
+
+    Taps toggle single users. Range selection works like shift-click:
+    after "range" is pressed the next tap selects every pending user
+    between it and the previous tap, across pages.
+
+    Nothing is kept here. The selection is stored in the database, so any
+    replica can handle the next tap, and the last tapped user and whether
+    range is armed travel in the callback data of the buttons.
+    """
+
+    def __init__(self, page_size: int = 10):
+        self.page_size = page_size
+
+    def pages(self, count: int) -> int:
+        return max((count + self.page_size - 1) // self.page_size, 1)
+
+    def clamp(self, page: int, count: int) -> int:
+        return min(max(page, 0), self.pages(count) - 1)
+
+    def offset(self, page: int) -> int:
+        return page * self.page_size
+
+    def render(self, users: List[Dict[str, Any]], count: int, selected: int, page: int, back_row,
+               anchor: int = None, armed: bool = False, notice: str = None):
+        """Text and keyboard of one page of pending users
+
+        users is the page, each with a 'selected' flag; count and selected
+        are totals over all pending users.
+        """
+        pages = self.pages(count)
+        state = dict(anchor=anchor, armed=armed)
+
+        lines = []
+        if notice:
+            lines.append(notice + "\n")
+        lines.append(f"⏳ <b>Ожидают подтверждения: {count}</b>")
+        lines.append(f"Выбрано: {selected}" + (" · ↔️ нажмите конец диапазона" if armed else ""))
+        lines.append("")
+
+        keyboard = []
+        for user in users:
+            user_id = user['user_id']
+            name = user.get('first_name') or 'Неизвестно'
+            lines.append(f"👤 ID: {user_id} | {html.escape(name)} | 📱 {html.escape(str(user.get('platform_id')))}")
+            mark = "☑️" if user['selected'] else "⬜️"
+            keyboard.append([InlineKeyboardButton(f"{mark} {user_id} {name}"[:60],
+                                                  callback_data=pending_callback(ACTION_TOGGLE, page, user_id, **state))])
+
+        if pages > 1:
+            keyboard.append([
+                InlineKeyboardButton("◀️", callback_data=pending_callback(ACTION_PAGE, (page - 1) % pages, **state)),
+                InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=pending_callback(ACTION_PAGE, page, **state)),
+                InlineKeyboardButton("▶️", callback_data=pending_callback(ACTION_PAGE, (page + 1) % pages, **state)),
+            ])
+        keyboard.append([
+            InlineKeyboardButton("☑️ Страница", callback_data=pending_callback(ACTION_SELECT_PAGE, page, **state)),
+            InlineKeyboardButton(f"☑️ Все ({count})", callback_data=pending_callback(ACTION_SELECT_ALL, page, **state)),
+        ])
+        keyboard.append([
+            InlineKeyboardButton("↔️ Отмена" if armed else "↔️ Диапазон",
+                                 callback_data=pending_callback(ACTION_RANGE, page, **state)),
+            InlineKeyboardButton("✖️ Сбросить", callback_data=pending_callback(ACTION_CLEAR, page)),
+        ])
+        if selected:
+            keyboard.append([
+                InlineKeyboardButton(f"✅ Подтвердить ({selected})", callback_data=pending_callback(ACTION_CONFIRM, page)),
+                InlineKeyboardButton(f"🚫 Блок ({selected})", callback_data=pending_callback(ACTION_BLOCK, page)),
+            ])
+        keyboard.append(back_row)
+        return "\n".join(lines), InlineKeyboardMarkup(keyboard)
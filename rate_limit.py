@@ -0,0 +1,50 @@
+import time
+from typing import Callable, Dict
+
+
+class TokenBucketLimiter:
+    """Per-user token bucket, stored as one float per active user
+
+    Uses the GCRA form of the token bucket: instead of a token count and
+    a timestamp each user keeps the time at which the bucket will be full
+    again. Users whose bucket is already full carry no information and
+    are dropped by an amortized sweep, so memory stays O(active users).
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+
+        self._interval = 1.0 / rate
+        self._tolerance = (burst - 1) * self._interval
+        self._full_at: Dict[int, float] = {}  # user_id -> time the bucket is full again
+        self._calls_since_sweep = 0
+
+        self.limited = 0
+
+    def allow(self, user_id: int) -> bool:
+        """Take one token for user, False if the bucket is empty"""
+        now = self._clock()
+
+        self._calls_since_sweep += 1
+        if self._calls_since_sweep >= max(1000, len(self._full_at)):
+            self._sweep(now)
+
+        full_at = self._full_at.get(user_id, now)
+        if full_at < now:
+            full_at = now
+        if full_at - now > self._tolerance:
+            self.limited += 1
+            return False
+
+        self._full_at[user_id] = full_at + self._interval
+        return True
+
+    def _sweep(self, now: float):
+        """Drop users whose bucket has refilled"""
+        self._calls_since_sweep = 0
+        self._full_at = {user_id: full_at for user_id, full_at in self._full_at.items() if full_at > now}
+
+    def __len__(self) -> int:
+        return len(self._full_at)
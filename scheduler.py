@@ -0,0 +1,138 @@
+import time
+import heapq
+import random
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from metrics import counter, gauge, histogram
+from timeframes import next_candle_close
+
+logger = logging.getLogger(__name__)
+
+OVERLAP_SKIP = 'skip'
+OVERLAP_QUEUE = 'queue'
+
+JOB_RUNS = counter("bot_job_runs_total", "Scheduled job runs by outcome", ["job", "outcome"])
+JOB_DURATION = histogram("bot_job_duration_seconds", "Scheduled job run time", ["job"],
+                         buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0))
+JOB_START_LAG = gauge("bot_job_start_lag_seconds", "Last start of a job after its slot", ["job"])
+
+JobFunction = Callable[[float], Awaitable[None]]
+
+
+class Job:
+    """Periodic job; func is called with the slot time it runs for"""
+
+    def __init__(self, name: str, func: JobFunction, every: float, offset: float, jitter: float, overlap: str):
+        self.name = name
+        self.func = func
+        self.every = every
+        self.offset = offset
+        self.jitter = jitter
+        self.overlap = overlap
+
+        self.next_slot: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.queued: Optional[float] = None  # slot waiting for the running one
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+
+class Scheduler:
+    """Run async jobs on wall-clock slots aligned to candle closes
+
+    A job with every=900 runs at :00, :15, :30 and :45, when 15 minute
+    candles close, shifted by offset (negative runs ahead of the close).
+    Each slot follows from the previous slot, not from when the job
+    finished, so run time never shifts the schedule; slots missed while
+    the process was busy or down are skipped. Jitter delays the start by
+    up to jitter seconds, the job still gets its nominal slot. A job still
+    running at its next slot is skipped, or with overlap='queue' runs once
+    more as soon as it finishes.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time, max_sleep: float = 5.0):
+        self._clock = clock
+        # Upper bound on one sleep, so a wall clock step is noticed
+        self.max_sleep = max_sleep
+        self.jobs: Dict[str, Job] = {}
+        self._heap = []  # (start_at, sequence, slot, job)
+        self._sequence = 0
+
+    def add(self, name: str, func: JobFunction, every: float, offset: float = 0.0, jitter: float = 0.0,
+            overlap: str = OVERLAP_SKIP):
+        """Run func every `every` seconds at candle close + offset"""
+        if overlap not in (OVERLAP_SKIP, OVERLAP_QUEUE):
+            raise ValueError(f"Unknown overlap policy: {overlap}")
+        self.jobs[name] = Job(name, func, every, offset, jitter, overlap)
+
+    def _first_slot(self, job: Job, now: float) -> float:
+        return next_candle_close(now - job.offset, job.every) + job.offset
+
+    def _next_slot(self, job: Job, slot: float, now: float) -> float:
+        next_slot = slot + job.every
+        missed = 0
+        while next_slot <= now:
+            next_slot += job.every
+            missed += 1
+        if missed:
+            JOB_RUNS.inc(job.name, "missed", amount=missed)
+            logger.warning(f"Job '{job.name}' missed {missed} slots")
+        return next_slot
+
+    def _push(self, job: Job, slot: float):
+        job.next_slot = slot
+        start_at = slot + (random.uniform(0, job.jitter) if job.jitter else 0.0)
+        self._sequence += 1
+        heapq.heappush(self._heap, (start_at, self._sequence, slot, job))
+
+    def _fire(self, job: Job, slot: float):
+        if not job.running:
+            job.task = asyncio.create_task(self._run_job(job, slot))
+        elif job.overlap == OVERLAP_QUEUE:
+            job.queued = slot
+            JOB_RUNS.inc(job.name, "queued")
+        else:
+            JOB_RUNS.inc(job.name, "skipped")
+            logger.warning(f"Job '{job.name}' still running, skipping slot")
+
+    async def _run_job(self, job: Job, slot: float):
+        while slot is not None:
+            JOB_START_LAG.set(max(self._clock() - slot, 0.0), job.name)
+            started = time.perf_counter()
+            outcome = "ok"
+            try:
+                await job.func(slot)
+            except Exception as e:
+                outcome = "error"
+                logger.error(f"Error in job '{job.name}': {e}")
+            JOB_DURATION.observe(time.perf_counter() - started, job.name)
+            JOB_RUNS.inc(job.name, outcome)
+            slot, job.queued = job.queued, None
+
+    async def run(self):
+        """Fire jobs at their slots until cancelled; running jobs are cancelled with it"""
+        now = self._clock()
+        self._heap = []
+        for job in self.jobs.values():
+            job.queued = None
+            self._push(job, self._first_slot(job, now))
+
+        try:
+            while True:
+                now = self._clock()
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, slot, job = heapq.heappop(self._heap)
+                    self._fire(job, slot)
+                    self._push(job, self._next_slot(job, slot, now))
+
+                delay = self._heap[0][0] - now if self._heap else self.max_sleep
+                await asyncio.sleep(min(delay, self.max_sleep))
+        finally:
+            tasks = [job.task for job in self.jobs.values() if job.running]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
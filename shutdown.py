@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import contextlib
+from typing import Awaitable, Callable, List, Set, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+Step = Callable[[], Union[None, Awaitable[None]]]
+
+
+class ShutdownCoordinator:
+    """Ordered shutdown with a drain deadline for broadcasts
+
+    Steps run in registration order; a failing step is logged and the
+    rest still run. Broadcasts wrap their sends in job() and check
+    checkpointing before each message: until the drain deadline they
+    keep sending, after it they save the remaining recipients and stop,
+    so no recipient gets a message twice or not at all.
+
+    Work started in the background goes through spawn(), which keeps the
+    task referenced until it ends (the event loop alone does not, so an
+    unreferenced task can be garbage collected mid-send).
+    """
+
+    def __init__(self, drain_timeout: float = 8.0):
+        self.drain_timeout = drain_timeout
+        self.accepting = True
+        self.checkpointing = False
+        self._jobs = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._drained: Set[asyncio.Task] = set()
+        self._cancelled: Set[asyncio.Task] = set()
+        self._steps: List[Tuple[str, Step]] = []
+        self._done = False
+
+    def is_accepting(self) -> bool:
+        return self.accepting
+
+    @contextlib.contextmanager
+    def job(self):
+        """Mark a broadcast as in flight"""
+        self._job_started()
+        try:
+            yield
+        finally:
+            self._job_ended()
+
+    def _job_started(self):
+        self._jobs += 1
+        self._idle.clear()
+
+    def _job_ended(self, task: asyncio.Task = None):
+        self._jobs -= 1
+        if not self._jobs:
+            self._idle.set()
+
+    def spawn(self, coro, drain: bool = True) -> asyncio.Task:
+        """Run coro in the background, referenced until it ends
+
+        A drained task counts as a job from now on, so drain() waits for
+        it; the others are cancelled by cancel_tasks().
+        """
+        task = asyncio.create_task(coro)
+        tasks = self._drained if drain else self._cancelled
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        if drain:
+            self._job_started()
+            task.add_done_callback(self._job_ended)
+        return task
+
+    async def cancel_tasks(self):
+        """Cancel spawned tasks that shutdown does not wait for"""
+        tasks = list(self._cancelled)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @property
+    def jobs(self) -> int:
+        return self._jobs
+
+    def add_step(self, name: str, step: Step):
+        self._steps.append((name, step))
+
+    async def drain(self):
+        """Let broadcasts finish until the deadline, then make them checkpoint"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.drain_timeout)
+            return
+        except asyncio.TimeoutError:
+            logger.warning(f"{self._jobs} broadcasts still running after {self.drain_timeout:.0f} s, checkpointing")
+
+        # Each job stops after its current message
+        self.checkpointing = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"{self._jobs} broadcasts did not stop, their progress is lost")
+
+    async def run(self):
+        """Stop accepting work and run the shutdown steps once"""
+        if self._done:
+            return
+        self._done = True
+        self.accepting = False
+
+        started = time.perf_counter()
+        for name, step in self._steps:
+            step_started = time.perf_counter()
+            try:
+                result = step()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Shutdown step '{name}' failed: {e}")
+            logger.info(f"Shutdown step '{name}' took {(time.perf_counter() - step_started) * 1000:.0f} ms")
+        logger.info(f"Shutdown complete in {time.perf_counter() - started:.1f} s")
+
+
+class FileCheckpoints:
+    """Unsent broadcast recipients kept in a JSON lines file
+
+    Another instance only sees the checkpoints if the file is on storage
+    they share. On the container disk they are resumed only after a
+    restart that keeps that disk, which Cloud Run never does.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def save_broadcast_checkpoint(self, text: str, user_ids: List[int]) -> bool:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({'text': text, 'user_ids': list(user_ids)}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return True
+
+    def take_broadcast_checkpoints(self) -> List[Tuple[str, List[int]]]:
+        """Remove and return saved broadcasts; rename makes the claim atomic"""
+        claimed = f"{self.path}.{os.getpid()}"
+        try:
+            os.rename(self.path, claimed)
+        except FileNotFoundError:
+            return []
+
+        checkpoints = []
+        with open(claimed, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.error("Skipping damaged broadcast checkpoint")
+                    continue
+                checkpoints.append((record['text'], record['user_ids']))
+        os.remove(claimed)
+        return checkpoints
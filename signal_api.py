@@ -0,0 +1,163 @@
+import json
+import time
+import base64
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from http_server import HttpServer, Request, Response
+from signal_cache import SignalCache
+from metrics import counter
+
+API_REQUESTS = counter("bot_signal_api_requests_total", "Signal history API requests by outcome", ["endpoint", "outcome"])
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+def parse_time(value: str) -> str:
+    """Unix seconds or ISO 8601 to the UTC 'YYYY-MM-DD HH:MM:SS' form signals are stored in"""
+    try:
+        moment = datetime.fromtimestamp(float(value), timezone.utc)
+    except (OverflowError, OSError):
+        # inf, 1e20 and other timestamps outside the datetime range
+        raise ValueError(f"bad time: {value}") from None
+    except ValueError:
+        try:
+            moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError(f"bad time: {value}") from None
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _iso(stored: Optional[str]) -> Optional[str]:
+    return stored.replace(" ", "T") + "Z" if stored else None
+
+
+def encode_cursor(created_at: str, signal_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{signal_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        created_at, signal_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split("|")
+        return created_at, int(signal_id)
+    except ValueError:
+        raise ValueError("bad cursor") from None
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class SignalApi:
+    """Read-only JSON signal history on the bot's HTTP server
+
+    GET /api/signals lists signals newest first, filtered by asset and a
+    since/until time range; next_cursor continues the listing with a
+    keyset query on (created_at, id), so deep pages cost the same as the
+    first. GET /api/signals/stats returns per-asset totals kept up to
+    date on every write, so it never scans signals.
+
+    Every response carries a content hash ETag and is cached for
+    cache_ttl seconds per query string. Dashboards polling within the
+    TTL get the cached body, or an empty 304 when they send
+    If-None-Match, without touching the database.
+    """
+
+    def __init__(self, db, cache_ttl: float = 5.0, token: str = None, cache_size: int = 1024,
+                 clock: Callable[[], float] = time.time):
+        self.db = db
+        self.cache_ttl = cache_ttl
+        self.token = token
+        self._clock = clock
+        self._cache = SignalCache(max_size=cache_size, clock=clock)
+
+    def add_routes(self, server: HttpServer, path: str = "/api/signals"):
+        server.route("GET", path, self.signals)
+        server.route("GET", path + "/stats", self.stats)
+
+    async def signals(self, request: Request) -> Response:
+        return self._serve("signals", request, self._signal_page)
+
+    async def stats(self, request: Request) -> Response:
+        return self._serve("stats", request, self._signal_stats)
+
+    def _serve(self, endpoint: str, request: Request, build: Callable[[Dict[str, str]], Any]) -> Response:
+        if self.token and request.headers.get("authorization") != f"Bearer {self.token}":
+            API_REQUESTS.inc(endpoint, "unauthorized")
+            return Response.json({'error': 'unauthorized'}, 401)
+
+        key = (endpoint, tuple(sorted(request.query.items())))
+        cached = self._cache.get(key)
+        outcome = "hit"
+        if cached is None:
+            try:
+                data = build(request.query)
+            except ValueError as e:
+                API_REQUESTS.inc(endpoint, "bad_request")
+                return Response.json({'error': str(e)}, 400)
+            body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+            cached = (f'"{hashlib.sha1(body).hexdigest()}"', body)
+            self._cache.put(key, cached, self._clock() + self.cache_ttl)
+            outcome = "miss"
+
+        etag, body = cached
+        headers = {"ETag": etag, "Cache-Control": f"max-age={int(self.cache_ttl)}"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            API_REQUESTS.inc(endpoint, "not_modified")
+            return Response(304, headers=headers)
+        API_REQUESTS.inc(endpoint, outcome)
+        return Response(200, body, "application/json", headers)
+
+    def _signal_page(self, query: Dict[str, str]) -> Dict[str, Any]:
+        try:
+            limit = int(query.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            raise ValueError("bad limit") from None
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ValueError(f"limit must be 1..{MAX_LIMIT}")
+        since = parse_time(query['since']) if 'since' in query else None
+        until = parse_time(query['until']) if 'until' in query else None
+        before = decode_cursor(query['cursor']) if 'cursor' in query else None
+
+        rows = self.db.get_signal_page(query.get('asset'), since, until, before, limit)
+        signals = [{
+            'id': row['id'],
+            'asset': row['asset'],
+            'type': row['signal_type'],
+            'expiry': row['expiry_time'],
+            'entry_price': row['entry_price'],
+            'target_price': row['target_price'],
+            'accuracy': row['accuracy'],
+            'created_at': _iso(row['created_at']),
+            'result': row['result'],
+            'close_price': row['close_price'],
+            'resolved_at': _iso(row['resolved_at']),
+        } for row in rows]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if len(rows) == limit else None
+        return {'signals': signals, 'next_cursor': next_cursor}
+
+    def _signal_stats(self, query: Dict[str, str]) -> Dict[str, Any]:
+        assets = []
+        for row in self.db.get_signal_stats(query.get('asset')):
+            resolved = row['wins'] + row['losses'] + row['draws']
+            assets.append({
+                'asset': row['asset'],
+                'total': row['total'],
+                'wins': row['wins'],
+                'losses': row['losses'],
+                'draws': row['draws'],
+                'expired': row['expired'],
+                'pending': row['total'] - resolved - row['expired'],
+                'win_rate': round(row['wins'] / resolved, 4) if resolved else None,
+                'avg_accuracy': round(row['accuracy_sum'] / row['total'], 2) if row['total'] else None,
+                'first_at': _iso(row['first_at']),
+                'last_at': _iso(row['last_at']),
+            })
+        return {'assets': assets}
@@ -1,10 +1,23 @@
+import time
 import random
 import logging
 from datetime import datetime
 from typing import Dict, Optional
 
+from signal_cache import SignalCache
+from timeframes import timeframe_to_seconds, next_candle_close
+
 logger = logging.getLogger(__name__)
 
+def format_price(price: float) -> str:
+    """Format price to string with the precision quoted for its size"""
+    if price >= 100:
+        return f"{price:.2f}"
+    elif price >= 10:
+        return f"{price:.4f}"
+    else:
+        return f"{price:.5f}"
+
 class SignalGenerator:
     def __init__(self):
         self.assets = [
@@ -15,25 +28,47 @@ class SignalGenerator:
         
         self.expiry_times = ["1мин", "2мин", "3мин", "5мин", "10мин", "15мин"]
         
-        # Cache for performance
-        self._last_signal_time = None
-        self._signal_cache = None
-        self._cache_duration = 60  # Cache for 1 minute
+        # Cache for performance: one entry per (asset, expiry, timeframe),
+        # valid until the close of the candle it was computed on
+        self._signal_cache = SignalCache(max_size=len(self.assets) * len(self.expiry_times) * 2)
+        
+        # Last closed bar prices from the candle aggregator, base timeframe only
+        self._last_prices = {}
+        self._price_seconds = None
+    
+    def attach(self, aggregator):
+        """Subscribe to bar-close events of a CandleAggregator"""
+        self._price_seconds = aggregator.timeframes[0] if aggregator.timeframes else None
+        aggregator.subscribe(self.on_bar_close)
+    
+    def on_bar_close(self, asset: str, seconds: int, candle):
+        """Handle closed bar: refresh price and drop signals of that candle"""
+        # Longer bars closed late (advance) would overwrite the fresher base price
+        if self._price_seconds is None or seconds == self._price_seconds:
+            self._last_prices[asset] = candle.close
+        self._signal_cache.invalidate(
+            lambda key: key[0] == asset and timeframe_to_seconds(key[2]) == seconds
+        )
     
-    def generate_signal(self) -> Optional[Dict]:
+    def generate_signal(self, asset: str = None, expiry_time: str = None, timeframe: str = None) -> Optional[Dict]:
         """Generate a single signal"""
         try:
+            asset = asset or random.choice(self.assets)
+            expiry_time = expiry_time or random.choice(self.expiry_times)
+            timeframe = timeframe or expiry_time
+            key = (asset, expiry_time, timeframe)
+            
             # Check cache first
-            if self._is_cache_valid():
-                return self._signal_cache
+            signal = self._signal_cache.get(key)
+            if signal is not None:
+                # Callers own their copy, changing it must not change the cached signal
+                return dict(signal)
             
             # Generate new signal
-            asset = random.choice(self.assets)
             signal_type = random.choice(["CALL", "PUT"])
-            expiry_time = random.choice(self.expiry_times)
             
             # Generate realistic prices
-            base_price = self._get_base_price(asset)
+            base_price = self.current_price(asset)
             entry_price = self._format_price(base_price)
             
             # Calculate target and stop loss
@@ -49,6 +84,7 @@ class SignalGenerator:
                 'asset': asset,
                 'signal_type': signal_type,
                 'expiry_time': expiry_time,
+                'timeframe': timeframe,
                 'entry_price': entry_price,
                 'target_price': target_price,
                 'accuracy': accuracy,
@@ -56,15 +92,24 @@ class SignalGenerator:
             }
             
             # Update cache
-            self._update_cache(signal)
+            self._signal_cache.put(key, signal, self._cache_expiry(timeframe))
             
             logger.info(f"Generated signal: {asset} {signal_type} {expiry_time}")
-            return signal
+            return dict(signal)
             
         except Exception as e:
             logger.error(f"Error generating signal: {e}")
             return None
     
+    def current_price(self, asset: str) -> float:
+        """Get last known price for asset"""
+        price = self._last_prices.get(asset)
+        return price if price is not None else self._get_base_price(asset)
+    
+    def sample_price(self, asset: str) -> float:
+        """Get simulated market quote for asset"""
+        return self._get_base_price(asset)
+    
     def _get_base_price(self, asset: str) -> float:
         """Get base price for asset"""
         base_prices = {
@@ -90,31 +135,25 @@ class SignalGenerator:
     
     def _format_price(self, price: float) -> str:
         """Format price to string"""
-        if price >= 100:
-            return f"{price:.2f}"
-        elif price >= 10:
-            return f"{price:.4f}"
-        else:
-            return f"{price:.5f}"
+        return format_price(price)
     
-    def _is_cache_valid(self) -> bool:
-        """Check if cache is still valid"""
-        if not self._last_signal_time or not self._signal_cache:
-            return False
-        
-        time_diff = (datetime.now() - self._last_signal_time).total_seconds()
-        return time_diff < self._cache_duration
+    def _cache_expiry(self, timeframe: str) -> float:
+        """Get cache expiry time: close of the current candle"""
+        seconds = timeframe_to_seconds(timeframe) or 60
+        return next_candle_close(time.time(), seconds)
     
-    def _update_cache(self, signal: Dict):
-        """Update signal cache"""
-        self._signal_cache = signal
-        self._last_signal_time = datetime.now()
+    def get_cache_stats(self) -> Dict:
+        """Get signal cache statistics"""
+        return self._signal_cache.stats()
     
     def generate_multiple_signals(self, count: int = 3) -> list:
-        """Generate multiple signals"""
+        """Generate multiple signals for different assets"""
+        assets = random.sample(self.assets, min(count, len(self.assets)))
+        assets += [random.choice(self.assets) for _ in range(count - len(assets))]
+        
         signals = []
-        for _ in range(count):
-            signal = self.generate_signal()
+        for asset in assets:
+            signal = self.generate_signal(asset=asset)
             if signal:
                 signals.append(signal)
         return signals
@@ -0,0 +1,120 @@
+import time
+import random
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from messages import format_signal_short, format_broadcast_signal
+
+logger = logging.getLogger(__name__)
+
+class SignalPipeline:
+    """Prepare the next scheduled broadcast ahead of its slot
+
+    prepare() does all the work a broadcast needs before sending:
+    generate, validate, render and fetch recipients. When the slot fires
+    take() hands the result over and publish() persists the signal, so
+    sending starts at once and a dropped signal leaves no trace.
+    """
+
+    REQUIRED_FIELDS = ('asset', 'signal_type', 'expiry_time', 'entry_price', 'target_price', 'accuracy')
+
+    def __init__(self, generator, throttle, db, resolver, lead_time: float = 30):
+        self.generator = generator
+        self.throttle = throttle
+        self.db = db
+        self.resolver = resolver
+        self.lead_time = lead_time
+
+        self._prepared = None
+
+        # Latency metrics, seconds
+        self.broadcasts = 0
+        self.last_slot_to_first_send = None
+        self.last_generation_to_first_send = None
+        self._total_slot_to_first_send = 0.0
+
+    def prepare(self, slot_at: float) -> Optional[Dict[str, Any]]:
+        """Prepare broadcast for the slot at slot_at (unix time)"""
+        started = time.perf_counter()
+
+        # Only assets that are not throttled at slot time
+        assets = [asset for asset in self.generator.assets if self.throttle.allow(asset, slot_at)]
+        if not assets:
+            logger.info("Scheduled signal skipped: signal limit reached")
+            self._prepared = None
+            return None
+
+        signal = self.generator.generate_signal(asset=random.choice(assets))
+        if not self._is_valid(signal):
+            logger.warning(f"Scheduled signal rejected: {signal}")
+            self._prepared = None
+            return None
+
+        text = format_broadcast_signal(format_signal_short(signal), datetime.fromtimestamp(slot_at))
+
+        self._prepared = {
+            'slot_at': slot_at,
+            'signal': signal,
+            'signal_id': None,
+            'text': text,
+            'recipients': self.db.get_confirmed_users(),
+            'prepared_at': time.time()
+        }
+
+        logger.info(f"Prepared {signal['asset']} signal for {len(self._prepared['recipients'])} users "
+                    f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return self._prepared
+
+    def _is_valid(self, signal: Optional[Dict]) -> bool:
+        """Check signal fields before it is persisted"""
+        if not signal or any(signal.get(field) in (None, '') for field in self.REQUIRED_FIELDS):
+            return False
+        try:
+            return float(signal['entry_price']) > 0 and float(signal['target_price']) > 0
+        except (TypeError, ValueError):
+            return False
+
+    def take(self, slot_at: float) -> Optional[Dict[str, Any]]:
+        """Get prepared broadcast for the slot"""
+        prepared, self._prepared = self._prepared, None
+        if prepared and prepared['slot_at'] != slot_at:
+            logger.warning("Prepared signal belongs to another slot, dropping")
+            return None
+        return prepared
+
+    def publish(self, prepared: Dict[str, Any]) -> int:
+        """Persist the taken signal and count it against the throttle once it is broadcast"""
+        signal, slot_at = prepared['signal'], prepared['slot_at']
+        signal_id = self.db.add_signal(
+            signal['asset'], signal['signal_type'], signal['expiry_time'],
+            signal['entry_price'], signal['target_price'], signal['accuracy'], slot_at
+        )
+        self.throttle.record(signal['asset'], slot_at)
+        if signal_id:
+            self.resolver.schedule(
+                signal_id, signal['asset'], signal['signal_type'],
+                signal['entry_price'], signal['expiry_time'], slot_at
+            )
+        prepared['signal_id'] = signal_id
+        return signal_id
+
+    def record_first_send(self, prepared: Dict[str, Any], sent_at: float = None):
+        """Record latency of the first message of a broadcast"""
+        sent_at = time.time() if sent_at is None else sent_at
+        self.broadcasts += 1
+        self.last_slot_to_first_send = max(0.0, sent_at - prepared['slot_at'])
+        self.last_generation_to_first_send = sent_at - prepared['prepared_at']
+        self._total_slot_to_first_send += self.last_slot_to_first_send
+
+        logger.info(f"Signal {prepared['signal_id']} first send {self.last_slot_to_first_send * 1000:.1f} ms "
+                    f"after slot, {self.last_generation_to_first_send:.1f} s after generation")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pipeline latency metrics"""
+        return {
+            'broadcasts': self.broadcasts,
+            'last_slot_to_first_send': self.last_slot_to_first_send,
+            'last_generation_to_first_send': self.last_generation_to_first_send,
+            'avg_slot_to_first_send': self._total_slot_to_first_send / self.broadcasts if self.broadcasts else None
+        }
@@ -0,0 +1,184 @@
+import time
+import heapq
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from timeframes import timeframe_to_seconds
+from signal_generator import format_price
+
+logger = logging.getLogger(__name__)
+
+class SignalResolver:
+    """Resolve signal outcomes when their expiry time is reached
+
+    Open signals sit in a min-heap ordered by due time. Each tick pops
+    everything that is due, looks up the price once per asset and writes
+    all outcomes with a single batched update.
+
+    The price is the current one, so it only stands for the price at
+    expiry while the signal is at most grace seconds overdue. Signals
+    found later (resolver down, no leader, no ticks) are written as
+    'expired' instead of getting an outcome from an unrelated price.
+    """
+
+    def __init__(self, db, price_lookup: Callable[[str], Optional[float]],
+                 batch_size: int = 500, grace: float = 120.0, lookback_hours: int = 2,
+                 clock: Callable[[], float] = time.time):
+        self.db = db
+        self.price_lookup = price_lookup
+        self.batch_size = batch_size
+        self.grace = grace
+        # Longest expiry is an hour; older open signals are expired without loading
+        self.lookback_hours = lookback_hours
+        self._clock = clock
+
+        self._heap = []  # (due_at, signal_id, asset, signal_type, entry_price)
+        self._overdue = {}  # asset -> due entries waiting for a price
+
+        self.resolved = 0
+        self.expired = 0
+
+    def schedule(self, signal_id: int, asset: str, signal_type: str, entry_price: str,
+                 expiry_time: str, issued_at: float = None) -> bool:
+        """Add signal to resolution queue"""
+        expiry_seconds = timeframe_to_seconds(expiry_time)
+        if not expiry_seconds:
+            logger.warning(f"Unknown expiry {expiry_time} for signal {signal_id}")
+            return False
+
+        try:
+            entry = float(entry_price)
+        except (TypeError, ValueError):
+            logger.warning(f"Bad entry price {entry_price} for signal {signal_id}")
+            return False
+
+        issued_at = self._clock() if issued_at is None else issued_at
+        heapq.heappush(self._heap, (issued_at + expiry_seconds, signal_id, asset, signal_type, entry))
+        return True
+
+    def clear(self):
+        """Drop all scheduled signals"""
+        self._heap = []
+        self._overdue = {}
+
+    def load_pending(self, now: float = None) -> int:
+        """Schedule unresolved signals from database; those long past expiry are expired"""
+        now = self._clock() if now is None else now
+        expired = self.db.expire_unresolved_signals(self.lookback_hours)
+
+        loaded = 0
+        stale = []
+        for signal in self.db.get_unresolved_signals(self.lookback_hours):
+            try:
+                issued_at = datetime.strptime(signal['issued_at'], '%Y-%m-%d %H:%M:%S')
+            except (TypeError, ValueError):
+                continue
+            issued_at = issued_at.replace(tzinfo=timezone.utc).timestamp()
+            expiry_seconds = timeframe_to_seconds(signal['expiry_time'])
+            if expiry_seconds and now - (issued_at + expiry_seconds) > self.grace:
+                stale.append(('expired', None, signal['id']))
+                continue
+            if self.schedule(signal['id'], signal['asset'], signal['signal_type'], signal['entry_price'],
+                             signal['expiry_time'], issued_at):
+                loaded += 1
+
+        for start in range(0, len(stale), self.batch_size):
+            expired += max(self.db.set_signal_results(stale[start:start + self.batch_size]), 0)
+        self.expired += expired
+
+        logger.info(f"Signal resolver loaded {loaded} open signals, expired {expired} missed ones")
+        return loaded
+
+    def resolve_due(self, now: float = None) -> int:
+        """Resolve all signals due by now"""
+        now = self._clock() if now is None else now
+
+        # Group due signals by asset
+        due = self._overdue
+        self._overdue = {}
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            due.setdefault(entry[2], []).append(entry)
+
+        if not due:
+            return 0
+
+        results = []
+        resolving = []  # heap entries of results, re-queued if their batch is not written
+        for asset, entries in due.items():
+            fresh = []
+            for entry in entries:
+                if now - entry[0] > self.grace:
+                    results.append(('expired', None, entry[1]))
+                    resolving.append(entry)
+                else:
+                    fresh.append(entry)
+            if not fresh:
+                continue
+
+            price = self.price_lookup(asset)
+            if price is None:
+                self._overdue[asset] = fresh
+                continue
+
+            # Same precision as the entry price, so an unchanged quote is a draw
+            close_price = format_price(price)
+            close = float(close_price)
+            for entry in fresh:
+                _, signal_id, _, signal_type, entry_price = entry
+                results.append((self._outcome(signal_type, entry_price, close), close_price, signal_id))
+                resolving.append(entry)
+
+        written = 0
+        for start in range(0, len(results), self.batch_size):
+            batch = results[start:start + self.batch_size]
+            count = self.db.set_signal_results(batch)
+            if count > 0:
+                written += count
+                self.expired += sum(1 for result in batch if result[0] == 'expired')
+                continue
+            logger.warning(f"Signal results not written, retrying {len(batch)} signals")
+            for entry in resolving[start:start + self.batch_size]:
+                self._overdue.setdefault(entry[2], []).append(entry)
+
+        self.resolved += written
+        return written
+
+    def _outcome(self, signal_type: str, entry: float, close: float) -> str:
+        """Get signal result by entry and close prices"""
+        if close == entry:
+            return 'draw'
+        if signal_type == 'CALL':
+            return 'win' if close > entry else 'loss'
+        return 'win' if close < entry else 'loss'
+
+    @property
+    def pending_count(self) -> int:
+        """Number of signals waiting for expiry"""
+        return len(self._heap) + self.overdue_count
+
+    @property
+    def overdue_count(self) -> int:
+        """Number of expired signals that could not be resolved yet"""
+        return sum(len(entries) for entries in self._overdue.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Get resolver counters"""
+        return {
+            'pending': self.pending_count,
+            'overdue': self.overdue_count,
+            'resolved': self.resolved,
+            'expired': self.expired
+        }
+
+    async def run(self, interval: float = 1.0):
+        """Resolve due signals every interval seconds"""
+        while True:
+            try:
+                self.resolve_due()
+            except Exception as e:
+                logger.error(f"Error resolving signals: {e}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,85 @@
+import time
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+class SignalThrottle:
+    """Sliding-window limits for issued signals
+
+    Per asset: at least min_interval seconds between two signals.
+    Global: at most max_per_window signals within window seconds.
+    """
+
+    def __init__(self, min_interval: float, max_per_window: int, window: float = 24 * 3600,
+                 clock: Callable[[], float] = time.time):
+        self.min_interval = min_interval
+        self.max_per_window = max_per_window
+        self.window = window
+        self._clock = clock
+
+        self._last_by_asset = {}  # asset -> timestamp of last signal
+        self._issued = deque()  # timestamps inside the window, oldest first
+
+    def _prune(self, now: float):
+        """Drop timestamps that left the window"""
+        cutoff = now - self.window
+        issued = self._issued
+        while issued and issued[0] <= cutoff:
+            issued.popleft()
+
+    def allow(self, asset: str, now: float = None) -> bool:
+        """Check if a signal for asset may be issued now"""
+        now = self._clock() if now is None else now
+        self._prune(now)
+
+        if len(self._issued) >= self.max_per_window:
+            return False
+
+        last = self._last_by_asset.get(asset)
+        return last is None or now - last >= self.min_interval
+
+    def record(self, asset: str, now: float = None):
+        """Register an issued signal"""
+        now = self._clock() if now is None else now
+        self._issued.append(now)
+        self._last_by_asset[asset] = max(now, self._last_by_asset.get(asset, now))
+
+    def try_acquire(self, asset: str) -> bool:
+        """Check and register a signal in one step"""
+        now = self._clock()
+        if not self.allow(asset, now):
+            return False
+        self.record(asset, now)
+        return True
+
+    def clear(self):
+        """Forget all issued signals"""
+        self._last_by_asset.clear()
+        self._issued.clear()
+
+    def load_history(self, signals: Iterable[Dict[str, Any]]) -> int:
+        """Restore state from rows of the signals table (oldest first)"""
+        loaded = 0
+        for signal in signals:
+            try:
+                created_at = datetime.strptime(signal['created_at'], '%Y-%m-%d %H:%M:%S')
+            except (TypeError, ValueError):
+                continue
+            self.record(signal['asset'], created_at.replace(tzinfo=timezone.utc).timestamp())
+            loaded += 1
+
+        self._prune(self._clock())
+        logger.info(f"Signal throttle restored {loaded} signals")
+        return loaded
+
+    def stats(self) -> Dict[str, Any]:
+        """Get throttle state"""
+        self._prune(self._clock())
+        return {
+            'issued_in_window': len(self._issued),
+            'max_per_window': self.max_per_window,
+            'assets_tracked': len(self._last_by_asset)
+        }
@@ -0,0 +1,48 @@
+"""Fast-start entry point for scale-to-zero deployments
+
+Binds the HTTP port and answers health checks first, then imports the
+bot module (and with it python-telegram-bot) and runs the bot on the
+same server. /readyz returns 200 only once the bot can serve updates.
+
+Usage: python startup.py [bot|bot_old]
+"""
+from startup_timer import StartupTimer  # first, so startup time includes the imports below
+
+import os
+import sys
+import asyncio
+import importlib
+
+from http_server import HttpServer, add_health_routes
+
+# Bot class of each entry module
+BOT_CLASSES = {'bot': 'SimpleBot', 'bot_old': 'BinaryOptionsBot'}
+
+
+async def launch(module_name: str):
+    """Serve health checks while the bot module is imported, then run it"""
+    timer = StartupTimer()
+    bot = None
+
+    http = HttpServer(port=int(os.getenv('PORT') or 8080))
+    add_health_routes(http, lambda: bot is not None and bot.ready)
+    with timer.phase("http"):
+        await http.start()
+
+    # Importing runs in a thread so the loop keeps answering probes
+    loop = asyncio.get_running_loop()
+    module = await timer.timed("import", loop.run_in_executor(None, importlib.import_module, module_name))
+
+    bot = getattr(module, BOT_CLASSES[module_name])(http=http, startup=timer)
+    await bot.run()
+
+
+def main():
+    module_name = sys.argv[1] if len(sys.argv) > 1 else 'bot'
+    if module_name not in BOT_CLASSES:
+        sys.exit(f"Unknown bot module: {module_name}")
+    asyncio.run(launch(module_name))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Wall time of startup phases
+
+Imported first by the entry points, so the clock starts before the heavy
+imports. Kept out of startup.py: running it as a script loads it as
+__main__, and bot modules importing it would load it a second time.
+"""
+import time
+
+_STARTED = time.perf_counter()
+
+import logging
+import contextlib
+from typing import Dict
+
+from metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+STARTUP_SECONDS = gauge("bot_startup_seconds", "Wall time of startup phases", ["phase"])
+
+
+class StartupTimer:
+    """Wall time of named startup phases, counted from interpreter start
+
+    Phases may overlap when they run concurrently, so their sum can be
+    larger than the total.
+    """
+
+    def __init__(self, started: float = None):
+        self.started = _STARTED if started is None else started
+        self.phases: Dict[str, float] = {}
+        self.total = None
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - started)
+
+    async def timed(self, name: str, awaitable):
+        """Await awaitable as a named phase"""
+        with self.phase(name):
+            return await awaitable
+
+    def _record(self, name: str, seconds: float):
+        self.phases[name] = seconds
+        STARTUP_SECONDS.set(seconds, name)
+
+    def finish(self) -> float:
+        """Record time to ready and log the breakdown"""
+        self.total = time.perf_counter() - self.started
+        STARTUP_SECONDS.set(self.total, "total")
+        parts = " ".join(f"{name}={seconds * 1000:.0f}" for name, seconds in self.phases.items())
+        logger.info(f"Ready in {self.total * 1000:.0f} ms: {parts}")
+        return self.total
@@ -0,0 +1,110 @@
+import time
+import heapq
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from metrics import counter
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTIONS_EXPIRED = counter("bot_subscriptions_expired_total", "Subscriptions that ran out")
+
+
+def has_access(user: Optional[Dict[str, Any]], now: float = None) -> bool:
+    """Whether a users row grants signals: confirmed and not past expires_at"""
+    if not user or user.get('id_status') != 'confirmed':
+        return False
+    expires_at = user.get('expires_at')
+    return expires_at is None or expires_at > (time.time() if now is None else now)
+
+
+class SubscriptionSweeper:
+    """Expire subscriptions when their time runs out
+
+    Every window seconds the users whose access ends within the next
+    window are read with a range scan on the expiry index and put in a
+    min-heap; each sweep in between only pops the heap. Expired users
+    get id_status 'expired', which drops them from the index, so neither
+    the scan nor the heap grows with the user count. Access checks
+    compare expires_at themselves and do not depend on the sweeper being
+    on time.
+    """
+
+    def __init__(self, db, window: float = 3600.0,
+                 on_expired: Callable[[List[int]], Awaitable[None]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.db = db
+        self.window = window
+        self.on_expired = on_expired
+        self._clock = clock
+
+        self._heap = []  # (expires_at, user_id)
+        self._scheduled = {}  # user_id -> expires_at in heap
+        self._loaded_until = 0.0
+
+        self.expired = 0
+
+    def clear(self):
+        """Forget scheduled users; the next sweep reloads them"""
+        self._heap = []
+        self._scheduled = {}
+        self._loaded_until = 0.0
+
+    def load(self, now: float = None) -> int:
+        """Schedule users whose access ends within the next window"""
+        now = self._clock() if now is None else now
+        until = now + self.window
+        loaded = 0
+        for user_id, expires_at in self.db.get_expiring_users(until):
+            if self._scheduled.get(user_id) != expires_at:
+                self._scheduled[user_id] = expires_at
+                heapq.heappush(self._heap, (expires_at, user_id))
+                loaded += 1
+        self._loaded_until = until
+        return loaded
+
+    def schedule(self, user_id: int, expires_at: float):
+        """Track a subscription granted or extended since the last load"""
+        if expires_at < self._loaded_until:
+            self._scheduled[user_id] = expires_at
+            heapq.heappush(self._heap, (expires_at, user_id))
+        else:
+            # Picked up by the load of its window; drop any earlier entry
+            self._scheduled.pop(user_id, None)
+
+    def take_due(self, now: float = None) -> List[int]:
+        """Pop users whose expiry has passed"""
+        now = self._clock() if now is None else now
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            expires_at, user_id = heapq.heappop(heap)
+            # An extended plan leaves a stale entry behind
+            if self._scheduled.get(user_id) == expires_at:
+                del self._scheduled[user_id]
+                due.append(user_id)
+        return due
+
+    async def sweep(self, now: float = None) -> List[int]:
+        """Expire due users and report them to on_expired"""
+        now = self._clock() if now is None else now
+        if now >= self._loaded_until:
+            self.load(now)
+
+        due = self.take_due(now)
+        if not due:
+            return []
+
+        expired = self.db.expire_users(due, now)
+        if expired:
+            self.expired += len(expired)
+            SUBSCRIPTIONS_EXPIRED.inc(amount=len(expired))
+            logger.info(f"Expired {len(expired)} subscriptions")
+            if self.on_expired:
+                await self.on_expired(expired)
+        return expired
+
+    @property
+    def pending_count(self) -> int:
+        """Number of users expiring within the loaded window"""
+        return len(self._scheduled)
@@ -0,0 +1,30 @@
+import re
+import math
+from typing import Optional
+
+# Accepts both config-style labels ('1m', '1h') and UI labels ('1мин')
+_TIMEFRAME_RE = re.compile(r"^\s*(\d+)\s*(s|sec|сек|m|min|мин|h|ч)\s*$", re.IGNORECASE)
+
+_UNIT_SECONDS = {
+    's': 1, 'sec': 1, 'сек': 1,
+    'm': 60, 'min': 60, 'мин': 60,
+    'h': 3600, 'ч': 3600,
+}
+
+
+def timeframe_to_seconds(label: str) -> Optional[int]:
+    """Convert timeframe label to seconds"""
+    match = _TIMEFRAME_RE.match(label or '')
+    if not match:
+        return None
+    return int(match.group(1)) * _UNIT_SECONDS[match.group(2).lower()]
+
+
+def candle_open(timestamp: float, seconds: int) -> float:
+    """Get open time of the candle containing timestamp"""
+    return math.floor(timestamp / seconds) * seconds
+
+
+def next_candle_close(timestamp: float, seconds: int) -> float:
+    """Get close time of the candle containing timestamp"""
+    return candle_open(timestamp, seconds) + seconds
@@ -0,0 +1,186 @@
+import math
+import time
+import signal
+import random
+import asyncio
+import logging
+import threading
+import contextvars
+import functools
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """Timings of one sampled update"""
+    __slots__ = ('name', 'started', 'duration', 'spans')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.spans: Dict[str, float] = {}  # span name -> total seconds
+
+    def add(self, name: str, seconds: float):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def summary(self) -> str:
+        parts = [f"{name}={seconds * 1000:.1f}" for name, seconds in self.spans.items()]
+        other = self.duration - sum(self.spans.values())
+        parts.append(f"other={max(other, 0.0) * 1000:.1f}")
+        return f"{self.name} {self.duration * 1000:.1f} ms: " + " ".join(parts)
+
+
+def record_span(name: str, seconds: float):
+    """Add already measured time to the current trace, if any"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+class _Span:
+    __slots__ = ('name', 'trace', 'started')
+
+    def __init__(self, name: str, trace: Trace):
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str):
+    """Time a block inside the current trace; free when the update is not sampled"""
+    trace = _current_trace.get()
+    return _NOOP_SPAN if trace is None else _Span(name, trace)
+
+
+class Tracer:
+    """Sample updates and report the slow ones with per-span timings"""
+
+    def __init__(self, sample_rate: float = 0.0, slow_threshold_ms: float = 1000, keep: int = 50):
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.slow_traces = deque(maxlen=keep)
+
+    def wrap(self, name: str, handler):
+        """Wrap update handler so sampled calls are traced"""
+        @functools.wraps(handler)
+        async def traced(*args, **kwargs):
+            if not self.sample_rate or random.random() >= self.sample_rate:
+                return await handler(*args, **kwargs)
+
+            trace = Trace(name)
+            token = _current_trace.set(trace)
+            try:
+                return await handler(*args, **kwargs)
+            finally:
+                _current_trace.reset(token)
+                self._finish(trace)
+        return traced
+
+    def _finish(self, trace: Trace):
+        trace.duration = time.perf_counter() - trace.started
+        if trace.duration >= self.slow_threshold:
+            self.slow_traces.append(trace)
+            logger.warning(f"Slow update {trace.summary()}")
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for the event loop (main) thread
+
+    A real-time interval timer delivers SIGALRM; the handler runs between
+    bytecodes of the main thread and records the interrupted stack, so
+    samples are not biased towards points where the GIL is released.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._running = False
+
+    async def profile(self, seconds: float, top: int = 15) -> str:
+        """Sample the main thread's stack for seconds and report hot spots"""
+        if self._running:
+            return "Профилирование уже идет"
+        if threading.current_thread() is not threading.main_thread():
+            return "Профилирование доступно только в главном потоке"
+
+        own_samples: Counter = Counter()
+        total_samples: Counter = Counter()
+        count = [0]
+
+        def sample(signum, frame):
+            if frame is None:
+                return
+            count[0] += 1
+            own_samples[self._describe(frame)] += 1
+            seen = set()
+            while frame is not None:
+                location = self._describe(frame)
+                if location not in seen:
+                    seen.add(location)
+                    total_samples[location] += 1
+                frame = frame.f_back
+
+        self._running = True
+        previous = signal.signal(signal.SIGALRM, sample)
+        signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+            self._running = False
+
+        return self._report(count[0], own_samples, total_samples, top)
+
+    @staticmethod
+    def _describe(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno} {code.co_name}"
+
+    @staticmethod
+    def _report(samples: int, own: Counter, total: Counter, top: int) -> str:
+        if not samples:
+            return "Нет данных"
+        lines = [f"Samples: {samples}", "", "Own time:"]
+        lines += [f"{n * 100 / samples:5.1f}% {location}" for location, n in own.most_common(top)]
+        lines += ["", "Total time:"]
+        lines += [f"{n * 100 / samples:5.1f}% {location}" for location, n in total.most_common(top)]
+        return "\n".join(lines)
+
+
+def parse_seconds(args: List[str], default: float = 10, maximum: float = 60) -> Optional[float]:
+    """Parse profiling duration from command arguments"""
+    if not args:
+        return default
+    try:
+        seconds = float(args[0])
+    except ValueError:
+        return None
+    # nan passes through min/max unchanged
+    if not math.isfinite(seconds):
+        return None
+    return min(max(seconds, 0.1), maximum)
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class UserBacklogFull(Exception):
+    """Too many updates of one user are waiting"""
+
+
+class UserSerializer:
+    """Run updates of one user strictly in arrival order
+
+    Updates of different users run concurrently. Each user with work in
+    flight has a FIFO of waiters; when a handler finishes it hands the
+    turn to the next waiter. Idle users take no memory.
+    """
+
+    def __init__(self, max_backlog: int = 10):
+        self.max_backlog = max_backlog
+        self._queues: Dict[int, deque] = {}  # user_id -> waiters behind the running update
+        self.rejected = 0
+
+    async def run(self, user_id: int, function: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Run function(*args) after all earlier updates of user_id"""
+        queue = self._queues.get(user_id)
+        if queue is None:
+            self._queues[user_id] = deque()
+        else:
+            if len(queue) >= self.max_backlog:
+                self.rejected += 1
+                raise UserBacklogFull(user_id)
+
+            waiter = asyncio.get_running_loop().create_future()
+            queue.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The turn was already handed to us, pass it on
+                    self._release(user_id)
+                else:
+                    queue.remove(waiter)
+                raise
+
+        try:
+            return await function(*args)
+        finally:
+            self._release(user_id)
+
+    def _release(self, user_id: int):
+        """Wake next waiter of user or forget the user"""
+        queue = self._queues[user_id]
+        while queue:
+            waiter = queue.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        del self._queues[user_id]
+
+    @property
+    def active_users(self) -> int:
+        """Users with an update in flight"""
+        return len(self._queues)
+
+    @property
+    def backlog(self) -> int:
+        """Updates waiting behind another update of the same user"""
+        return sum(len(queue) for queue in self._queues.values())
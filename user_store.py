@@ -0,0 +1,296 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Status codes are stored instead of strings
+STATUSES = ('new', 'pending', 'confirmed', 'blocked')
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+STATUS_NEW, STATUS_PENDING, STATUS_CONFIRMED, STATUS_BLOCKED = range(len(STATUSES))
+
+
+class UserRecord:
+    """Compact user record with dict-style read access"""
+    __slots__ = ('name', 'status_code', 'platform_id')
+
+    def __init__(self, name: Optional[str], status_code: int = STATUS_NEW, platform_id: Optional[str] = None):
+        # Many users share first names, keep one copy of each
+        self.name = sys.intern(name) if name else name
+        self.status_code = status_code
+        self.platform_id = platform_id
+
+    @property
+    def status(self) -> str:
+        return STATUSES[self.status_code]
+
+    @status.setter
+    def status(self, value: str):
+        self.status_code = STATUS_CODES[value]
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in ('name', 'status', 'platform_id'):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'status': self.status, 'platform_id': self.platform_id}
+
+
+def on_mounted_volume(path: str) -> bool:
+    """Whether path is on a volume mounted below the container root"""
+    path = os.path.realpath(path)
+    while not os.path.ismount(path):
+        path = os.path.dirname(path)
+    return path != os.path.dirname(path)
+
+
+class UserStore:
+    """In-memory user registry backed by an append-only log
+
+    Every change appends the full user record to users.log, so replay is
+    idempotent. Every snapshot_every changes the log is rotated to
+    users.log.1 and a thread writes the state column-wise to
+    users.snapshot.json, then removes the rotated log. Reads never touch
+    disk.
+
+    The directory must outlive the process: on Cloud Run the container
+    disk is lost on every restart, so it has to be a mounted volume.
+    State is per process, so only one instance may serve the bot.
+    """
+
+    def __init__(self, directory: str = "data", snapshot_every: int = 10000, fsync: bool = False):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+
+        self.users: Dict[int, UserRecord] = {}
+        self.pending_ids: Dict[int, str] = {}
+
+        self._log_path = os.path.join(directory, "users.log")
+        self._rotated_path = self._log_path + ".1"
+        self._snapshot_path = os.path.join(directory, "users.snapshot.json")
+        self._log = None
+        self._events_since_snapshot = 0
+        self._compaction: Optional[threading.Thread] = None
+
+    def load(self):
+        """Restore state from snapshot and log, then open log for appends"""
+        started = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.users.clear()
+        self.pending_ids.clear()
+
+        snapshot_count = 0
+        if os.path.exists(self._snapshot_path):
+            with open(self._snapshot_path, encoding="utf-8") as f:
+                snapshot = json.loads(f.read())
+            # Column lists parse faster than a list of records
+            statuses = [STATUS_CODES[status] if isinstance(status, str) else status
+                        for status in snapshot["statuses"]]
+            columns = zip(snapshot["ids"], snapshot["names"], statuses, snapshot["platform_ids"])
+            self.users.update(
+                (user_id, UserRecord(name, status_code, platform_id))
+                for user_id, name, status_code, platform_id in columns
+            )
+            self.pending_ids.update(
+                (user_id, user.platform_id) for user_id, user in self.users.items()
+                if user.status_code == STATUS_PENDING
+            )
+            snapshot_count = len(self.users)
+
+        log_count = 0
+        # A rotated log is left when the process stopped before its snapshot was written
+        for path in (self._rotated_path, self._log_path):
+            if os.path.exists(path):
+                for record in self._read_log(path):
+                    self._apply(record)
+                    log_count += 1
+
+        self._log = open(self._log_path, "a", encoding="utf-8")
+        self._events_since_snapshot = log_count
+
+        logger.info(f"User store loaded {len(self.users)} users ({snapshot_count} from snapshot, "
+                    f"{log_count} log events) in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def _read_log(self, path: str):
+        """Read log records, skipping a torn last line"""
+        with open(path, encoding="utf-8") as f:
+            lines = [line for line in f.read().split("\n") if line]
+        try:
+            # One parse call for the whole log is much faster than one per line
+            return json.loads("[" + ",".join(lines) + "]")
+        except ValueError:
+            records = []
+            for line in lines:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.warning("Skipping damaged user log record")
+            return records
+
+    def _apply(self, record):
+        """Apply [user_id, name, status, platform_id] record to memory"""
+        user_id, name, status, platform_id = record
+        self.users[user_id] = UserRecord(name, STATUS_CODES[status], platform_id)
+        self._index_pending(user_id)
+
+    def _index_pending(self, user_id: int):
+        """Keep pending_ids in sync with user status"""
+        user = self.users[user_id]
+        if user.status_code == STATUS_PENDING:
+            self.pending_ids[user_id] = user.platform_id
+        else:
+            self.pending_ids.pop(user_id, None)
+
+    def _save(self, user_id: int):
+        """Persist current record of user"""
+        self._index_pending(user_id)
+        user = self.users[user_id]
+        record = [user_id, user.name, user.status, user.platform_id]
+
+        if self._log is None:
+            return
+        self._log.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+
+        self._events_since_snapshot += 1
+        if self._events_since_snapshot >= self.snapshot_every and not self.compacting:
+            self._compact_in_background()
+
+    def add_user(self, user_id: int, name: Optional[str]) -> bool:
+        """Add new user, False if already known"""
+        if user_id in self.users:
+            return False
+        self.users[user_id] = UserRecord(name)
+        self._save(user_id)
+        return True
+
+    def set_platform_id(self, user_id: int, platform_id: str, name: Optional[str] = None):
+        """Save platform ID and mark user as pending"""
+        user = self.users.get(user_id)
+        if user is None:
+            user = self.users[user_id] = UserRecord(name)
+        user.platform_id = platform_id
+        user.status_code = STATUS_PENDING
+        self._save(user_id)
+
+    def set_status(self, user_id: int, status: str) -> bool:
+        """Change user status"""
+        user = self.users.get(user_id)
+        if user is None:
+            return False
+        user.status = status
+        self._save(user_id)
+        return True
+
+    def confirm(self, user_id: int) -> bool:
+        """Confirm user access"""
+        return self.set_status(user_id, 'confirmed')
+
+    @property
+    def compacting(self) -> bool:
+        return self._compaction is not None and self._compaction.is_alive()
+
+    def _snapshot(self) -> Dict[str, list]:
+        """Copy state into column lists"""
+        users = self.users.values()
+        return {
+            "ids": list(self.users),
+            "names": [user.name for user in users],
+            "statuses": [user.status_code for user in users],
+            "platform_ids": [user.platform_id for user in users]
+        }
+
+    def _write_snapshot(self, snapshot: Dict[str, list], chunk: int = 10000):
+        # json.dumps holds the GIL until it returns, encoding in chunks lets
+        # the event loop run between them while a thread writes the snapshot
+        tmp_path = self._snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for index, (key, column) in enumerate(snapshot.items()):
+                f.write(("{" if index == 0 else ",") + json.dumps(key) + ":[")
+                for start in range(0, len(column), chunk):
+                    encoded = json.dumps(column[start:start + chunk], ensure_ascii=False, separators=(",", ":"))
+                    f.write(("," if start else "") + encoded[1:-1])
+                f.write("]")
+            f.write("}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_path)
+
+    def _compact_in_background(self):
+        """Rotate the log and write the snapshot from a thread
+
+        Only copying the columns and renaming the log happen on the caller's
+        thread; serializing and fsync of every user would block the event
+        loop. Until the snapshot is replaced the old snapshot plus both logs
+        hold the full state.
+        """
+        if os.path.exists(self._rotated_path):
+            # The last background snapshot failed, its log is still needed
+            self.compact()
+            return
+
+        snapshot = self._snapshot()
+        self._log.close()
+        os.replace(self._log_path, self._rotated_path)
+        self._log = open(self._log_path, "a", encoding="utf-8")
+        self._events_since_snapshot = 0
+
+        self._compaction = threading.Thread(target=self._finish_compaction, args=(snapshot,),
+                                            name="user-store-snapshot", daemon=True)
+        self._compaction.start()
+
+    def _finish_compaction(self, snapshot: Dict[str, list]):
+        started = time.perf_counter()
+        try:
+            self._write_snapshot(snapshot)
+            os.remove(self._rotated_path)
+        except OSError as e:
+            logger.error(f"User store snapshot failed: {e}")
+            return
+        logger.info(f"User store snapshot: {len(snapshot['ids'])} users "
+                    f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def compact(self):
+        """Write snapshot and truncate log, waiting for a background snapshot first"""
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+
+        started = time.perf_counter()
+        self._write_snapshot(self._snapshot())
+
+        # Log records are full upserts, so a crash before truncation only replays them again
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self._log_path, "w", encoding="utf-8")
+        if os.path.exists(self._rotated_path):
+            os.remove(self._rotated_path)
+        self._events_since_snapshot = 0
+
+        logger.info(f"User store snapshot: {len(self.users)} users in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def close(self):
+        """Compact and close the log"""
+        if self._log is None:
+            return
+        if self._compaction is not None:
+            self._compaction.join()
+        if self._events_since_snapshot or os.path.exists(self._rotated_path):
+            self.compact()
+        self._log.close()
+        self._log = None